@@ -0,0 +1,178 @@
+import argparse
+import sys
+from errors import IPPcodeOutputError
+from output import DEFAULT_BUFFER_SIZE
+from control_flow import CFG_FORMATS
+from profiler import PROFILE_FORMATS, DEFAULT_SAMPLE_INTERVAL
+
+ENGINES = ["threaded", "reference", "compiled"]
+
+# Stats arguments and keys of run stats written for them
+STATS = {"--insts": "insts", "--vars": "vars", "--trace-hits": "trace_hits", "--trace-compiles": "trace_compiles",
+         "--guard-failures": "guard_failures"}
+
+
+class ArgumentParser(argparse.ArgumentParser):
+    def error(self, message):
+        """
+        Overrides argparse exit code
+        :param message: Error message
+        """
+        sys.stderr.write("ERROR: Error while parsing arguments!\n")
+        sys.exit(10)
+
+
+def create_parser():
+    """
+    Creates parser of command line arguments
+    :return: ArgumentParser
+    """
+    parser = ArgumentParser(add_help=False)
+    parser.add_argument("--help", action="store_true")
+    parser.add_argument("--source")
+    parser.add_argument("--stats")
+    parser.add_argument("--insts", action="store_true")
+    parser.add_argument("--vars", action="store_true")
+    parser.add_argument("--trace-hits", action="store_true")
+    parser.add_argument("--trace-compiles", action="store_true")
+    parser.add_argument("--guard-failures", action="store_true")
+    parser.add_argument("--engine", choices=ENGINES, default="threaded")
+    parser.add_argument("--cache")
+    parser.add_argument("--optimize", action="store_true")
+    parser.add_argument("--jit", action="store_true")
+    parser.add_argument("--output")
+    parser.add_argument("--buffer-size", type=int, default=DEFAULT_BUFFER_SIZE)
+    parser.add_argument("--prefetch-input", action="store_true")
+    parser.add_argument("--profile")
+    parser.add_argument("--profile-format", choices=PROFILE_FORMATS, default="json")
+    parser.add_argument("--sample")
+    parser.add_argument("--sample-interval", type=float, default=DEFAULT_SAMPLE_INTERVAL * 1000)
+    parser.add_argument("--cfg")
+    parser.add_argument("--cfg-format", choices=CFG_FORMATS, default="json")
+    parser.add_argument("--batch")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--report")
+
+    return parser
+
+
+def check_arguments(args):
+    """
+    Validates parsed arguments, prints help if it is requested
+    :param args: Parsed arguments
+    """
+    if args.help:
+        if len(sys.argv) != 2:
+            sys.stderr.write("ERROR: Can not combine --help with other parameters!\n")
+            sys.exit(10)
+
+        print("-------- Program help --------")
+        print("Program loads XML file from --source parametr and interprets it.")
+        print("Usage: python3.6 ./interpret.py --source=source_xml_file")
+        print("Optional --engine=threaded|reference|compiled selects interpretation engine (default threaded),")
+        print("compiled engine translates basic blocks of program to Python code.")
+        print("Optional --cache=directory stores validated programs and code of compiled engine and reuses them")
+        print("for unchanged sources.")
+        print("Optional --optimize folds constants, drops unreachable code, skips type checks of operands with")
+        print("types proven by data flow analysis and fuses instructions (threaded and compiled engine).")
+        print("Optional --jit records hot loops of threaded engine and compiles them to Python code specialized")
+        print("to observed types, --trace-hits, --trace-compiles and --guard-failures write number of trace runs,")
+        print("compiled traces and traces left on changed type or frame to --stats file.")
+        print("Optional --output=file writes program output to file instead of standard output.")
+        print("Optional --buffer-size=characters sets size of output buffers (0 writes output immediately).")
+        print("Optional --prefetch-input reads standard input ahead in background thread (useful for pipes).")
+        print("Optional --profile=file writes execution counts and times per opcode, instruction and called label")
+        print("(threaded engine only), --profile-format=json|text selects report format (default json).")
+        print("Optional --sample=file periodically samples call stack of program and writes it in collapsed stack")
+        print("format for flamegraph tools, --sample-interval=milliseconds sets time between samples (default 5).")
+        print("Optional --cfg=file writes basic blocks, control flow edges, dominators and nested loops of program")
+        print("instead of running it, --cfg-format=json|dot selects format (default json).")
+        print("Optional --batch=manifest runs programs of manifest lines {\"source\": file, \"stdin\": file} or")
+        print("{\"source\": file, \"input\": text} instead of --source by --workers=number processes (default number")
+        print("of CPUs), output, exit code, --insts and --vars of every run and summary are written as JSON lines")
+        print("to --report=file (default standard output).")
+        sys.exit(0)
+
+    if args.batch:
+        check_batch_arguments(args)
+        return
+
+    if args.workers is not None or args.report:
+        sys.stderr.write("ERROR: Parametrs --workers and --report need --batch parametr!\n")
+        sys.exit(10)
+
+    if (args.insts or args.vars or args.trace_hits or args.trace_compiles or args.guard_failures) and not args.stats:
+        sys.stderr.write("ERROR: Missing --stats parametr!\n")
+        sys.exit(10)
+
+    if args.optimize and args.engine == "reference":
+        sys.stderr.write("ERROR: Can not combine --optimize with reference engine!\n")
+        sys.exit(10)
+
+    if args.profile and args.engine != "threaded":
+        sys.stderr.write("ERROR: Can not combine --profile with %s engine!\n" % args.engine)
+        sys.exit(10)
+
+    if args.jit and args.engine != "threaded":
+        sys.stderr.write("ERROR: Can not combine --jit with %s engine!\n" % args.engine)
+        sys.exit(10)
+
+    if args.jit and args.profile:
+        sys.stderr.write("ERROR: Can not combine --jit with --profile!\n")
+        sys.exit(10)
+
+    if not args.source:
+        sys.stderr.write("ERROR: Missing --source parametr!\n")
+        sys.exit(10)
+
+    if args.buffer_size < 0:
+        sys.stderr.write("ERROR: Buffer size can not be negative!\n")
+        sys.exit(10)
+
+    if args.sample_interval <= 0:
+        sys.stderr.write("ERROR: Sample interval must be positive!\n")
+        sys.exit(10)
+
+
+def check_batch_arguments(args):
+    """
+    Validates arguments of batch mode
+    :param args: Parsed arguments
+    """
+    for name in ["source", "stats", "insts", "vars", "trace_hits", "trace_compiles", "guard_failures", "jit", "output",
+                 "profile", "sample", "prefetch_input", "cfg"]:
+        if getattr(args, name):
+            sys.stderr.write("ERROR: Can not combine --batch with --%s!\n" % name.replace("_", "-"))
+            sys.exit(10)
+
+    if args.optimize and args.engine == "reference":
+        sys.stderr.write("ERROR: Can not combine --optimize with reference engine!\n")
+        sys.exit(10)
+
+    if args.buffer_size < 0:
+        sys.stderr.write("ERROR: Buffer size can not be negative!\n")
+        sys.exit(10)
+
+    if args.workers is not None and args.workers < 1:
+        sys.stderr.write("ERROR: Number of workers must be positive!\n")
+        sys.exit(10)
+
+
+def write_stats(path, stats):
+    """
+    Writes stats in order of stats arguments, tracing stats of run without tracing are zero
+    :param path: Stats file path
+    :param stats: Stats of program run
+    """
+    try:
+        lines = ""
+        for argument in sys.argv:
+            if argument in STATS:
+                lines += "%d\n" % stats.get(STATS[argument], 0)
+
+        file = open(path, "w")
+        file.seek(0)
+        file.write(lines)
+        file.truncate()
+    except IOError:
+        raise IPPcodeOutputError("Could not open stats file")
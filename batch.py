@@ -0,0 +1,175 @@
+import io
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from errors import IPPcodeError, IPPcodeSourceError
+from interpreter import Interpreter
+from output import DEFAULT_BUFFER_SIZE
+from program_cache import MemoryProgramCache, DEFAULT_MEMORY_PROGRAMS
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Maximal number of runs sent to worker at once, small chunks keep workers busy at end of batch
+MAX_CHUNK_SIZE = 64
+
+# Worker of current pool process, it is set by init_worker
+worker = None
+
+
+class BatchWorker:
+    def __init__(self, engine="threaded", optimize=False, buffer_size=DEFAULT_BUFFER_SIZE,
+                 cache_size=DEFAULT_MEMORY_PROGRAMS):
+        """
+        Sets run options and cache of loaded programs, which is kept for whole life of worker
+        :param engine: Engine used for interpretation
+        :param optimize: If true, loaded programs are optimized
+        :param buffer_size: Size of output buffers
+        :param cache_size: Maximal number of cached programs
+        """
+        self.engine = engine
+        self.optimize = optimize
+        self.buffer_size = buffer_size
+        self.program_cache = MemoryProgramCache(cache_size)
+
+    def run(self, entry):
+        """
+        Runs one manifest entry
+        :param entry: Dictionary with id, source path and stdin path or input text
+        :return: Dictionary with id, source, exit code, stdout, stderr, stats and time of run
+        """
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        result = {"id": entry["id"], "source": entry["source"]}
+        start = time.perf_counter()
+
+        try:
+            stdin = entry.get("input", "")
+            if entry.get("stdin") is not None:
+                try:
+                    with open(entry["stdin"], "rb") as file:
+                        stdin = file.read()
+                except IOError:
+                    raise IPPcodeSourceError("Can not open input file")
+
+            interpreter = Interpreter(entry["source"], self.engine, self.optimize, self.program_cache)
+            # Successful run reports values of --insts and --vars
+            result.update(interpreter.run(stdin, stdout, stderr, self.buffer_size).stats)
+            exit_code = 0
+        except IPPcodeError as e:
+            stderr.write(e.report())
+            exit_code = e.exit_code
+        except Exception:
+            # Crash of program is reported like crash of interpret.py, worker keeps running
+            stderr.write(traceback.format_exc())
+            exit_code = 1
+
+        result["time"] = time.perf_counter() - start
+        result["exit_code"] = exit_code
+        result["stdout"] = stdout.getvalue()
+        result["stderr"] = stderr.getvalue()
+
+        return result
+
+
+def init_worker(options):
+    """
+    Creates worker of pool process
+    :param options: Arguments of BatchWorker
+    """
+    global worker
+    worker = BatchWorker(*options)
+
+
+def run_entry(entry):
+    """
+    Runs manifest entry by worker of current process
+    """
+    return worker.run(entry)
+
+
+def load_manifest(path):
+    """
+    Reads manifest, every line is JSON object with source path and optional stdin path, input text and id,
+    relative paths are resolved against manifest directory
+    :param path: Manifest path
+    :return: List of entries
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    entries = []
+
+    try:
+        with open(path, encoding="utf-8") as file:
+            lines = file.readlines()
+    except IOError:
+        raise IPPcodeSourceError("Can not open manifest file")
+
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            entry = None
+        if not isinstance(entry, dict) or not isinstance(entry.get("source"), str):
+            raise IPPcodeSourceError("Wrong manifest entry on line %d" % number)
+
+        entry["source"] = os.path.join(directory, entry["source"])
+        if entry.get("stdin") is not None:
+            entry["stdin"] = os.path.join(directory, entry["stdin"])
+        entry.setdefault("id", len(entries))
+        entries.append(entry)
+
+    return entries
+
+
+def run_batch(entries, report, workers=DEFAULT_WORKERS, engine="threaded", optimize=False,
+              buffer_size=DEFAULT_BUFFER_SIZE, cache_size=DEFAULT_MEMORY_PROGRAMS):
+    """
+    Runs entries by pool of worker processes and writes JSON line for every run in manifest order,
+    last line contains summary of whole batch, other arguments are passed to BatchWorker
+    :param entries: Manifest entries
+    :param report: Text stream of report
+    :param workers: Number of worker processes, 1 runs entries in current process
+    :return: Summary dictionary
+    """
+    options = (engine, optimize, buffer_size, cache_size)
+    summary = {"runs": 0, "failed": 0, "insts": 0, "workers": workers}
+    start = time.perf_counter()
+    pool = None
+
+    if workers == 1:
+        init_worker(options)
+        results = map(run_entry, entries)
+    else:
+        # Forked workers inherit imported modules, every worker loads each program once
+        chunk_size = max(1, min(MAX_CHUNK_SIZE, len(entries) // (workers * 4)))
+        pool = multiprocessing.Pool(workers, init_worker, (options,))
+        results = pool.imap(run_entry, entries, chunk_size)
+
+    try:
+        for result in results:
+            report.write(json.dumps(result) + "\n")
+            summary["runs"] += 1
+            summary["insts"] += result.get("insts", 0)
+            if result["exit_code"] != 0:
+                summary["failed"] += 1
+    except BaseException:
+        if pool is not None:
+            pool.terminate()
+        raise
+    else:
+        if pool is not None:
+            pool.close()
+    finally:
+        if pool is not None:
+            pool.join()
+
+    summary["time"] = time.perf_counter() - start
+    summary["runs_per_second"] = summary["runs"] / summary["time"] if summary["time"] > 0 else 0.0
+    summary["insts_per_second"] = summary["insts"] / summary["time"] if summary["time"] > 0 else 0.0
+    report.write(json.dumps({"summary": summary}) + "\n")
+
+    return summary
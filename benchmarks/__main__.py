@@ -0,0 +1,57 @@
+import argparse
+import sys
+
+from benchmarks.runner import BenchmarkRunner, BenchmarkError, DEFAULT_REPEAT, DEFAULT_THRESHOLD, compare, \
+    format_results, load_baseline, save_baseline
+from benchmarks.workloads import WORKLOADS, generate
+
+
+def main():
+    """
+    Runs benchmark workloads, results can be saved as baseline or compared with it
+    :return: Exit code, 1 if regression against baseline was found
+    """
+    parser = argparse.ArgumentParser(prog="python3 -m benchmarks",
+                                     description="Runs generated IPPcode18 workloads through interpret.py.")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS),
+                        help="comma separated workloads (default all: %s)" % ", ".join(WORKLOADS))
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier of default workload sizes")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="runs of every program")
+    parser.add_argument("--option", action="append", default=[], dest="options",
+                        help="interpret.py option, for example --option=--optimize")
+    parser.add_argument("--save", help="write results as JSON baseline")
+    parser.add_argument("--compare", help="compare results with JSON baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    names = args.workloads.split(",")
+    for name in names:
+        if name not in WORKLOADS:
+            parser.error("unknown workload %s" % name)
+
+    workloads = [generate(name, max(int(WORKLOADS[name][1] * args.scale), 1)) for name in names]
+
+    try:
+        baseline = load_baseline(args.compare) if args.compare else None
+        results = BenchmarkRunner(args.options, args.repeat).measure_all(workloads)
+    except (BenchmarkError, IOError, ValueError) as e:
+        sys.stderr.write("ERROR: %s\n" % e)
+        return 2
+
+    sys.stdout.write(format_results(results))
+
+    if args.save:
+        save_baseline(args.save, results)
+
+    if baseline is not None:
+        regressions = compare(baseline, results, args.threshold)
+        for regression in regressions:
+            sys.stdout.write("REGRESSION %s\n" % regression)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
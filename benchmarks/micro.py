@@ -0,0 +1,373 @@
+import argparse
+import statistics
+import sys
+import timeit
+
+from benchmarks.runner import BenchmarkError, DEFAULT_THRESHOLD, load_baseline, save_baseline, BASELINE_VERSION
+from frames import Frames
+from interpret_factory import InterpretFactory
+from variables import Variable, TYPE_INT
+
+DEFAULT_SAMPLES = 7
+
+# Minimal time of one sample, number of repetitions is calibrated to reach it
+DEFAULT_MIN_TIME = 0.05
+
+# Maximal coefficient of variation of samples of stable result
+DEFAULT_MAX_CV = 0.05
+
+# Number of times unstable benchmark is measured again
+RETRIES = 3
+
+SMALL_FRAME = 10
+
+LARGE_FRAME = 10000
+
+
+class Fixture:
+    def __init__(self):
+        """
+        Creates interpret with large global, local and temporary frames
+        """
+        self.interpret = InterpretFactory("threaded")
+        self.variables = self.interpret.variables_factory
+        self.frames = self.interpret.frames
+
+        self.frames.global_frame = self.frame(LARGE_FRAME)
+        self.frames.temporary_frame = self.frame(LARGE_FRAME)
+        self.frames.local_frame = self.frame(LARGE_FRAME)
+        self.frames.frame_stack.append(self.frames.local_frame)
+
+    @staticmethod
+    def frame(size):
+        """
+        Creates frame of initialized int variables v0, v1, ...
+        :param size: Number of variables
+        """
+        frame = {}
+        for number in range(size):
+            variable = Variable("v%d" % number)
+            variable.variable_type = TYPE_INT
+            variable.value = number
+            frame[variable.name] = variable
+
+        return frame
+
+    def var(self, name):
+        """
+        Creates validated variable operand
+        :param name: Variable with frame, for example GF@v1
+        """
+        return self.interpret.var(["var", name])
+
+    def symb(self, symb_type, value):
+        """
+        Creates validated literal operand
+        :param symb_type: Literal type
+        :param value: Literal text
+        """
+        return self.interpret.symb([symb_type, value])
+
+
+def aritmetic_int():
+    """
+    ADD, SUB, MUL and IDIV of int variables and literals
+    :return: Benchmarked function and number of handler calls in it
+    """
+    fixture = Fixture()
+    handler = fixture.variables.aritmetic_operation
+    result, a, b = fixture.var("GF@v0"), fixture.var("GF@v3"), fixture.var("LF@v7")
+    two = fixture.symb("int", "2")
+    operands = [(result, a, b, "add"), (result, a, two, "sub"), (result, b, two, "mul"), (result, a, two, "idiv")]
+
+    def run():
+        for args in operands:
+            handler(*args)
+
+    return run, len(operands)
+
+
+def aritmetic_float():
+    """
+    ADD, SUB, MUL and DIV of float variables and literals
+    :return: Benchmarked function and number of handler calls in it
+    """
+    fixture = Fixture()
+    handler = fixture.variables.aritmetic_operation
+    result, a = fixture.var("GF@v0"), fixture.var("GF@v1")
+    fixture.variables.move_to_var(a, fixture.symb("float", "0x1.8p+1"))
+    half = fixture.symb("float", "0x1p-1")
+    operands = [(result, a, half, "add"), (result, a, half, "sub"), (result, a, a, "mul"), (result, a, half, "div")]
+
+    def run():
+        for args in operands:
+            handler(*args)
+
+    return run, len(operands)
+
+
+def relation_operator():
+    """
+    LT, GT and EQ of ints, strings and bools
+    :return: Benchmarked function and number of handler calls in it
+    """
+    fixture = Fixture()
+    handler = fixture.variables.relation_operator
+    result, a, b = fixture.var("GF@v0"), fixture.var("GF@v3"), fixture.var("LF@v7")
+    text = fixture.var("TF@v1")
+    fixture.variables.move_to_var(text, fixture.symb("string", "abc"))
+    operands = [(result, a, b, "lt"), (result, a, fixture.symb("int", "5"), "gt"),
+                (result, text, fixture.symb("string", "abd"), "lt"),
+                (result, fixture.symb("bool", "true"), fixture.symb("bool", "false"), "eq")]
+
+    def run():
+        for args in operands:
+            handler(*args)
+
+    return run, len(operands)
+
+
+def move_to_var():
+    """
+    MOVE of literals and variables from other frames
+    :return: Benchmarked function and number of handler calls in it
+    """
+    fixture = Fixture()
+    handler = fixture.variables.move_to_var
+    result = fixture.var("GF@v0")
+    operands = [(result, fixture.symb("int", "1")), (result, fixture.var("LF@v3")),
+                (result, fixture.symb("string", "text")), (result, fixture.var("TF@v5"))]
+
+    def run():
+        for args in operands:
+            handler(*args)
+
+    return run, len(operands)
+
+
+def get_var(frame, size):
+    """
+    Creates benchmark of variable lookup
+    :param frame: GF, LF or TF
+    :param size: Number of variables in frame
+    """
+    def setup():
+        """
+        Creates frames and operands
+        :return: Benchmarked function and number of handler calls in it
+        """
+        fixture = Fixture()
+        frames = fixture.frames
+        if size == SMALL_FRAME:
+            frames.global_frame = fixture.frame(size)
+            frames.temporary_frame = fixture.frame(size)
+            frames.local_frame = frames.frame_stack[-1] = fixture.frame(size)
+
+        handler = fixture.variables.get_var
+        operands = [fixture.var("%s@v%d" % (frame, number)) for number in range(SMALL_FRAME)]
+
+        def run():
+            for var in operands:
+                handler(var, True)
+
+        return run, len(operands)
+
+    return setup
+
+
+def push_pop_frame():
+    """
+    PUSHFRAME followed by POPFRAME
+    :return: Benchmarked function and number of handler calls in it
+    """
+    frames = Frames()
+    push_frame = frames.push_frame
+    pop_frame = frames.pop_frame
+    frames.create_frame()
+    frames.temporary_frame["x"] = Variable("x")
+
+    def run():
+        push_frame()
+        pop_frame()
+
+    return run, 2
+
+
+def create_frame_def_var():
+    """
+    CREATEFRAME followed by DEFVAR of four temporary variables
+    :return: Benchmarked function and number of handler calls in it
+    """
+    fixture = Fixture()
+    create_frame = fixture.frames.create_frame
+    def_var = fixture.variables.def_var
+    operands = [fixture.var("TF@v%d" % number) for number in range(4)]
+
+    def run():
+        create_frame()
+        for var in operands:
+            def_var(var)
+
+    return run, len(operands) + 1
+
+
+MICROBENCHMARKS = {
+    "aritmetic_operation/int": aritmetic_int,
+    "aritmetic_operation/float": aritmetic_float,
+    "relation_operator": relation_operator,
+    "move_to_var": move_to_var,
+    "get_var/GF/small": get_var("GF", SMALL_FRAME),
+    "get_var/GF/large": get_var("GF", LARGE_FRAME),
+    "get_var/LF/small": get_var("LF", SMALL_FRAME),
+    "get_var/LF/large": get_var("LF", LARGE_FRAME),
+    "get_var/TF/small": get_var("TF", SMALL_FRAME),
+    "get_var/TF/large": get_var("TF", LARGE_FRAME),
+    "push_frame+pop_frame": push_pop_frame,
+    "create_frame+def_var": create_frame_def_var,
+}
+
+
+def calibrate(function, min_time):
+    """
+    Finds number of calls, which take at least min_time
+    :return: Number of calls
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+
+    return number
+
+
+def sample(function, number, samples):
+    """
+    Measures function repeatedly
+    :return: List of times of one call in nanoseconds
+    """
+    timer = timeit.Timer(function)
+
+    return [time * 1e9 / number for time in timer.repeat(samples, number)]
+
+
+def measure(name, samples=DEFAULT_SAMPLES, min_time=DEFAULT_MIN_TIME, max_cv=DEFAULT_MAX_CV, overhead=None):
+    """
+    Measures microbenchmark, unstable measurement is repeated several times
+    :param name: Microbenchmark name
+    :param samples: Number of samples
+    :param min_time: Minimal time of one sample in seconds
+    :param max_cv: Maximal coefficient of variation of stable result
+    :param overhead: Time of call of empty function in nanoseconds, it is subtracted from results
+    :return: Dictionary with median and minimum ns/op, coefficient of variation and stability
+    """
+    function, operations = MICROBENCHMARKS[name]()
+    number = calibrate(function, min_time)
+    if overhead is None:
+        overhead = call_overhead(min_time)
+
+    for _ in range(RETRIES):
+        times = [max(time - overhead, 0.0) / operations for time in sample(function, number, samples)]
+        median = statistics.median(times)
+        cv = statistics.stdev(times) / median if median > 0 and samples > 1 else 0.0
+        if cv <= max_cv:
+            break
+
+    return {"ns": median, "min": min(times), "cv": cv, "stable": cv <= max_cv}
+
+
+def call_overhead(min_time=DEFAULT_MIN_TIME):
+    """
+    Measures call of empty function, which wraps every microbenchmark
+    :return: Time in nanoseconds
+    """
+    def empty():
+        pass
+
+    number = calibrate(empty, min_time)
+
+    return min(sample(empty, number, DEFAULT_SAMPLES))
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Finds regressions of stable results against baseline
+    :param baseline: Baseline dictionary
+    :param current: Current results
+    :param threshold: Allowed relative slowdown
+    :return: List of regression descriptions
+    """
+    regressions = []
+
+    for name, result in sorted(current["results"].items()):
+        base = baseline["results"].get(name)
+        if base is None or not base["stable"] or not result["stable"]:
+            continue
+
+        if result["ns"] > base["ns"] * (1 + threshold):
+            regressions.append("%s: %.1f ns/op > %.1f ns/op" % (name, result["ns"], base["ns"]))
+
+    return regressions
+
+
+def format_results(results):
+    """
+    Formats results as text table
+    :param results: Results
+    :return: Human readable table
+    """
+    lines = ["%-28s %12s %12s %8s" % ("Handler", "ns/op", "min ns/op", "CV")]
+    for name, result in results["results"].items():
+        lines.append("%-28s %12.1f %12.1f %7.1f%%%s" % (name, result["ns"], result["min"], result["cv"] * 100,
+                                                        "" if result["stable"] else " UNSTABLE"))
+
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    """
+    Runs microbenchmarks of VariablesFactory and Frames handlers
+    :return: Exit code, 1 if regression against baseline was found
+    """
+    parser = argparse.ArgumentParser(prog="python3 -m benchmarks.micro",
+                                     description="Measures VariablesFactory and Frames handlers in isolation.")
+    parser.add_argument("--filter", default="", help="run only microbenchmarks containing this text")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES, help="samples of every microbenchmark")
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME, help="minimal time of one sample")
+    parser.add_argument("--max-cv", type=float, default=DEFAULT_MAX_CV,
+                        help="maximal coefficient of variation of stable result")
+    parser.add_argument("--save", help="write results as JSON baseline")
+    parser.add_argument("--compare", help="compare results with JSON baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    if args.samples < 2:
+        parser.error("at least 2 samples are needed")
+
+    try:
+        baseline = load_baseline(args.compare) if args.compare else None
+    except (BenchmarkError, IOError, ValueError) as e:
+        sys.stderr.write("ERROR: %s\n" % e)
+        return 2
+
+    overhead = call_overhead(args.min_time)
+    results = {"version": BASELINE_VERSION, "python": sys.version.split()[0], "overhead": overhead, "results": {
+        name: measure(name, args.samples, args.min_time, args.max_cv, overhead)
+        for name in MICROBENCHMARKS if args.filter in name}}
+
+    sys.stdout.write(format_results(results))
+
+    if args.save:
+        save_baseline(args.save, results)
+
+    if baseline is not None:
+        regressions = compare(baseline, results, args.threshold)
+        for regression in regressions:
+            sys.stdout.write("REGRESSION %s\n" % regression)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
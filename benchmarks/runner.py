@@ -0,0 +1,209 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.workloads import Workload, to_xml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INTERPRET = os.path.join(ROOT, "interpret.py")
+
+BASELINE_VERSION = 1
+
+DEFAULT_REPEAT = 5
+
+DEFAULT_THRESHOLD = 0.1
+
+# Time differences below this many seconds are treated as noise when results are compared
+MIN_TIME_DIFFERENCE = 0.005
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class BenchmarkRunner:
+    def __init__(self, options=None, repeat=DEFAULT_REPEAT, interpreter=sys.executable):
+        """
+        Sets how workloads are run
+        :param options: Additional interpret.py options, for example --optimize
+        :param repeat: Number of runs of every measured program, fastest run is taken
+        :param interpreter: Python executable running interpret.py
+        """
+        self.options = list(options or [])
+        self.repeat = repeat
+        self.interpreter = interpreter
+        self.startup = None
+
+    def run_program(self, source, stdin="", stats=False):
+        """
+        Runs interpret.py once, output of program is dropped
+        :param source: XML source
+        :param stdin: Standard input of program
+        :param stats: If true, number of executed instructions is read from --stats file
+        :return: Wall time in seconds, peak RSS in KiB and number of executed instructions or None
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            source_path = os.path.join(directory, "source.xml")
+            input_path = os.path.join(directory, "stdin")
+            stats_path = os.path.join(directory, "stats")
+            with open(source_path, "w", encoding="utf-8") as file:
+                file.write(source)
+            with open(input_path, "w", encoding="utf-8") as file:
+                file.write(stdin)
+
+            command = [self.interpreter, INTERPRET, "--source=" + source_path] + self.options
+            if stats:
+                command += ["--stats=" + stats_path, "--insts"]
+
+            with open(input_path, "rb") as stdin_file, tempfile.TemporaryFile() as stderr_file:
+                start = time.perf_counter()
+                process = subprocess.Popen(command, stdin=stdin_file, stdout=subprocess.DEVNULL, stderr=stderr_file)
+                # Resource usage of this child only, Popen.wait does not return it
+                _, status, usage = os.wait4(process.pid, 0)
+                wall = time.perf_counter() - start
+                process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+
+                if process.returncode != 0:
+                    stderr_file.seek(0)
+                    raise BenchmarkError("interpret.py exited with %d (%s)" % (
+                        process.returncode, stderr_file.read().decode("utf-8", "replace").strip()))
+
+            instructions = None
+            if stats:
+                with open(stats_path) as file:
+                    instructions = int(file.read())
+
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        rss = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+
+        return wall, rss, instructions
+
+    def fastest(self, source, stdin="", stats=False):
+        """
+        Runs program repeatedly
+        :return: Fastest wall time, highest peak RSS and number of executed instructions
+        """
+        runs = [self.run_program(source, stdin, stats) for _ in range(self.repeat)]
+
+        return min(run[0] for run in runs), max(run[1] for run in runs), runs[0][2]
+
+    def measure_startup(self):
+        """
+        Measures run of empty program, which is start of Python and import of interpreter
+        :return: Startup time in seconds
+        """
+        if self.startup is None:
+            self.startup = self.fastest(to_xml([]))[0]
+
+        return self.startup
+
+    def measure(self, workload: Workload):
+        """
+        Measures workload, load time is taken from run of same program, which jumps over all its instructions
+        :param workload: Measured workload
+        :return: Dictionary with result of workload, ips is None if run time is below noise
+        """
+        startup = self.measure_startup()
+        loaded = self.fastest(workload.source(skip=True), workload.stdin)[0]
+        total, rss, instructions = self.fastest(workload.source(), workload.stdin, stats=True)
+        run = max(total - loaded, 0.0)
+
+        return {
+            "size": workload.size,
+            "instructions": instructions,
+            "startup": startup,
+            "load": max(loaded - startup, 0.0),
+            "run": run,
+            "ips": instructions / run if run >= MIN_TIME_DIFFERENCE else None,
+            "rss": rss,
+        }
+
+    def measure_all(self, workloads):
+        """
+        Measures workloads
+        :param workloads: List of workloads
+        :return: Baseline dictionary, which can be saved as JSON
+        """
+        return {
+            "version": BASELINE_VERSION,
+            "options": self.options,
+            "python": sys.version.split()[0],
+            "results": {workload.name: self.measure(workload) for workload in workloads},
+        }
+
+
+def save_baseline(path, baseline):
+    """
+    Writes results as JSON baseline
+    :param path: Baseline file path
+    :param baseline: Results of measure_all
+    """
+    with open(path, "w") as file:
+        json.dump(baseline, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def load_baseline(path):
+    """
+    Reads JSON baseline
+    :param path: Baseline file path
+    :return: Baseline dictionary
+    """
+    with open(path) as file:
+        baseline = json.load(file)
+
+    if baseline.get("version") != BASELINE_VERSION:
+        raise BenchmarkError("unsupported baseline version")
+
+    return baseline
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Finds regressions of current results against baseline, only workloads with same size are compared
+    :param baseline: Baseline dictionary
+    :param current: Current results
+    :param threshold: Allowed relative slowdown, 0.1 is 10 %
+    :return: List of regression descriptions
+    """
+    regressions = []
+
+    for name, result in sorted(current["results"].items()):
+        base = baseline["results"].get(name)
+        if base is None or base["size"] != result["size"]:
+            continue
+
+        # Speed measured below noise is not compared
+        if result["ips"] is not None and base["ips"] is not None and result["ips"] < base["ips"] * (1 - threshold) \
+                and result["run"] - base["run"] > MIN_TIME_DIFFERENCE:
+            regressions.append("%s: ips %.0f < %.0f" % (name, result["ips"], base["ips"]))
+
+        for key in ("startup", "load"):
+            if result[key] > base[key] * (1 + threshold) and result[key] - base[key] > MIN_TIME_DIFFERENCE:
+                regressions.append("%s: %s %.4f s > %.4f s" % (name, key, result[key], base[key]))
+
+        if result["rss"] > base["rss"] * (1 + threshold):
+            regressions.append("%s: rss %d KiB > %d KiB" % (name, result["rss"], base["rss"]))
+
+    return regressions
+
+
+def format_results(results):
+    """
+    Formats results as text table
+    :param results: Results of measure_all
+    :return: Human readable table
+    """
+    lines = ["%-12s %10s %12s %14s %10s %10s %10s %10s" % (
+        "Workload", "Size", "Insts", "Insts/s", "Startup", "Load", "Run", "RSS [KiB]")]
+    for name, result in results["results"].items():
+        ips = "%.0f" % result["ips"] if result["ips"] is not None else "-"
+        lines.append("%-12s %10d %12d %14s %10.4f %10.4f %10.4f %10d" % (
+            name, result["size"], result["instructions"], ips, result["startup"], result["load"],
+            result["run"], result["rss"]))
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,211 @@
+from xml.sax.saxutils import escape
+
+LABEL_INSTRUCTIONS = ["LABEL", "JUMP", "CALL", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS"]
+
+# Label used to skip whole workload when only loading of program is measured
+SKIP_LABEL = "$benchmark_skip"
+
+
+class Workload:
+    def __init__(self, name, size, lines, stdin=""):
+        """
+        Sets generated workload
+        :param name: Workload name
+        :param size: Size parameter used for generating
+        :param lines: IPPcode18 instructions without header
+        :param stdin: Text read by READ instructions
+        """
+        self.name = name
+        self.size = size
+        self.lines = lines
+        self.stdin = stdin
+
+    def source(self, skip=False):
+        """
+        Creates XML source of workload
+        :param skip: If true, program jumps over all instructions, so only loading is measured
+        :return: XML source
+        """
+        lines = self.lines
+        if skip:
+            lines = ["JUMP %s" % SKIP_LABEL] + lines + ["LABEL %s" % SKIP_LABEL]
+
+        return to_xml(lines)
+
+
+def to_xml(lines):
+    """
+    Converts IPPcode18 instructions to XML representation read by interpret.py
+    :param lines: Instructions, arguments are separated by spaces
+    :return: XML source
+    """
+    xml = ['<?xml version="1.0" encoding="UTF-8"?>', '<program language="IPPcode18">']
+
+    for order, line in enumerate(lines, 1):
+        parts = line.split()
+        opcode = parts[0]
+        xml.append('<instruction order="%d" opcode="%s">' % (order, opcode))
+        for number, arg in enumerate(parts[1:], 1):
+            if number == 1 and opcode in LABEL_INSTRUCTIONS:
+                arg_type, value = "label", arg
+            elif number == 2 and opcode == "READ":
+                arg_type, value = "type", arg
+            elif arg[:3] in ("GF@", "LF@", "TF@"):
+                arg_type, value = "var", arg
+            else:
+                arg_type, value = arg.split("@", 1)
+            xml.append('<arg%d type="%s">%s</arg%d>' % (number, arg_type, escape(value), number))
+        xml.append("</instruction>")
+
+    xml.append("</program>")
+    return "\n".join(xml) + "\n"
+
+
+def counted_loop(label, counter, count, body):
+    """
+    Creates loop repeating body
+    :param label: Loop label
+    :param counter: Global counter variable name
+    :param count: Number of iterations, at least 1
+    :param body: Loop body instructions
+    :return: Instructions
+    """
+    return ["DEFVAR GF@%s" % counter, "MOVE GF@%s int@0" % counter, "LABEL %s" % label] + body + [
+        "ADD GF@%s GF@%s int@1" % (counter, counter),
+        "JUMPIFNEQ %s GF@%s int@%d" % (label, counter, count)]
+
+
+def arithmetic(size):
+    """
+    Tight loop of integer and float arithmetic and relation operators
+    :param size: Number of iterations
+    """
+    lines = ["DEFVAR GF@a", "MOVE GF@a int@1", "DEFVAR GF@f", "MOVE GF@f float@0x1p+0", "DEFVAR GF@less"]
+    lines += counted_loop("loop", "i", size, [
+        "ADD GF@a GF@a GF@i",
+        "MUL GF@a GF@a int@3",
+        "IDIV GF@a GF@a int@4",
+        "SUB GF@a GF@a int@1",
+        "MUL GF@f GF@f float@0x1.8p+0",
+        "DIV GF@f GF@f float@0x1.8p+0",
+        "LT GF@less GF@a GF@i",
+    ])
+
+    return Workload("arithmetic", size, lines + ["WRITE GF@a"])
+
+
+def recursion(size, depth=500):
+    """
+    Recursive function, every call creates and pushes its own local frame
+    :param size: Total number of calls
+    :param depth: Depth of one recursion
+    """
+    lines = counted_loop("loop", "i", max(size // depth, 1), [
+        "CREATEFRAME",
+        "DEFVAR TF@n",
+        "MOVE TF@n int@%d" % depth,
+        "CALL rec",
+    ])
+    lines += [
+        "JUMP end",
+        "LABEL rec",
+        "PUSHFRAME",
+        "DEFVAR LF@next",
+        "JUMPIFEQ rec_end LF@n int@0",
+        "SUB LF@next LF@n int@1",
+        "CREATEFRAME",
+        "DEFVAR TF@n",
+        "MOVE TF@n LF@next",
+        "CALL rec",
+        "LABEL rec_end",
+        "POPFRAME",
+        "RETURN",
+        "LABEL end",
+    ]
+
+    return Workload("recursion", size, lines)
+
+
+def strings(size):
+    """
+    Builds string by CONCAT one character at a time and rewrites it by SETCHAR
+    :param size: Length of built string
+    """
+    lines = ["DEFVAR GF@s", "MOVE GF@s string@", "DEFVAR GF@c", "DEFVAR GF@n"]
+    lines += counted_loop("build", "i", size, ["CONCAT GF@s GF@s string@a"])
+    lines += ["STRLEN GF@n GF@s"]
+    lines += counted_loop("edit", "j", size, [
+        "GETCHAR GF@c GF@s GF@j",
+        "SETCHAR GF@s GF@j string@b",
+    ])
+
+    return Workload("strings", size, lines + ["WRITE GF@n"])
+
+
+def stack(size):
+    """
+    Loop computed only by stack instructions
+    :param size: Number of iterations
+    """
+    lines = ["DEFVAR GF@i", "MOVE GF@i int@0", "DEFVAR GF@x", "DEFVAR GF@odd", "LABEL loop",
+             "PUSHS GF@i", "PUSHS int@2", "MULS", "PUSHS int@1", "ADDS", "POPS GF@x",
+             "PUSHS GF@x", "PUSHS GF@i", "GTS", "PUSHS bool@true", "ANDS", "POPS GF@odd",
+             "PUSHS GF@i", "PUSHS int@1", "ADDS", "POPS GF@i",
+             "PUSHS GF@i", "PUSHS int@%d" % size, "JUMPIFNEQS loop"]
+
+    return Workload("stack", size, lines + ["WRITE GF@x"])
+
+
+def global_frame(size, variables=1000):
+    """
+    Large global frame, every iteration updates every variable
+    :param size: Total number of updates
+    :param variables: Number of global variables
+    """
+    lines = []
+    for number in range(variables):
+        lines += ["DEFVAR GF@v%d" % number, "MOVE GF@v%d int@0" % number]
+    lines += counted_loop("loop", "i", max(size // variables, 1),
+                          ["ADD GF@v%d GF@v%d GF@i" % (number, number) for number in range(variables)])
+
+    return Workload("globals", size, lines)
+
+
+def input_output(size):
+    """
+    Reads lines of integers and strings and writes them back
+    :param size: Number of read lines
+    """
+    lines = ["DEFVAR GF@x", "DEFVAR GF@s"]
+    lines += counted_loop("loop", "i", max(size // 2, 1), [
+        "READ GF@x int",
+        "READ GF@s string",
+        "WRITE GF@x",
+        "WRITE GF@s",
+    ])
+    stdin = "".join("%d\nline %d\n" % (number, number) for number in range(max(size // 2, 1)))
+
+    return Workload("io", size, lines, stdin)
+
+
+# Generator and default size of every workload
+WORKLOADS = {
+    "arithmetic": (arithmetic, 100000),
+    "recursion": (recursion, 50000),
+    "strings": (strings, 50000),
+    "stack": (stack, 50000),
+    "globals": (global_frame, 100000),
+    "io": (input_output, 100000),
+}
+
+
+def generate(name, size=None):
+    """
+    Generates workload
+    :param name: Workload name
+    :param size: Size parameter, default size of workload if not set
+    :return: Workload
+    """
+    generator, default_size = WORKLOADS[name]
+
+    return generator(default_size if size is None else size)
@@ -0,0 +1,511 @@
+import hashlib
+import math
+import sys
+from engine import ThreadedEngine
+from string_builder import StringBuilder
+from variables import Variable, TYPE_INT, TYPE_BOOL, TYPE_STRING, TYPE_FLOAT, FRAME_GLOBAL, FRAME_TEMPORARY, \
+    FRAME_LOCAL, BOOL_VALUES
+
+# Version of generated code, code cached by other version is not used
+COMPILER_VERSION = 1
+
+# Instructions, which end basic block, next instruction starts new block
+BLOCK_ENDS = ["JUMP", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS", "CALL", "RETURN", "BREAK"]
+
+# Jumps, which can close loop of one block
+LOOP_JUMPS = ["JUMP", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS"]
+
+ARITMETIC_OPERATIONS = {"ADD": "+", "SUB": "-", "MUL": "*", "IDIV": "//", "DIV": "/"}
+
+# Operand types handled by generated code, other types are checked and reported by instruction handler
+ARITMETIC_TYPES = {"ADD": (TYPE_INT, TYPE_FLOAT), "SUB": (TYPE_INT, TYPE_FLOAT), "MUL": (TYPE_INT, TYPE_FLOAT),
+                   "IDIV": (TYPE_INT,), "DIV": (TYPE_FLOAT,)}
+
+RELATION_OPERATORS = {"LT": "<", "GT": ">", "EQ": "=="}
+
+# Strings are compared by handler, because string variable can keep StringBuilder
+RELATION_TYPES = (TYPE_INT, TYPE_BOOL, TYPE_FLOAT)
+
+BOOL_OPERATORS = {"AND": "and", "OR": "or"}
+
+CONDITIONAL_JUMPS = {"JUMPIFEQ": ("==", "is_equal"), "JUMPIFNEQ": ("!=", "is_not_equal")}
+
+STACK_CONDITIONAL_JUMPS = {"JUMPIFEQS": "is_equal", "JUMPIFNEQS": "is_not_equal"}
+
+# Instruction, result type, operand type and Python expression of one operand conversion
+CONVERSIONS = {"INT2FLOAT": (TYPE_FLOAT, TYPE_INT, "float(%s)"), "FLOAT2INT": (TYPE_INT, TYPE_FLOAT, "int(%s)"),
+               "STRLEN": (TYPE_INT, TYPE_STRING, "len(%s)")}
+
+LITERAL_TYPES = {"int": TYPE_INT, "bool": TYPE_BOOL, "string": TYPE_STRING, "float": TYPE_FLOAT}
+
+FRAME_NAMES = {FRAME_TEMPORARY: "tf", FRAME_LOCAL: "lf"}
+
+# Variable found by generated code instead of undefined one, it fails every type check
+MISSING = Variable(None)
+MISSING.variable_type = -1
+
+
+class CompiledEngine:
+    def __init__(self, interpret, cache=None):
+        """
+        Translates basic blocks of loaded program to Python functions
+        :param interpret: InterpretFactory with loaded program and resolved labels
+        :param cache: ProgramCache, which keeps compiled code of blocks
+        """
+        self.interpret = interpret
+        # Instructions without generated fast path are run by threaded engine handlers
+        self.threaded_engine = ThreadedEngine(interpret)
+        self.leaders = self.find_leaders(interpret.instructions)
+        self.source = self.generate()
+
+        namespace = self.namespace()
+        exec(self.compile(self.source, cache), namespace)
+        self.blocks = [None] * len(interpret.instructions)
+        for start in self.leaders:
+            self.blocks[start] = namespace["block_%d" % start]
+
+    def run(self):
+        """
+        Runs compiled program, every block returns index of next block
+        """
+        blocks = self.blocks
+        inst_len = len(blocks)
+        current_inst = 0
+
+        while current_inst < inst_len:
+            current_inst = blocks[current_inst]()
+
+    @staticmethod
+    def find_leaders(instructions):
+        """
+        Finds first instructions of basic blocks, jumps land on resolved label targets
+        and RETURN continues after CALL
+        :param instructions: Loaded instructions with resolved labels
+        :return: Sorted list of block starts
+        """
+        inst_len = len(instructions)
+        leaders = {0} if instructions else set()
+
+        for index, instruction in enumerate(instructions):
+            if instruction["opcode"] in BLOCK_ENDS:
+                leaders.add(index + 1)
+                if instruction["opcode"] not in ("RETURN", "BREAK") and instruction["args"][0][2] is not None:
+                    leaders.add(instruction["args"][0][2])
+
+        return sorted(leader for leader in leaders if leader < inst_len)
+
+    def generate(self):
+        """
+        Generates Python source with one function for every basic block
+        :return: Python source
+        """
+        instructions = self.interpret.instructions
+        bounds = self.leaders + [len(instructions)]
+
+        return "".join(BlockGenerator(instructions, start, end).generate() for start, end in zip(bounds, bounds[1:]))
+
+    @staticmethod
+    def compile(source, cache):
+        """
+        Compiles generated source, code is reused from cache if the same source was compiled before
+        :param source: Python source
+        :param cache: ProgramCache or None
+        :return: Code object
+        """
+        key = hashlib.sha256(("%d:%s:" % (COMPILER_VERSION, sys.implementation.cache_tag)).encode("utf-8") +
+                             source.encode("utf-8")).digest()
+
+        code = cache.load_code(key) if cache is not None else None
+        if code is None:
+            code = compile(source, "<IPPcode18 blocks>", "exec")
+            if cache is not None:
+                cache.store_code(key, code)
+
+        return code
+
+    def namespace(self):
+        """
+        Creates globals of generated code
+        """
+        interpret = self.interpret
+
+        return {
+            "interpret": interpret,
+            "frames": interpret.frames,
+            "gf_get": interpret.frames.global_frame.get,
+            "calls": interpret.calls,
+            "vf": interpret.variables_factory,
+            "se": self.threaded_engine.stack_engine,
+            "P": self.threaded_engine.program,
+            "A": [instruction["args"] for instruction in interpret.instructions],
+            "M": MISSING,
+            "SB": StringBuilder,
+        }
+
+
+class BlockGenerator:
+    def __init__(self, instructions, start, end):
+        """
+        Sets generated block
+        :param instructions: Loaded instructions
+        :param start: Index of first instruction of block
+        :param end: Index after last instruction of block
+        """
+        self.instructions = instructions
+        self.start = start
+        self.end = end
+        self.lines = []
+        self.indent = 1
+        self.executed = 0
+        self.variables = {}
+
+        last = instructions[end - 1]
+        self.loop = last["opcode"] in LOOP_JUMPS and last["args"][0][2] == start
+
+        # Every variable of block is looked up once and again only after its frame changes
+        for instruction in instructions[start:end]:
+            for arg in instruction["args"]:
+                if arg[0] == "var" and (arg[2], arg[3]) not in self.variables:
+                    self.variables[(arg[2], arg[3])] = "v%d" % len(self.variables)
+
+    def generate(self):
+        """
+        Generates function of block
+        :return: Python source
+        """
+        self.emit("def block_%d():" % self.start, 0)
+        self.lookup(FRAME_GLOBAL, FRAME_TEMPORARY, FRAME_LOCAL)
+
+        if self.loop:
+            # Block jumping to itself is run as Python loop, executed instructions are counted locally
+            self.emit("total = 0")
+            self.emit("while True:")
+            self.indent += 1
+
+        for index in range(self.start, self.end):
+            instruction = self.instructions[index]
+            self.instruction(index, instruction["opcode"], instruction["args"])
+            self.executed += 1
+
+        if self.instructions[self.end - 1]["opcode"] not in ("JUMP", "CALL", "RETURN", "BREAK"):
+            self.exit(self.executed, self.end)
+
+        return "\n".join(self.lines) + "\n"
+
+    def emit(self, line, indent=None):
+        """
+        Adds line of generated code
+        :param line: Python code
+        :param indent: Indentation level, current level if not set
+        """
+        self.lines.append("    " * (self.indent if indent is None else indent) + line)
+
+    def lookup(self, *kinds):
+        """
+        Looks up variables of frames, undefined variable is replaced by MISSING
+        :param kinds: Frame kinds
+        """
+        for kind in (FRAME_TEMPORARY, FRAME_LOCAL):
+            if kind in kinds and any(key[0] == kind for key in self.variables):
+                self.emit("%s = frames.%s" % (FRAME_NAMES[kind], "temporary_frame" if kind == FRAME_TEMPORARY
+                                              else "local_frame"))
+
+        for (kind, name), local in self.variables.items():
+            if kind in kinds:
+                self.lookup_variable(kind, name, local)
+
+    def lookup_variable(self, kind, name, local):
+        """
+        Looks up one variable
+        :param kind: Frame kind
+        :param name: Variable name
+        :param local: Local name of variable in generated code
+        """
+        if kind == FRAME_GLOBAL:
+            self.emit("%s = gf_get(%r, M)" % (local, name))
+        else:
+            frame = FRAME_NAMES[kind]
+            self.emit("%s = %s.get(%r, M) if %s is not None else M" % (local, frame, name, frame))
+
+    def exit(self, executed, target):
+        """
+        Leaves block or continues its loop
+        :param executed: Number of executed instructions of block including jumps counted twice
+        :param target: Index of next instruction
+        """
+        if self.loop and target == self.start:
+            self.emit("total += %d" % executed)
+            self.emit("continue")
+        else:
+            self.emit("interpret.total_inst += %s%d" % ("total + " if self.loop else "", executed))
+            self.emit("return %d" % target)
+
+    def handler(self, index):
+        """
+        Runs instruction by threaded engine handler, which does all checks of instruction
+        :param index: Instruction index
+        """
+        self.emit("P[%d](%d)" % (index, index))
+
+    def guarded(self, index, conditions, body):
+        """
+        Runs body if all conditions hold, otherwise instruction handler reports error or handles unusual types
+        :param index: Instruction index
+        :param conditions: Python conditions or None if instruction is always run by handler
+        :param body: Python statements
+        """
+        if conditions is None:
+            self.handler(index)
+            return
+
+        if conditions:
+            self.emit("if %s:" % " and ".join(conditions))
+            self.indent += 1
+        for line in body:
+            self.emit(line)
+        if conditions:
+            self.indent -= 1
+            self.emit("else:")
+            self.indent += 1
+            self.handler(index)
+            self.indent -= 1
+
+    def symbol(self, symb):
+        """
+        Gets static type, type expression and value expression of operand
+        :param symb: Operand
+        :return: Literal type or None for variable, type expression and value expression
+        """
+        if symb[0] == "var":
+            local = self.variables[(symb[2], symb[3])]
+            return None, local + ".variable_type", local + ".value"
+
+        return LITERAL_TYPES[symb[0]], None, literal(symb[1])
+
+    def typed(self, symbols, allowed):
+        """
+        Creates type conditions of operands, which must have the same type from allowed types
+        :param symbols: Operands
+        :param allowed: Allowed types
+        :return: Conditions, result type expression and value expressions or None if types can not match
+        """
+        operands = [self.symbol(symb) for symb in symbols]
+        values = [value for _, _, value in operands]
+        static = [symb_type for symb_type, _, _ in operands if symb_type is not None]
+
+        if static:
+            symb_type = static[0]
+            if symb_type not in allowed or any(other != symb_type for other in static):
+                return None
+            return ["%s == %d" % (type_expr, symb_type) for static_type, type_expr, _ in operands
+                    if static_type is None], str(symb_type), values
+
+        # Type of first variable is read once and compared with the others
+        self.emit("t = %s" % operands[0][1])
+        conditions = ["t == %s" % type_expr for _, type_expr, _ in operands[1:]]
+        if len(allowed) == 1:
+            conditions.append("t == %d" % allowed[0])
+        else:
+            conditions.append("(%s)" % " or ".join("t == %d" % allowed_type for allowed_type in allowed))
+
+        return conditions, "t", values
+
+    def destination(self, var):
+        """
+        Gets local name of result variable and condition of its existence
+        """
+        local = self.variables[(var[2], var[3])]
+
+        return local, "%s is not M" % local
+
+    def instruction(self, index, opcode, args):
+        """
+        Generates code of one instruction
+        :param index: Instruction index
+        :param opcode: Instruction code
+        :param args: Instruction arguments
+        """
+        if opcode == "LABEL":
+            return
+        elif opcode == "MOVE":
+            self.move(index, args)
+        elif opcode in ARITMETIC_OPERATIONS:
+            self.binary(index, args, ARITMETIC_TYPES[opcode], ARITMETIC_OPERATIONS[opcode], None,
+                        opcode in ("IDIV", "DIV"))
+        elif opcode in RELATION_OPERATORS:
+            self.binary(index, args, RELATION_TYPES, RELATION_OPERATORS[opcode], TYPE_BOOL)
+        elif opcode in BOOL_OPERATORS:
+            self.binary(index, args, (TYPE_BOOL,), BOOL_OPERATORS[opcode], TYPE_BOOL)
+        elif opcode == "NOT":
+            self.unary(index, args, TYPE_BOOL, TYPE_BOOL, "not %s")
+        elif opcode in CONVERSIONS:
+            self.unary(index, args, *CONVERSIONS[opcode])
+        elif opcode == "WRITE":
+            self.write(index, args[0])
+        elif opcode == "DEFVAR":
+            self.handler(index)
+            self.lookup_variable(args[0][2], args[0][3], self.variables[(args[0][2], args[0][3])])
+        elif opcode in ("CREATEFRAME", "PUSHFRAME", "POPFRAME"):
+            self.handler(index)
+            self.lookup(FRAME_TEMPORARY, FRAME_LOCAL)
+        elif opcode == "JUMP":
+            self.jump(index, args[0], None)
+        elif opcode in CONDITIONAL_JUMPS:
+            self.conditional_jump(index, opcode, args)
+        elif opcode in STACK_CONDITIONAL_JUMPS:
+            self.jump(index, args[0], "se.%s()" % STACK_CONDITIONAL_JUMPS[opcode])
+        elif opcode == "CALL":
+            self.call(index, args[0])
+        elif opcode == "RETURN":
+            self.emit("interpret.total_inst += %s%d" % ("total + " if self.loop else "", self.executed + 1))
+            self.emit("return P[%d](%d)" % (index, index))
+        elif opcode == "BREAK":
+            # Debug info shows instructions executed before BREAK, BREAK itself is counted after it
+            self.emit("interpret.total_inst += %s%d" % ("total + " if self.loop else "", self.executed))
+            self.emit("interpret.print_debug_info(%d)" % index)
+            self.emit("interpret.total_inst += 1")
+            self.emit("return %d" % (index + 1))
+        else:
+            self.handler(index)
+
+    def move(self, index, args):
+        """
+        Generates MOVE
+        """
+        local, exists = self.destination(args[0])
+        symb_type, type_expr, value = self.symbol(args[1])
+
+        if symb_type is not None:
+            self.guarded(index, [exists], ["%s.variable_type = %d" % (local, symb_type),
+                                           "%s.value = %s" % (local, value)])
+        else:
+            self.emit("t = %s" % type_expr)
+            self.guarded(index, [exists, "t > 0"], ["value = %s" % value,
+                                                   "%s.value = str(value) if type(value) is SB else value" % local,
+                                                   "%s.variable_type = t" % local])
+
+    def binary(self, index, args, allowed, operator, result_type, divide=False):
+        """
+        Generates instruction with two operands of the same type
+        :param allowed: Operand types handled by generated code
+        :param operator: Python operator
+        :param result_type: Result type or None if it is type of operands
+        :param divide: If true, division by zero is left to handler
+        """
+        local, exists = self.destination(args[0])
+        typed = self.typed(args[1:], allowed)
+        if typed is None:
+            self.handler(index)
+            return
+
+        conditions, type_expr, values = typed
+        if divide:
+            conditions.append("%s != 0" % values[1])
+        self.guarded(index, [exists] + conditions,
+                     ["%s.value = %s %s %s" % (local, values[0], operator, values[1]),
+                      "%s.variable_type = %s" % (local, type_expr if result_type is None else result_type)])
+
+    def unary(self, index, args, result_type, allowed, expression):
+        """
+        Generates instruction with one operand
+        :param result_type: Result type
+        :param allowed: Operand type handled by generated code
+        :param expression: Python expression of result
+        """
+        local, exists = self.destination(args[0])
+        typed = self.typed(args[1:], (allowed,))
+        if typed is None:
+            self.handler(index)
+            return
+
+        conditions, _, values = typed
+        self.guarded(index, [exists] + conditions, ["%s.value = %s" % (local, expression % values[0]),
+                                                    "%s.variable_type = %d" % (local, result_type)])
+
+    def write(self, index, symb):
+        """
+        Generates WRITE, text of literal is prepared at compile time
+        """
+        symb_type, type_expr, value = self.symbol(symb)
+
+        if symb_type is not None:
+            if symb_type == TYPE_FLOAT:
+                text = float.hex(symb[1])
+            elif symb_type == TYPE_BOOL:
+                text = BOOL_VALUES[symb[1]]
+            else:
+                text = str(symb[1])
+            self.emit("vf.stdout.write(%r)" % (text + "\n"))
+        else:
+            self.emit("t = %s" % type_expr)
+            self.guarded(index, ["(t == %d or t == %d)" % (TYPE_INT, TYPE_STRING)],
+                         ["vf.stdout.write(\"%%s\\n\" %% %s)" % value])
+
+    def jump(self, index, label, condition):
+        """
+        Generates JUMP or conditional jump
+        :param label: Label argument
+        :param condition: Python condition or None for unconditional jump
+        """
+        if label[2] is None:
+            # Undefined label is reported by handler only when jump is taken
+            self.emit("interpret.total_inst += %s%d" % ("total + " if self.loop else "", self.executed + 1))
+            self.emit("return P[%d](%d)" % (index, index))
+            return
+
+        if condition is None:
+            self.exit(self.executed + 2, label[2])
+            return
+
+        self.emit("if %s:" % condition)
+        self.indent += 1
+        self.exit(self.executed + 2, label[2])
+        self.indent -= 1
+
+    def conditional_jump(self, index, opcode, args):
+        """
+        Generates JUMPIFEQ or JUMPIFNEQ, condition of unusual types is evaluated by VariablesFactory
+        """
+        operator, method = CONDITIONAL_JUMPS[opcode]
+        fallback = "vf.%s(A[%d][1], A[%d][2])" % (method, index, index)
+
+        if args[0][2] is None:
+            self.jump(index, args[0], None)
+            return
+
+        typed = self.typed(args[1:], RELATION_TYPES)
+        if typed is None:
+            self.jump(index, args[0], fallback)
+            return
+
+        conditions, _, values = typed
+        if conditions:
+            self.emit("if %s:" % " and ".join(conditions))
+            self.emit("    c = %s %s %s" % (values[0], operator, values[1]))
+            self.emit("else:")
+            self.emit("    c = %s" % fallback)
+            self.jump(index, args[0], "c")
+        else:
+            self.jump(index, args[0], "%s %s %s" % (values[0], operator, values[1]))
+
+    def call(self, index, label):
+        """
+        Generates CALL
+        """
+        if label[2] is None:
+            self.jump(index, label, None)
+            return
+
+        self.emit("calls.append(%d)" % index)
+        self.exit(self.executed + 2, label[2])
+
+
+def literal(value):
+    """
+    Creates Python expression of literal value
+    :param value: Int, float, bool or string
+    """
+    if type(value) is float and not math.isfinite(value):
+        return "float.fromhex(%r)" % float.hex(value)
+
+    return repr(value)
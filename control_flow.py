@@ -0,0 +1,379 @@
+import bisect
+import json
+
+# Instructions, which end basic block
+BLOCK_ENDS = ["JUMP", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS", "CALL", "RETURN"]
+
+CONDITIONAL_JUMPS = ["JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS"]
+
+CFG_FORMATS = ["json", "dot"]
+
+# Edge kinds, branch is taken conditional jump, call enters function and return continues after its CALL
+EDGE_STYLES = {"fallthrough": "solid", "jump": "solid", "branch": "solid", "call": "dashed", "return": "dotted"}
+
+
+class BasicBlock:
+    __slots__ = ("id", "start", "end", "successors", "predecessors", "reachable", "idom", "loop")
+
+    def __init__(self, block_id, start, end):
+        """
+        Sets block of instructions, which are always run together
+        :param block_id: Index of block in graph
+        :param start: Index of first instruction
+        :param end: Index after last instruction
+        """
+        self.id = block_id
+        self.start = start
+        self.end = end
+        self.successors = []
+        self.predecessors = []
+        self.reachable = False
+        self.idom = None
+        self.loop = None
+
+
+class Loop:
+    __slots__ = ("id", "header", "blocks", "back_edges", "parent", "depth")
+
+    def __init__(self, loop_id, header):
+        """
+        Sets natural loop
+        :param loop_id: Index of loop in graph
+        :param header: Block, which dominates all blocks of loop
+        """
+        self.id = loop_id
+        self.header = header
+        self.blocks = {header}
+        self.back_edges = []
+        self.parent = None
+        self.depth = 1
+
+
+class ControlFlowGraph:
+    def __init__(self, instructions):
+        """
+        Splits instructions to basic blocks and connects them by edges, RETURN is connected to instructions
+        after CALLs of functions, which reach it without another CALL
+        :param instructions: Loaded instructions with resolved labels
+        """
+        self.instructions = instructions
+        self.blocks = []
+        self.loops = []
+        self.edges = 0
+        self.analysed = False
+
+        starts = self.leaders()
+        for start, end in zip(starts, starts[1:] + [len(instructions)]):
+            self.blocks.append(BasicBlock(len(self.blocks), start, end))
+        self.starts = starts
+        self.block_starts = {block.start: block for block in self.blocks}
+        # Preorder and postorder numbers of blocks in dominator tree
+        self.dominator_enter = []
+        self.dominator_exit = []
+
+        call_sites = {}
+        for block in self.blocks:
+            instruction = instructions[block.end - 1]
+            opcode = instruction["opcode"]
+            target = instruction["args"][0][2] if opcode in BLOCK_ENDS and opcode != "RETURN" else None
+
+            # Jump to undefined label ends program with error, jump to label at program end ends program
+            if target is not None:
+                kind = "call" if opcode == "CALL" else "branch" if opcode in CONDITIONAL_JUMPS else "jump"
+                self.connect(block, self.block_starts.get(target), kind)
+                if opcode == "CALL" and target in self.block_starts:
+                    call_sites.setdefault(target, []).append(block.end)
+            if opcode not in BLOCK_ENDS or opcode in CONDITIONAL_JUMPS:
+                self.connect(block, self.block_starts.get(block.end), "fallthrough")
+
+        for function, returns in call_sites.items():
+            for block in self.function_returns(self.block_starts[function]):
+                for index in returns:
+                    self.connect(block, self.block_starts.get(index), "return")
+
+    def leaders(self):
+        """
+        Finds first instructions of basic blocks, jumps land on resolved label targets
+        and RETURN continues after CALL
+        :return: Sorted list of block starts
+        """
+        instructions = self.instructions
+        inst_len = len(instructions)
+        leaders = {0} if inst_len else set()
+
+        for index, instruction in enumerate(instructions):
+            if instruction["opcode"] in BLOCK_ENDS:
+                leaders.add(index + 1)
+                if instruction["opcode"] != "RETURN" and instruction["args"][0][2] is not None:
+                    leaders.add(instruction["args"][0][2])
+
+        return sorted(leader for leader in leaders if leader < inst_len)
+
+    def connect(self, block, successor, kind):
+        """
+        Adds edge, edge to end of program is not added
+        :param kind: Edge kind
+        """
+        if successor is None:
+            return
+
+        block.successors.append((successor, kind))
+        successor.predecessors.append((block, kind))
+        self.edges += 1
+
+    def function_returns(self, entry):
+        """
+        Finds RETURN blocks reached from function entry, CALL inside function continues after it
+        :param entry: First block of function
+        :return: List of blocks
+        """
+        returns = []
+        visited = {entry.id}
+        pending = [entry]
+
+        while pending:
+            block = pending.pop()
+            opcode = self.instructions[block.end - 1]["opcode"]
+            if opcode == "RETURN":
+                returns.append(block)
+                continue
+
+            following = [successor for successor, kind in block.successors if kind != "call"]
+            if opcode == "CALL" and block.end in self.block_starts:
+                following.append(self.block_starts[block.end])
+            for successor in following:
+                if successor.id not in visited:
+                    visited.add(successor.id)
+                    pending.append(successor)
+
+        return returns
+
+    def block_at(self, index):
+        """
+        Finds block of instruction
+        :param index: Instruction index
+        :return: BasicBlock
+        """
+        return self.blocks[bisect.bisect_right(self.starts, index) - 1]
+
+    def analyse(self):
+        """
+        Finds reachable blocks, dominators and loop nesting
+        :return: Analysed graph
+        """
+        if not self.analysed and self.blocks:
+            order = self.reverse_postorder()
+            self.find_dominators(order)
+            self.find_loops(order)
+        self.analysed = True
+
+        return self
+
+    def reverse_postorder(self):
+        """
+        Marks blocks reachable from program start
+        :return: Reachable blocks in reverse postorder
+        """
+        postorder = []
+        entry = self.blocks[0]
+        entry.reachable = True
+        stack = [(entry, iter(entry.successors))]
+
+        while stack:
+            block, successors = stack[-1]
+            for successor, _ in successors:
+                if not successor.reachable:
+                    successor.reachable = True
+                    stack.append((successor, iter(successor.successors)))
+                    break
+            else:
+                stack.pop()
+                postorder.append(block)
+
+        postorder.reverse()
+
+        return postorder
+
+    def find_dominators(self, order):
+        """
+        Finds immediate dominators by iterative algorithm of Cooper, Harvey and Kennedy
+        :param order: Reachable blocks in reverse postorder
+        """
+        position = [0] * len(self.blocks)
+        for number, block in enumerate(order):
+            position[block.id] = number
+        entry = order[0]
+        entry.idom = entry
+        changed = True
+
+        while changed:
+            changed = False
+            for block in order[1:]:
+                idom = None
+                for predecessor, _ in block.predecessors:
+                    if predecessor.idom is None:
+                        continue
+                    if idom is None:
+                        idom = predecessor
+                        continue
+                    # Walk up from both blocks until they meet
+                    other = predecessor
+                    while idom is not other:
+                        while position[idom.id] > position[other.id]:
+                            idom = idom.idom
+                        while position[other.id] > position[idom.id]:
+                            other = other.idom
+                if block.idom is not idom:
+                    block.idom = idom
+                    changed = True
+
+        entry.idom = None
+        self.number_dominator_tree(order)
+
+    def number_dominator_tree(self, order):
+        """
+        Numbers blocks by walk of dominator tree, so dominance is checked without walking up the tree
+        :param order: Reachable blocks in reverse postorder
+        """
+        children = {}
+        for block in order[1:]:
+            children.setdefault(block.idom.id, []).append(block)
+
+        self.dominator_enter = [-1] * len(self.blocks)
+        self.dominator_exit = [-1] * len(self.blocks)
+        counter = 0
+        stack = [(order[0], False)]
+        while stack:
+            block, finished = stack.pop()
+            if finished:
+                self.dominator_exit[block.id] = counter
+            else:
+                self.dominator_enter[block.id] = counter
+                stack.append((block, True))
+                stack.extend((child, False) for child in children.get(block.id, []))
+            counter += 1
+
+    def dominates(self, dominator, block):
+        """
+        Checks if every path from program start to block goes through dominator
+        """
+        if not dominator.reachable or not block.reachable:
+            return False
+
+        return self.dominator_enter[dominator.id] <= self.dominator_enter[block.id] and \
+            self.dominator_exit[block.id] <= self.dominator_exit[dominator.id]
+
+    def find_loops(self, order):
+        """
+        Finds natural loops of back edges, loops with the same header are merged
+        :param order: Reachable blocks in reverse postorder
+        """
+        headers = {}
+        for block in order:
+            for successor, _ in block.successors:
+                if self.dominates(successor, block):
+                    loop = headers.get(successor.id)
+                    if loop is None:
+                        loop = headers[successor.id] = Loop(len(self.loops), successor)
+                        self.loops.append(loop)
+                    loop.back_edges.append(block)
+
+        for loop in self.loops:
+            pending = [block for block in loop.back_edges if block is not loop.header]
+            loop.blocks.update(pending)
+            while pending:
+                block = pending.pop()
+                for predecessor, _ in block.predecessors:
+                    if predecessor.reachable and predecessor not in loop.blocks:
+                        loop.blocks.add(predecessor)
+                        pending.append(predecessor)
+
+        # Outer loops are assigned first, so every block ends in its innermost loop
+        for loop in sorted(self.loops, key=lambda loop: -len(loop.blocks)):
+            loop.parent = loop.header.loop
+            if loop.parent is not None:
+                loop.depth = loop.parent.depth + 1
+            for block in loop.blocks:
+                block.loop = loop
+
+    def label(self, block):
+        """
+        Gets name of label, which precedes block
+        :return: Label name or None
+        """
+        if block.start > 0 and self.instructions[block.start - 1]["opcode"] == "LABEL":
+            return self.instructions[block.start - 1]["args"][0][1]
+
+        return None
+
+    def to_json(self):
+        """
+        Creates JSON serializable description of analysed graph
+        :return: Dictionary with blocks and loops
+        """
+        self.analyse()
+        blocks = []
+        for block in self.blocks:
+            blocks.append({
+                "id": block.id,
+                "start": block.start,
+                "end": block.end,
+                "label": self.label(block),
+                "opcodes": [instruction["opcode"] for instruction in self.instructions[block.start:block.end]],
+                "successors": [[successor.id, kind] for successor, kind in block.successors],
+                "reachable": block.reachable,
+                "idom": block.idom.id if block.idom is not None else None,
+                "loop": block.loop.id if block.loop is not None else None,
+                "depth": block.loop.depth if block.loop is not None else 0,
+            })
+
+        loops = [{"id": loop.id, "header": loop.header.id, "blocks": sorted(block.id for block in loop.blocks),
+                  "back_edges": [block.id for block in loop.back_edges],
+                  "parent": loop.parent.id if loop.parent is not None else None, "depth": loop.depth}
+                 for loop in self.loops]
+
+        return {"instructions": len(self.instructions), "blocks": blocks, "edges": self.edges, "loops": loops}
+
+    def to_dot(self):
+        """
+        Creates Graphviz description of analysed graph, blocks of loops are filled by depth of nesting
+        :return: DOT source
+        """
+        self.analyse()
+        lines = ["digraph cfg {", "    node [shape=box, style=filled, fillcolor=white];"]
+
+        for block in self.blocks:
+            label = self.label(block)
+            text = "B%d [%d, %d)%s\\n%s" % (block.id, block.start, block.end, "\\n" + label if label else "",
+                                          self.instructions[block.end - 1]["opcode"])
+            depth = block.loop.depth if block.loop is not None else 0
+            attributes = ["label=\"%s\"" % text.replace("\"", "\\\"")]
+            if depth:
+                attributes.append("fillcolor=\"0.0 %.2f 1.0\"" % min(1.0, 0.2 * depth))
+            if not block.reachable:
+                attributes.append("color=gray, fontcolor=gray")
+            lines.append("    B%d [%s];" % (block.id, ", ".join(attributes)))
+
+        for block in self.blocks:
+            for successor, kind in block.successors:
+                back = successor.loop is not None and block in successor.loop.back_edges and \
+                    successor.loop.header is successor
+                lines.append("    B%d -> B%d [style=%s%s];" % (block.id, successor.id, EDGE_STYLES[kind],
+                                                               ", color=red" if back else ""))
+
+        lines.append("}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, output_format="json"):
+        """
+        Writes analysed graph
+        :param path: Output file path
+        :param output_format: json or dot
+        """
+        with open(path, "w") as file:
+            if output_format == "dot":
+                file.write(self.to_dot())
+            else:
+                json.dump(self.to_json(), file, indent=1)
+                file.write("\n")
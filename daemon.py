@@ -0,0 +1,164 @@
+import argparse
+import io
+import os
+import signal
+import socket
+import sys
+import traceback
+from daemon_client import DEFAULT_SOCKET, DaemonError, decode_bytes, encode_bytes, receive_message, send_message
+from errors import IPPcodeError
+from interpreter import Interpreter
+from program_cache import MemoryProgramCache, DEFAULT_MEMORY_PROGRAMS
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+class Worker:
+    def __init__(self, server, cache_size=DEFAULT_MEMORY_PROGRAMS):
+        """
+        Sets listening socket and cache of loaded programs, which is kept for whole life of worker
+        :param server: Listening Unix socket
+        :param cache_size: Maximal number of cached programs
+        """
+        self.server = server
+        self.program_cache = MemoryProgramCache(cache_size)
+
+    def serve(self):
+        """
+        Accepts and handles connections until worker is terminated
+        """
+        while True:
+            connection, _ = self.server.accept()
+            with connection:
+                try:
+                    send_message(connection, self.handle(receive_message(connection)))
+                except (DaemonError, OSError, ValueError, KeyError):
+                    pass
+
+    def handle(self, request):
+        """
+        Runs one program
+        :param request: Dictionary with source path or XML source (xml), stdin, engine and optimize
+        :return: Dictionary with exit code, stdout, stderr and stats
+        """
+        program = decode_bytes(request["xml"]) if request.get("xml") is not None else request["source"]
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        stats = None
+
+        interpreter = Interpreter(program, request.get("engine", "threaded"), request.get("optimize", False),
+                                  self.program_cache)
+        try:
+            stats = interpreter.run(decode_bytes(request.get("stdin", "")), stdout, stderr).stats
+            exit_code = 0
+        except IPPcodeError as e:
+            stderr.write(e.report())
+            exit_code = e.exit_code
+        except Exception:
+            # Crash of program is reported like crash of interpret.py, worker keeps running
+            stderr.write(traceback.format_exc())
+            exit_code = 1
+
+        return {
+            "exit_code": exit_code,
+            "stdout": encode_bytes(stdout.getvalue().encode("utf-8")),
+            "stderr": encode_bytes(stderr.getvalue().encode("utf-8")),
+            "stats": stats,
+        }
+
+
+class Daemon:
+    def __init__(self, path=DEFAULT_SOCKET, workers=DEFAULT_WORKERS, cache_size=DEFAULT_MEMORY_PROGRAMS):
+        """
+        Sets daemon configuration
+        :param path: Path of Unix socket
+        :param workers: Number of worker processes
+        :param cache_size: Maximal number of cached programs in every worker
+        """
+        self.path = path
+        self.workers = workers
+        self.cache_size = cache_size
+        self.server = None
+        self.pids = set()
+        self.running = False
+
+    def serve(self):
+        """
+        Starts workers and restarts them when they die, runs until SIGTERM or SIGINT
+        """
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen(128)
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        try:
+            for _ in range(self.workers):
+                self.spawn()
+
+            while self.running:
+                try:
+                    pid, _ = os.wait()
+                except ChildProcessError:
+                    break
+                except InterruptedError:
+                    continue
+                if pid in self.pids:
+                    self.pids.discard(pid)
+                    if self.running:
+                        self.spawn()
+        finally:
+            self.server.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def spawn(self):
+        """
+        Forks worker, modules are already imported, so worker is warm from start
+        """
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                Worker(self.server, self.cache_size).serve()
+            finally:
+                os._exit(0)
+
+        self.pids.add(pid)
+
+    def stop(self, signum=None, frame=None):
+        """
+        Terminates workers
+        """
+        self.running = False
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def main():
+    """
+    Runs daemon with command line configuration
+    """
+    parser = argparse.ArgumentParser(description="Serves IPPcode18 runs over Unix socket by warm worker processes.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="socket path (default %s)" % DEFAULT_SOCKET)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="number of worker processes")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MEMORY_PROGRAMS,
+                        help="number of loaded programs cached by every worker")
+    args = parser.parse_args()
+
+    if args.workers < 1 or args.cache_size < 1:
+        parser.error("number of workers and cache size must be positive")
+
+    Daemon(args.socket, args.workers, args.cache_size).serve()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import base64
+import json
+import os
+import socket
+import struct
+
+DEFAULT_SOCKET = os.path.join(os.environ.get("TMPDIR", "/tmp"), "ippcode18-%d.sock" % os.getuid())
+
+# Length of JSON message, which follows it
+MESSAGE_HEADER = struct.Struct("<I")
+
+
+class DaemonError(Exception):
+    pass
+
+
+def send_message(connection, message):
+    """
+    Sends JSON message prefixed by its length
+    :param connection: Connected socket
+    :param message: Dictionary
+    """
+    data = json.dumps(message).encode("utf-8")
+    connection.sendall(MESSAGE_HEADER.pack(len(data)) + data)
+
+
+def receive_exactly(connection, size):
+    """
+    Receives given number of bytes
+    :param connection: Connected socket
+    :param size: Number of bytes
+    :return: Received data
+    """
+    chunks = []
+    while size > 0:
+        chunk = connection.recv(min(size, 1 << 20))
+        if not chunk:
+            raise DaemonError("connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return b"".join(chunks)
+
+
+def receive_message(connection):
+    """
+    Receives JSON message prefixed by its length
+    :param connection: Connected socket
+    :return: Dictionary
+    """
+    size, = MESSAGE_HEADER.unpack(receive_exactly(connection, MESSAGE_HEADER.size))
+
+    return json.loads(receive_exactly(connection, size).decode("utf-8"))
+
+
+def encode_bytes(data):
+    """
+    Encodes bytes to JSON string
+    """
+    return base64.b64encode(data).decode("ascii")
+
+
+def decode_bytes(text):
+    """
+    Decodes bytes from JSON string
+    """
+    return base64.b64decode(text.encode("ascii"))
+
+
+def connect(path=DEFAULT_SOCKET):
+    """
+    Connects to daemon
+    :param path: Path of daemon Unix socket
+    :return: Connected socket
+    :raise OSError: Daemon is not running
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(path)
+    except OSError:
+        connection.close()
+        raise
+
+    return connection
+
+
+def request(connection, program, stdin=b"", engine="threaded", optimize=False):
+    """
+    Runs program by daemon, connection is closed after response
+    :param connection: Socket connected to daemon
+    :param program: Path of XML source or XML source as bytes
+    :param stdin: Input of program as bytes
+    :param engine: Engine used for interpretation
+    :param optimize: If true, program is optimized
+    :return: Dictionary with exit code, stdout, stderr as bytes and stats
+    :raise DaemonError: Daemon closed connection without response
+    """
+    message = {"stdin": encode_bytes(stdin), "engine": engine, "optimize": optimize}
+    if isinstance(program, bytes):
+        message["xml"] = encode_bytes(program)
+    else:
+        message["source"] = os.path.abspath(program)
+
+    with connection:
+        send_message(connection, message)
+        response = receive_message(connection)
+
+    response["stdout"] = decode_bytes(response["stdout"])
+    response["stderr"] = decode_bytes(response["stderr"])
+
+    return response
@@ -0,0 +1,248 @@
+from errors import IPPcodeMissingValueError
+from functools import partial
+from optimizer import PeepholeOptimizer
+from stack_engine import StackEngine, STACK_INSTRUCTIONS
+from type_inference import TypedDecoder
+
+ARITMETIC_OPERATIONS = {"ADD": "add", "SUB": "sub", "MUL": "mul", "IDIV": "idiv", "DIV": "div"}
+
+RELATION_OPERATORS = {"LT": "lt", "GT": "gt", "EQ": "eq"}
+
+BOOL_OPERATORS = {"AND": "and", "OR": "or"}
+
+
+class DebugBreak(Exception):
+    pass
+
+
+class ThreadedEngine:
+    def __init__(self, interpret, optimize=False):
+        """
+        Decodes all loaded instructions to handlers
+        :param interpret: InterpretFactory with loaded program
+        :param optimize: If true, jumps are threaded and common sequences fused to superinstructions
+        """
+        self.interpret = interpret
+        self.stack_engine = StackEngine(interpret.variables_factory)
+        self.jump_threads = {}
+        optimizer = PeepholeOptimizer(self) if optimize else None
+        # Instructions with operand types proven by TypeInference get handlers without type checks
+        self.typed_decoder = TypedDecoder(self)
+        proven_types = interpret.proven_types or [None] * len(interpret.instructions)
+
+        if optimizer is not None:
+            self.jump_threads = optimizer.thread_jumps()
+
+        self.program = [self.decode(instruction, types)
+                        for instruction, types in zip(interpret.instructions, proven_types)]
+
+        if optimizer is not None:
+            optimizer.fuse()
+
+    def run(self):
+        """
+        Runs decoded program, every instruction is one call of its handler
+        """
+        interpret = self.interpret
+        program = self.program
+        inst_len = len(program)
+        current_inst = 0
+        executed = 0
+
+        while current_inst < inst_len:
+            try:
+                while current_inst < inst_len:
+                    current_inst = program[current_inst](current_inst)
+                    executed += 1
+            except DebugBreak:
+                interpret.total_inst += executed
+                interpret.print_debug_info(current_inst)
+                executed = 1
+                current_inst += 1
+
+        interpret.total_inst += executed
+
+    def decode(self, instruction, types=None):
+        """
+        Turns instruction to handler with bound operands
+        :param instruction: Loaded instruction
+        :param types: Proven argument types or None
+        :return: Handler, which gets current instruction index and returns next one
+        """
+        opcode = instruction["opcode"]
+        args = instruction["args"]
+        interpret = self.interpret
+        frames = interpret.frames
+        variables_factory = interpret.variables_factory
+
+        if types is not None:
+            handler = self.typed_decoder.decode(opcode, args, types)
+            if handler is not None:
+                return handler
+
+        if opcode in ARITMETIC_OPERATIONS:
+            return self.step(partial(variables_factory.aritmetic_operation, args[0], args[1], args[2],
+                                     ARITMETIC_OPERATIONS[opcode]))
+        elif opcode in RELATION_OPERATORS:
+            return self.step(partial(variables_factory.relation_operator, args[0], args[1], args[2],
+                                     RELATION_OPERATORS[opcode]))
+        elif opcode in BOOL_OPERATORS:
+            return self.step(partial(variables_factory.bool_operator, args[0], args[1], args[2],
+                                     BOOL_OPERATORS[opcode]))
+        elif opcode in STACK_INSTRUCTIONS:
+            return self.stack_engine.decode(opcode, args)
+        elif opcode == "NOT":
+            return self.step(partial(variables_factory.bool_operator, args[0], args[1], args[1], "not"))
+        elif opcode == "DEFVAR":
+            return self.step(partial(variables_factory.def_var, args[0]))
+        elif opcode == "MOVE":
+            return self.step(partial(variables_factory.move_to_var, args[0], args[1]))
+        elif opcode == "CREATEFRAME":
+            return self.step(frames.create_frame)
+        elif opcode == "PUSHFRAME":
+            return self.step(frames.push_frame)
+        elif opcode == "POPFRAME":
+            return self.step(frames.pop_frame)
+        elif opcode == "WRITE":
+            return self.step(partial(variables_factory.print_var, args[0]))
+        elif opcode == "DPRINT":
+            return self.step(partial(variables_factory.print_var, args[0], True))
+        elif opcode == "INT2CHAR":
+            return self.step(partial(variables_factory.int_to_char, args[0], args[1]))
+        elif opcode == "STRI2INT":
+            return self.step(partial(variables_factory.stri_to_int, args[0], args[1], args[2]))
+        elif opcode == "INT2FLOAT":
+            return self.step(partial(variables_factory.int_to_float, args[0], args[1]))
+        elif opcode == "FLOAT2INT":
+            return self.step(partial(variables_factory.float_to_int, args[0], args[1]))
+        elif opcode == "TYPE":
+            return self.step(partial(variables_factory.get_type, args[0], args[1]))
+        elif opcode == "CONCAT":
+            return self.step(partial(variables_factory.concat_strings, args[0], args[1], args[2]))
+        elif opcode == "STRLEN":
+            return self.step(partial(variables_factory.len_string, args[0], args[1]))
+        elif opcode == "GETCHAR":
+            return self.step(partial(variables_factory.get_char, args[0], args[1], args[2]))
+        elif opcode == "SETCHAR":
+            return self.step(partial(variables_factory.set_char, args[0], args[1], args[2]))
+        elif opcode == "READ":
+            return self.step(partial(variables_factory.read_var, args[0], args[1]))
+        elif opcode == "LABEL":
+            return self.next_instruction
+        elif opcode == "BREAK":
+            return self.debug_break
+        elif opcode == "JUMP":
+            return self.jump(args[0])
+        elif opcode == "JUMPIFEQ":
+            return self.jump_if(partial(variables_factory.is_equal, args[1], args[2]), args[0])
+        elif opcode == "JUMPIFNEQ":
+            return self.jump_if(partial(variables_factory.is_not_equal, args[1], args[2]), args[0])
+        elif opcode == "JUMPIFEQS":
+            return self.jump_if(self.stack_engine.is_equal, args[0])
+        elif opcode == "JUMPIFNEQS":
+            return self.jump_if(self.stack_engine.is_not_equal, args[0])
+        elif opcode == "CALL":
+            return self.call(args[0])
+        elif opcode == "RETURN":
+            return self.return_from_call()
+
+    @staticmethod
+    def step(operation):
+        """
+        Creates handler for instruction, which continues with next instruction
+        :param operation: Instruction operation without arguments
+        """
+        def handler(current_inst):
+            operation()
+            return current_inst + 1
+
+        return handler
+
+    @staticmethod
+    def next_instruction(current_inst):
+        """
+        Handler for instructions without any effect
+        """
+        return current_inst + 1
+
+    @staticmethod
+    def debug_break(current_inst):
+        """
+        Handler for BREAK, debug info is printed by engine loop
+        """
+        raise DebugBreak()
+
+    def jump_target(self, label):
+        """
+        Creates function returning jump target of resolved label
+        :param label: Label argument
+        """
+        interpret = self.interpret
+        target = label[2]
+
+        if target is None:
+            return partial(interpret.jump_to_label, label)
+
+        # Threaded jump still counts every skipped JUMP instruction
+        target, hops = self.jump_threads.get(target, (target, 0))
+        extra = 1 + 2 * hops
+
+        def jump_to_label():
+            interpret.total_inst += extra
+            return target
+
+        return jump_to_label
+
+    def jump(self, label):
+        """
+        Creates JUMP handler
+        :param label: Label argument
+        """
+        jump_to_label = self.jump_target(label)
+
+        def handler(current_inst):
+            return jump_to_label()
+
+        return handler
+
+    def jump_if(self, condition, label):
+        """
+        Creates conditional jump handler
+        :param condition: Condition without arguments
+        :param label: Label argument
+        """
+        jump_to_label = self.jump_target(label)
+
+        def handler(current_inst):
+            if condition():
+                return jump_to_label()
+            return current_inst + 1
+
+        return handler
+
+    def call(self, label):
+        """
+        Creates CALL handler
+        :param label: Label argument
+        """
+        calls = self.interpret.calls
+        jump_to_label = self.jump_target(label)
+
+        def handler(current_inst):
+            calls.append(current_inst)
+            return jump_to_label()
+
+        return handler
+
+    def return_from_call(self):
+        """
+        Creates RETURN handler
+        """
+        calls = self.interpret.calls
+
+        def handler(current_inst):
+            if len(calls) == 0:
+                raise IPPcodeMissingValueError("CALL stack is empty")
+            return calls.pop() + 1
+
+        return handler
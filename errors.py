@@ -0,0 +1,71 @@
+class IPPcodeError(Exception):
+    # Exit code of interpret.py and format of reported message
+    exit_code = 99
+    message_format = "%s"
+
+    def __init__(self, message, exit_code=None):
+        """
+        Sets error message and exit code
+        :param message: Error description
+        :param exit_code: Exit code, default exit code of error class if not set
+        """
+        super().__init__(message)
+        self.message = message
+        if exit_code is not None:
+            self.exit_code = exit_code
+
+    def report(self):
+        """
+        Creates error line written to stderr
+        """
+        return "ERROR: %s!\n" % (self.message_format % self.message)
+
+
+class IPPcodeSourceError(IPPcodeError):
+    exit_code = 11
+
+
+class IPPcodeOutputError(IPPcodeError):
+    exit_code = 12
+
+
+class IPPcodeXMLError(IPPcodeError):
+    exit_code = 31
+    message_format = "Source file has wrong XML format (%s)"
+
+
+class IPPcodeParseError(IPPcodeError):
+    exit_code = 32
+    message_format = "Lexical or syntax error in XML (%s)"
+
+
+class IPPcodeSemanticError(IPPcodeError):
+    exit_code = 52
+
+
+class IPPcodeLabelError(IPPcodeSemanticError):
+    pass
+
+
+class IPPcodeOperandTypeError(IPPcodeError):
+    exit_code = 53
+
+
+class IPPcodeVariableError(IPPcodeError):
+    exit_code = 54
+
+
+class IPPcodeFrameError(IPPcodeError):
+    exit_code = 55
+
+
+class IPPcodeMissingValueError(IPPcodeError):
+    exit_code = 56
+
+
+class IPPcodeOperandValueError(IPPcodeError):
+    exit_code = 57
+
+
+class IPPcodeStringError(IPPcodeError):
+    exit_code = 58
@@ -1,46 +1,56 @@
-import sys
+from errors import IPPcodeFrameError, IPPcodeSemanticError, IPPcodeVariableError
 
 
 class Frames:
     def __init__(self):
         """
-        Sets default values
+        Sets default values, every frame maps variable name to variable
         """
         self.get_vars_stats = None
         self.frame_stack = []
-        self.global_frame = []
+        self.global_frame = {}
         self.local_frame = None
         self.temporary_frame = None
         self.stat_vars = 0
         self.vars_current = 0
 
+    def create_frame(self):
+        """
+        Creates new empty temporary frame
+        """
+        if self.temporary_frame is not None:
+            self.vars_current -= len(self.temporary_frame)
+        self.temporary_frame = {}
+
     def push_frame(self):
         """
         Pushes variable frame
         """
         if self.temporary_frame is not None:
+            if self.local_frame is not None:
+                self.vars_current -= len(self.local_frame)
             self.frame_stack.append(self.temporary_frame)
             self.local_frame = self.temporary_frame
             self.temporary_frame = None
-            self.vars_stats_calculate()
         else:
-            sys.stderr.write("ERROR: TF not defined!\n")
-            exit(55)
+            raise IPPcodeFrameError("TF not defined")
 
     def pop_frame(self):
         """
         Pops variable frame
         """
         if len(self.frame_stack) != 0:
+            if self.temporary_frame is not None:
+                self.vars_current -= len(self.temporary_frame)
             self.temporary_frame = self.frame_stack.pop()
             try:
                 self.local_frame = self.frame_stack[-1]
             except IndexError:
                 self.local_frame = None
-            self.vars_stats_calculate()
+            else:
+                self.vars_stats_add(len(self.local_frame))
         else:
-            sys.stderr.write("ERROR: Frame stack is empty!\n")
-            exit(55)
+            raise IPPcodeFrameError("Frame stack is empty")
 
     def add_to_global_frame(self, variable):
         """
@@ -48,11 +58,10 @@ class Frames:
         :param variable
         """
 
-        if self.get_from_global_frame(variable.name, False):
-            sys.stderr.write("ERROR: Variable %s already defined in global frame!\n" % variable.name)
-            exit(52)
-        self.global_frame.append(variable)
-        self.vars_stats_calculate()
+        if variable.name in self.global_frame:
+            raise IPPcodeSemanticError("Variable %s already defined in global frame" % variable.name)
+        self.global_frame[variable.name] = variable
+        self.vars_stats_add(1)
 
     def add_to_local_frame(self, variable):
         """
@@ -61,12 +70,11 @@ class Frames:
         """
 
         if self.local_frame is None:
-            sys.stderr.write("ERROR: LF is not initialized!\n")
-            exit(55)
+            raise IPPcodeFrameError("LF is not initialized")
 
-        if not self.get_from_local_frame(variable.name, False):
-            self.local_frame.append(variable)
-        self.vars_stats_calculate()
+        if variable.name not in self.local_frame:
+            self.local_frame[variable.name] = variable
+            self.vars_stats_add(1)
 
     def add_to_temporary_frame(self, variable):
         """
@@ -75,14 +83,12 @@ class Frames:
         """
 
         if self.temporary_frame is None:
-            sys.stderr.write("ERROR: TF is not initialized!\n")
-            exit(55)
+            raise IPPcodeFrameError("TF is not initialized")
 
-        if self.get_from_temporary_frame(variable.name, False):
-            sys.stderr.write("ERROR: Variable %s already defined in temporary frame!\n" % variable.name)
-            exit(52)
-        self.temporary_frame.append(variable)
-        self.vars_stats_calculate()
+        if variable.name in self.temporary_frame:
+            raise IPPcodeSemanticError("Variable %s already defined in temporary frame" % variable.name)
+        self.temporary_frame[variable.name] = variable
+        self.vars_stats_add(1)
 
     def get_from_local_frame(self, name, error_if_not_found=True):
         """
@@ -91,16 +97,14 @@ class Frames:
         :param error_if_not_found: if true, raises error when variable is not found
         """
         if self.local_frame is None:
-            sys.stderr.write("ERROR: LF is not defined!\n")
-            exit(55)
+            raise IPPcodeFrameError("LF is not defined")
 
-        for var in self.local_frame:
-            if var.name == name:
-                return var
+        var = self.local_frame.get(name)
+        if var is not None:
+            return var
 
         if error_if_not_found:
-            sys.stderr.write("ERROR: Variable %s is not defined in LF!\n" % name)
-            exit(54)
+            raise IPPcodeVariableError("Variable %s is not defined in LF" % name)
 
         return None
 
@@ -111,16 +115,14 @@ class Frames:
         :param error_if_not_found: if true, raises error when variable is not found
         """
         if self.temporary_frame is None:
-            sys.stderr.write("ERROR: TF is not defined!\n")
-            exit(55)
+            raise IPPcodeFrameError("TF is not defined")
 
-        for var in self.temporary_frame:
-            if var.name == name:
-                return var
+        var = self.temporary_frame.get(name)
+        if var is not None:
+            return var
 
         if error_if_not_found:
-            sys.stderr.write("ERROR: Variable %s is not defined in TF!\n" % name)
-            exit(54)
+            raise IPPcodeVariableError("Variable %s is not defined in TF" % name)
 
         return None
 
@@ -130,27 +132,21 @@ class Frames:
         :param name: variable name
         :param error_if_not_found: if true, raises error when variable is not found
         """
-        for var in self.global_frame:
-            if var.name == name:
-                return var
+        var = self.global_frame.get(name)
+        if var is not None:
+            return var
 
         if error_if_not_found:
-            sys.stderr.write("ERROR: Variable %s is not defined in GF!\n" % name)
-            exit(54)
+            raise IPPcodeVariableError("Variable %s is not defined in GF" % name)
 
         return None
 
-    def vars_stats_calculate(self):
+    def vars_stats_add(self, count):
         """
-        Changes variable stats
+        Changes variable stats when variables become accessible
+        :param count: Number of variables added to GF, LF or TF
         """
-        self.vars_current = len(self.global_frame)
-
-        if self.temporary_frame is not None:
-            self.vars_current += len(self.temporary_frame)
-
-        if self.local_frame is not None:
-            self.vars_current += len(self.local_frame)
+        self.vars_current += count
 
         if self.vars_current > self.stat_vars:
             self.stat_vars = self.vars_current
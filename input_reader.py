@@ -0,0 +1,107 @@
+import codecs
+import io
+import queue
+import threading
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# Maximal number of chunks read ahead by prefetch thread
+PREFETCH_CHUNKS = 16
+
+
+class InputReader:
+    def __init__(self, stream, chunk_size=DEFAULT_CHUNK_SIZE, prefetch=False):
+        """
+        Sets input stream, nothing is read until first line is requested
+        :param stream: Text stream, binary buffer of standard input is read directly when it is available
+        :param chunk_size: Maximal size of one read from stream
+        :param prefetch: If true, chunks are read ahead by background thread
+        """
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.prefetch = prefetch
+        self.chunks = None
+        self.text = ""
+        self.position = 0
+        self.eof = False
+        self.decoder = None
+
+        binary = getattr(stream, "buffer", None)
+        if binary is not None:
+            # Same decoding as input() on standard input, lines are split only at \n and \r is kept
+            decoder = codecs.getincrementaldecoder(stream.encoding)(stream.errors)
+            self.decoder = io.IncrementalNewlineDecoder(decoder, False)
+            self.read_data = getattr(binary, "read1", binary.read)
+        else:
+            self.read_data = stream.read
+
+    def read_line(self):
+        """
+        Reads next line, lines are split from read chunks only when they are requested
+        :return: Line without line break or None at end of input
+        """
+        while True:
+            end = self.text.find("\n", self.position)
+            if end != -1:
+                line = self.text[self.position:end]
+                self.position = end + 1
+                return line
+
+            chunk = self.read_chunk()
+            if not chunk:
+                if self.position < len(self.text):
+                    line = self.text[self.position:]
+                    self.text = ""
+                    self.position = 0
+                    return line
+                return None
+
+            self.text = self.text[self.position:] + chunk
+            self.position = 0
+
+    def read_chunk(self):
+        """
+        Reads and decodes next chunk of input
+        :return: Decoded text, empty at end of input
+        """
+        while not self.eof:
+            data = self.next_data()
+            if not data:
+                self.eof = True
+
+            if self.decoder is not None:
+                text = self.decoder.decode(data, final=self.eof)
+            else:
+                text = data
+
+            if text:
+                return text
+
+        return ""
+
+    def next_data(self):
+        """
+        Gets next chunk from stream or from prefetch thread
+        :return: Read data, empty at end of input
+        """
+        if not self.prefetch:
+            return self.read_data(self.chunk_size)
+
+        if self.chunks is None:
+            self.chunks = queue.Queue(PREFETCH_CHUNKS)
+            threading.Thread(target=self.prefetch_chunks, daemon=True).start()
+
+        return self.chunks.get()
+
+    def prefetch_chunks(self):
+        """
+        Reads chunks to queue until end of input, runs in background thread
+        """
+        while True:
+            try:
+                data = self.read_data(self.chunk_size)
+            except (OSError, ValueError):
+                data = b"" if self.decoder is not None else ""
+            self.chunks.put(data)
+            if not data:
+                break
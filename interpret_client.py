@@ -0,0 +1,74 @@
+import sys
+from arguments import check_arguments, create_parser, write_stats
+from daemon_client import DEFAULT_SOCKET, DaemonError, connect, request
+from errors import IPPcodeError
+
+
+def main():
+    """
+    Runs program by interpreter daemon with arguments of interpret.py, program is run locally if daemon is not running
+    :return: Exit code
+    """
+    parser = create_parser()
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    args = parser.parse_args()
+    check_arguments(args)
+
+    if args.profile or args.sample:
+        sys.stderr.write("ERROR: Can not profile program run by daemon!\n")
+        return 10
+
+    if args.jit:
+        sys.stderr.write("ERROR: Can not trace program run by daemon!\n")
+        return 10
+
+    if args.batch:
+        sys.stderr.write("ERROR: Can not run batch by daemon!\n")
+        return 10
+
+    if args.cfg:
+        # Program is only analysed, so it is not sent to daemon
+        import interpret
+        return interpret.write_cfg(args)
+
+    try:
+        connection = connect(args.socket)
+    except OSError:
+        # Interpreter modules are imported only when they are needed, so client starts fast
+        import interpret
+        return interpret.run(args)
+
+    # Whole input is sent with request, so program can not react to partial input
+    try:
+        response = request(connection, args.source, sys.stdin.buffer.read(), args.engine, args.optimize)
+    except (DaemonError, OSError):
+        sys.stderr.write("ERROR: Interpreter daemon did not respond!\n")
+        return 99
+
+    try:
+        if args.output:
+            with open(args.output, "wb") as file:
+                file.write(response["stdout"])
+        else:
+            sys.stdout.buffer.write(response["stdout"])
+    except IOError:
+        sys.stderr.write("ERROR: Could not open output file!\n")
+        return 12
+
+    sys.stdout.flush()
+    sys.stderr.buffer.write(response["stderr"])
+    sys.stderr.flush()
+
+    exit_code = response["exit_code"]
+    if exit_code == 0 and args.stats:
+        try:
+            write_stats(args.stats, response["stats"])
+        except IPPcodeError as e:
+            sys.stderr.write(e.report())
+            exit_code = e.exit_code
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
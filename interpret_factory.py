@@ -1,7 +1,13 @@
+from compiled_engine import CompiledEngine
+from control_flow import ControlFlowGraph
+from engine import ThreadedEngine
+from errors import IPPcodeLabelError, IPPcodeMissingValueError, IPPcodeParseError
 from frames import Frames
+from optimizer import ProgramOptimizer
+from tracing_jit import TracingJit
+from type_inference import TypeInference
 import re
 from variables import *
-from xml.sax.saxutils import unescape
 import xml.etree.ElementTree as ET
 
 FRAMES = ["GF", "TF", "LF"]
@@ -14,22 +20,35 @@ INSTRUCTIONS = ["MOVE", "CREATEFRAME", "PUSHFRAME", "POPFRAME", "DEFVAR", "CALL"
                 "JUMPIFEQ", "JUMPIFNEQ", "DPRINT", "BREAK", "CLEARS", "ADDS", "SUBS", "MULS", "IDIVS", "LTS", "GTS",
                 "EQS", "ANDS", "ORS", "NOTS", "INT2CHARS", "STRI2INTS", "JUMPIFEQS", "JUMPIFNEQS"]
 
-
-class IPPcodeParseError(Exception):
-    pass
+JUMP_INSTRUCTIONS = ["CALL", "JUMP", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS"]
 
 
 class InterpretFactory:
-    def __init__(self):
+    def __init__(self, engine="threaded", optimize=False, jit=False):
         """
         Set all variables to its default values
+        :param engine: Engine used for interpretation (threaded, reference or compiled)
+        :param optimize: If true, loaded program is optimized before run (threaded and compiled engine only)
+        :param jit: If true, hot loops are traced and compiled (threaded engine only)
         """
+        self.engine = engine
+        self.optimize = optimize
+        self.jit = jit
         self.total_inst = 0
         self.stat_vars = 0
         self.instructions = []
-        self.labels = []
+        self.labels = {}
+        self.positions = None
+        self.proven_types = None
+        self.threaded_engine = None
+        self.compiled_engine = None
+        self.tracing_jit = None
+        self.code_cache = None
+        self.profiler = None
+        self.prepared = False
         self.calls = []
-        self.names_pattern = re.compile("[^A-ZÁ-Ža-zá-ž0-9\-\*\$%_&]")
+        self.names_pattern = re.compile(r"[^A-ZÁ-Ža-zá-ž0-9\-\*\$%_&]")
+        self.operands = {}
         self.frames = Frames()
         self.variables_factory = VariablesFactory(self.frames)
 
@@ -46,8 +65,8 @@ class InterpretFactory:
         try:
             if opcode == "MOVE":
                 self.count_args(len(args), 2, opcode)
-                self.var(args[0])
-                self.symb(args[1])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
             elif opcode == "CREATEFRAME":
                 self.count_args(len(args), 0, opcode)
             elif opcode == "PUSHFRAME":
@@ -56,139 +75,139 @@ class InterpretFactory:
                 self.count_args(len(args), 0, opcode)
             elif opcode == "DEFVAR":
                 self.count_args(len(args), 1, opcode)
-                self.var(args[0])
+                args[0] = self.var(args[0])
             elif opcode == "CALL":
                 self.count_args(len(args), 1, opcode)
-                self.label(args[0])
+                args[0] = self.label(args[0])
             elif opcode == "RETURN":
                 self.count_args(len(args), 0, opcode)
             elif opcode == "PUSHS":
                 self.count_args(len(args), 1, opcode)
-                self.symb(args[0])
+                args[0] = self.symb(args[0])
             elif opcode == "POPS":
                 self.count_args(len(args), 1, opcode)
-                self.var(args[0])
+                args[0] = self.var(args[0])
             elif opcode == "ADD":
                 self.count_args(len(args), 3, opcode)
-                self.var(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "SUB":
                 self.count_args(len(args), 3, opcode)
-                self.var(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "MUL":
                 self.count_args(len(args), 3, opcode)
-                self.var(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "IDIV":
                 self.count_args(len(args), 3, opcode)
-                self.var(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "DIV":
                 self.count_args(len(args), 3, opcode)
-                self.var(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "LT":
                 self.count_args(len(args), 3, opcode)
-                self.var(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "GT":
                 self.count_args(len(args), 3, opcode)
-                self.var(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "EQ":
                 self.count_args(len(args), 3, opcode)
-                self.var(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "AND":
                 self.count_args(len(args), 3, opcode)
-                self.var(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "OR":
                 self.count_args(len(args), 3, opcode)
-                self.var(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "NOT":
                 self.count_args(len(args), 2, opcode)
-                self.var(args[0])
-                self.symb(args[1])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
             elif opcode == "INT2CHAR":
                 self.count_args(len(args), 2, opcode)
-                self.var(args[0])
-                self.symb(args[1])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
             elif opcode == "STRI2INT":
                 self.count_args(len(args), 3, opcode)
-                self.var(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "INT2FLOAT":
                 self.count_args(len(args), 2, opcode)
-                self.var(args[0])
-                self.symb(args[1])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
             elif opcode == "FLOAT2INT":
                 self.count_args(len(args), 2, opcode)
-                self.var(args[0])
-                self.symb(args[1])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
             elif opcode == "READ":
                 self.count_args(len(args), 2, opcode)
-                self.var(args[0])
-                self.type(args[1])
+                args[0] = self.var(args[0])
+                args[1] = self.type(args[1])
             elif opcode == "WRITE":
                 self.count_args(len(args), 1, opcode)
-                self.symb(args[0])
+                args[0] = self.symb(args[0])
             elif opcode == "CONCAT":
                 self.count_args(len(args), 3, opcode)
-                self.var(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "STRLEN":
                 self.count_args(len(args), 2, opcode)
-                self.var(args[0])
-                self.symb(args[1])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
             elif opcode == "GETCHAR":
                 self.count_args(len(args), 3, opcode)
-                self.var(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "SETCHAR":
                 self.count_args(len(args), 3, opcode)
-                self.var(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "TYPE":
                 self.count_args(len(args), 2, opcode)
-                self.var(args[0])
-                self.symb(args[1])
+                args[0] = self.var(args[0])
+                args[1] = self.symb(args[1])
             elif opcode == "LABEL":
                 self.count_args(len(args), 1, opcode)
-                self.label(args[0])
+                args[0] = self.label(args[0])
                 self.add_label(args[0], position)
             elif opcode == "JUMP":
                 self.count_args(len(args), 1, opcode)
-                self.label(args[0])
+                args[0] = self.label(args[0])
             elif opcode == "JUMPIFEQ":
                 self.count_args(len(args), 3, opcode)
-                self.label(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.label(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "JUMPIFNEQ":
                 self.count_args(len(args), 3, opcode)
-                self.label(args[0])
-                self.symb(args[1])
-                self.symb(args[2])
+                args[0] = self.label(args[0])
+                args[1] = self.symb(args[1])
+                args[2] = self.symb(args[2])
             elif opcode == "DPRINT":
                 self.count_args(len(args), 1, opcode)
-                self.symb(args[0])
+                args[0] = self.symb(args[0])
             elif opcode == "BREAK":
                 self.count_args(len(args), 0, opcode)
             elif opcode == "CLEARS":
@@ -219,10 +238,10 @@ class InterpretFactory:
                 self.count_args(len(args), 0, opcode)
             elif opcode == "JUMPIFEQS":
                 self.count_args(len(args), 1, opcode)
-                self.label(args[0])
+                args[0] = self.label(args[0])
             elif opcode == "JUMPIFNEQS":
                 self.count_args(len(args), 1, opcode)
-                self.label(args[0])
+                args[0] = self.label(args[0])
 
             self.instructions.append({"opcode": opcode, "args": args})
         except IndexError:
@@ -230,7 +249,63 @@ class InterpretFactory:
 
     def run(self):
         """
-        Runs program and interprets all the instructions
+        Runs program with selected engine
+        """
+        if not self.prepared:
+            self.prepare()
+
+        if self.engine == "reference":
+            self.run_reference()
+        elif self.engine == "compiled":
+            self.compiled_engine.run()
+        else:
+            self.threaded_engine.run()
+
+        if self.profiler is not None:
+            self.profiler.finish()
+
+        self.stat_vars = self.frames.stat_vars
+
+    def prepare(self):
+        """
+        Finishes loading, resolves labels and decodes program for selected engine
+        """
+        self.resolve_labels()
+
+        if self.optimize:
+            program_optimizer = ProgramOptimizer(self)
+            program_optimizer.fold_constants()
+            program_optimizer.eliminate_dead_code()
+            self.proven_types = TypeInference(self).infer()
+
+        if self.engine == "compiled":
+            self.compiled_engine = CompiledEngine(self, self.code_cache)
+        elif self.engine != "reference":
+            # Profiled program is not fused, so every instruction is measured,
+            # traced program is not fused, so every instruction is recorded
+            self.threaded_engine = ThreadedEngine(self, self.optimize and self.profiler is None and not self.jit)
+
+            if self.profiler is not None:
+                self.profiler.instrument(self.threaded_engine)
+            if self.jit:
+                self.tracing_jit = TracingJit(self.threaded_engine)
+                self.tracing_jit.install()
+
+        self.prepared = True
+
+    def control_flow_graph(self):
+        """
+        Builds control flow graph of prepared program
+        :return: Analysed ControlFlowGraph
+        """
+        if not self.prepared:
+            self.prepare()
+
+        return ControlFlowGraph(self.instructions).analyse()
+
+    def run_reference(self):
+        """
+        Runs program and interprets all the instructions one by one by its opcode
         """
         inst_len = len(self.instructions)
         current_inst = 0
@@ -242,7 +317,7 @@ class InterpretFactory:
                 self.variables_factory.move_to_var(self.instructions[current_inst]["args"][0],
                                                    self.instructions[current_inst]["args"][1])
             elif self.instructions[current_inst]["opcode"] == "CREATEFRAME":
-                self.frames.temporary_frame = []
+                self.frames.create_frame()
             elif self.instructions[current_inst]["opcode"] == "PUSHFRAME":
                 self.frames.push_frame()
             elif self.instructions[current_inst]["opcode"] == "POPFRAME":
@@ -252,8 +327,7 @@ class InterpretFactory:
                 current_inst = self.jump_to_label(self.instructions[current_inst]["args"][0]) - 1
             elif self.instructions[current_inst]["opcode"] == "RETURN":
                 if len(self.calls) == 0:
-                    sys.stderr.write("ERROR: CALL stack is empty!\n")
-                    exit(56)
+                    raise IPPcodeMissingValueError("CALL stack is empty")
                 current_inst = self.calls.pop()
             elif self.instructions[current_inst]["opcode"] == "PUSHS":
                 self.variables_factory.push_stack(self.instructions[current_inst]["args"][0])
@@ -354,63 +428,75 @@ class InterpretFactory:
                 self.variables_factory.read_var(self.instructions[current_inst]["args"][0],
                                                 self.instructions[current_inst]["args"][1])
             elif self.instructions[current_inst]["opcode"] == "BREAK":
-                sys.stderr.write("--------- DEBUG INFO START ---------\n")
-                sys.stderr.write("Instrictions interpreted: %d\n" % self.total_inst)
-                sys.stderr.write("Current instruction number: %d\n" % int(current_inst + 1))
-                sys.stderr.write("-- Global frame:\n")
-                sys.stderr.write("Total: %d\n" % len(self.frames.global_frame))
-                for var in self.frames.global_frame:
-                    sys.stderr.write("%s (%d): %s\n" % (var.name, var.variable_type, var.value))
-                sys.stderr.write("-- Local frame:\n")
-                if self.frames.local_frame is not None:
-                    sys.stderr.write("Total: %d\n" % len(self.frames.local_frame))
-                    for var in self.frames.local_frame:
-                        sys.stderr.write("%s (%d): %s\n" % (var.name, var.variable_type, var.value))
-                else:
-                    sys.stderr.write("Not initialized\n")
-                if self.frames.temporary_frame is not None:
-                    sys.stderr.write("-- Temporary frame:\n")
-                    sys.stderr.write("Total: %d\n" % len(self.frames.temporary_frame))
-                    for var in self.frames.temporary_frame:
-                        sys.stderr.write("%s (%d): %s\n" % (var.name, var.variable_type, var.value))
-                else:
-                    sys.stderr.write("Not initialized\n")
-                sys.stderr.write("---------- DEBUG INFO END ----------\n")
+                self.print_debug_info(current_inst)
             elif self.instructions[current_inst]["opcode"] == "ADDS":
-                self.variables_factory.aritmetic_operation(None, None, None, "add")
+                self.variables_factory.aritmetic_operation_stack("add")
             elif self.instructions[current_inst]["opcode"] == "SUBS":
-                self.variables_factory.aritmetic_operation(None, None, None, "sub")
+                self.variables_factory.aritmetic_operation_stack("sub")
             elif self.instructions[current_inst]["opcode"] == "MULS":
-                self.variables_factory.aritmetic_operation(None, None, None, "mul")
+                self.variables_factory.aritmetic_operation_stack("mul")
             elif self.instructions[current_inst]["opcode"] == "IDIVS":
-                self.variables_factory.aritmetic_operation(None, None, None, "idiv")
+                self.variables_factory.aritmetic_operation_stack("idiv")
             elif self.instructions[current_inst]["opcode"] == "LTS":
-                self.variables_factory.relation_operator(None, None, None, "lt")
+                self.variables_factory.relation_operator_stack("lt")
             elif self.instructions[current_inst]["opcode"] == "GTS":
-                self.variables_factory.relation_operator(None, None, None, "gt")
+                self.variables_factory.relation_operator_stack("gt")
             elif self.instructions[current_inst]["opcode"] == "EQS":
-                self.variables_factory.relation_operator(None, None, None, "eq")
+                self.variables_factory.relation_operator_stack("eq")
             elif self.instructions[current_inst]["opcode"] == "ANDS":
-                self.variables_factory.bool_operator(None, None, None, "and")
+                self.variables_factory.bool_operator_stack("and")
             elif self.instructions[current_inst]["opcode"] == "NOTS":
-                self.variables_factory.bool_operator(None, None, None, "not")
+                self.variables_factory.bool_operator_stack("not")
             elif self.instructions[current_inst]["opcode"] == "ORS":
-                self.variables_factory.bool_operator(None, None, None, "or")
+                self.variables_factory.bool_operator_stack("or")
             elif self.instructions[current_inst]["opcode"] == "INT2CHARS":
-                self.variables_factory.int_to_char(None, None)
+                self.variables_factory.int_to_char_stack()
             elif self.instructions[current_inst]["opcode"] == "STRI2INTS":
-                self.variables_factory.stri_to_int(None, None, None)
+                self.variables_factory.stri_to_int_stack()
             elif self.instructions[current_inst]["opcode"] == "JUMPIFEQS":
-                if self.variables_factory.is_equal(None, None):
+                if self.variables_factory.is_equal_stack():
                     current_inst = self.jump_to_label(self.instructions[current_inst]["args"][0]) - 1
             elif self.instructions[current_inst]["opcode"] == "JUMPIFNEQS":
-                if self.variables_factory.is_not_equal(None, None):
+                if self.variables_factory.is_not_equal_stack():
                     current_inst = self.jump_to_label(self.instructions[current_inst]["args"][0]) - 1
 
             current_inst += 1
             self.total_inst += 1
 
-        self.stat_vars = self.frames.stat_vars
+    def print_debug_info(self, current_inst):
+        """
+        Prints BREAK debug info to stderr
+        :param current_inst: Current instruction index
+        """
+        # Original instruction number is reported, even if dead code was eliminated
+        if self.positions is not None:
+            current_inst = self.positions[current_inst]
+
+        stderr = self.variables_factory.stderr
+        stderr.write("--------- DEBUG INFO START ---------\n")
+        stderr.write("Instrictions interpreted: %d\n" % self.total_inst)
+        stderr.write("Current instruction number: %d\n" % int(current_inst + 1))
+        stderr.write("-- Global frame:\n")
+        stderr.write("Total: %d\n" % len(self.frames.global_frame))
+        for var in self.frames.global_frame.values():
+            stderr.write("%s (%d): %s\n" % (var.name, var.variable_type, debug_value(var)))
+        stderr.write("-- Local frame:\n")
+        if self.frames.local_frame is not None:
+            stderr.write("Total: %d\n" % len(self.frames.local_frame))
+            for var in self.frames.local_frame.values():
+                stderr.write("%s (%d): %s\n" % (var.name, var.variable_type, debug_value(var)))
+        else:
+            stderr.write("Not initialized\n")
+        if self.frames.temporary_frame is not None:
+            stderr.write("-- Temporary frame:\n")
+            stderr.write("Total: %d\n" % len(self.frames.temporary_frame))
+            for var in self.frames.temporary_frame.values():
+                stderr.write("%s (%d): %s\n" % (var.name, var.variable_type, debug_value(var)))
+        else:
+            stderr.write("Not initialized\n")
+        stderr.write("---------- DEBUG INFO END ----------\n")
+        self.variables_factory.stdout.flush()
+        stderr.flush()
 
     @staticmethod
     def count_args(actual, needed, opcode):
@@ -425,12 +511,18 @@ class InterpretFactory:
 
     def var(self, arg):
         """
-        Parse and validate variable
+        Parse and validate variable, resolved frame kind and name are appended to argument
         :param arg: Variable argument
+        :return: Validated argument, which is shared by all same operands
         """
         if arg[0] != "var":
             raise IPPcodeParseError("expected variable")
 
+        key = ("var", arg[1])
+        operand = self.operands.get(key)
+        if operand is not None:
+            return operand
+
         try:
             frame, name = arg[1].split("@")
         except ValueError:
@@ -442,16 +534,33 @@ class InterpretFactory:
         if frame not in FRAMES:
             raise IPPcodeParseError("unknown frame")
 
+        # Resolve frame and name once, accessors use them directly
+        arg[2:] = [FRAME_KINDS[frame], name]
+        self.operands[key] = arg
+
+        return arg
+
     def symb(self, arg):
         """
         Parse and validate symbols
         :param arg: Symbol argument
+        :return: Validated argument, which is shared by all same operands
         """
         if arg[0] == "var":
-            self.var(arg)
-        elif arg[0] == "bool":
+            return self.var(arg)
+        elif arg[0] not in TYPES:
+            raise ET.ParseError("symbol can only be var, int, float, bool or string")
+
+        key = (arg[0], arg[1])
+        operand = self.operands.get(key)
+        if operand is not None:
+            return operand
+
+        if arg[0] == "bool":
             if arg[1] != "true" and arg[1] != "false":
                 raise IPPcodeParseError("unknown bool value")
+
+            arg[1] = arg[1] == "true"
         elif arg[0] == "int":
             try:
                 arg[1] = int(arg[1])
@@ -463,45 +572,74 @@ class InterpretFactory:
             except (ValueError, TypeError):
                 raise IPPcodeParseError("wrong float literal")
         elif arg[0] == "string":
-            if arg[1] is None:
-                arg[1] = ""
-
-            if " " in arg[1]:
-                raise IPPcodeParseError("found whitespace in string literal")
-            elif "#" in arg[1]:
-                raise IPPcodeParseError("found # char in string literal")
-
-            arg[1] = unescape(arg[1])
-
-            i = 0
-            for char in arg[1]:
-                if char == "\\":
-                    try:
-                        xyz = int(arg[1][i + 1] + arg[1][i + 2] + arg[1][i + 3])
-                        arg[1] = arg[1][:i] + chr(xyz) + arg[1][i + 4:]
-                        i -= 3
-                    except (ValueError, IndexError):
-                        raise IPPcodeParseError("wrong string escape sequence")
-                i += 1
-        else:
-            raise ET.ParseError("symbol can only be var, int, float, bool or string")
+            arg[1] = self.string(arg[1])
+
+        self.operands[key] = arg
+
+        return arg
+
+    @staticmethod
+    def string(value):
+        """
+        Validates string literal and decodes its escape sequences in one pass
+        :param value: Literal text
+        :return: Decoded string
+        """
+        if value is None:
+            return ""
+
+        if " " in value:
+            raise IPPcodeParseError("found whitespace in string literal")
+        elif "#" in value:
+            raise IPPcodeParseError("found # char in string literal")
+
+        if "&" in value:
+            value = unescape(value)
+
+        if "\\" not in value:
+            return value
+
+        # Every backslash is followed by three digits of escaped char code
+        parts = value.split("\\")
+        decoded = [parts[0]]
+        for part in parts[1:]:
+            try:
+                if len(part) < 3:
+                    raise IndexError
+                decoded.append(chr(int(part[:3])))
+            except (ValueError, IndexError):
+                raise IPPcodeParseError("wrong string escape sequence")
+            decoded.append(part[3:])
+
+        return "".join(decoded)
 
     def label(self, arg):
         """
         Parses and valids Labels
         :param arg: Label argument
+        :return: Validated argument, which is shared by all same operands
         """
         if arg[0] != "label":
             raise IPPcodeParseError("expected label")
 
+        key = ("label", arg[1])
+        operand = self.operands.get(key)
+        if operand is not None:
+            return operand
+
         if self.names_pattern.match(arg[1]) or arg[1][0].isdigit():
             raise IPPcodeParseError("label name has wrong format")
 
+        self.operands[key] = arg
+
+        return arg
+
     @staticmethod
     def type(arg):
         """
         Parses and valids types
         :param arg: Type argument
+        :return: Validated argument
         """
         if arg[0] != "type":
             raise IPPcodeParseError("expected type")
@@ -509,17 +647,15 @@ class InterpretFactory:
         if arg[1] not in TYPES:
             raise IPPcodeParseError("unexpected type")
 
+        return arg
+
     def find_label(self, name):
         """
-        Finds label by name and returns it
+        Finds label by name and returns its position
         :param name: label name
-        :return: label or None if not found
+        :return: label position or None if not found
         """
-        for label in self.labels:
-            if label[0] == name:
-                return label
-
-        return None
+        return self.labels.get(name)
 
     def add_label(self, arg, position):
         """
@@ -529,23 +665,45 @@ class InterpretFactory:
         """
         label = arg[1]
 
-        if not self.find_label(label):
-            self.labels.append([label, position])
+        if label not in self.labels:
+            self.labels[label] = position
         else:
-            sys.stderr.write("ERROR: Label %s already exists!\n" % label)
-            exit(52)
+            raise IPPcodeLabelError("Label %s already exists" % label)
+
+    def resolve_labels(self):
+        """
+        Rewrites label arguments of all jump instructions to target instruction index,
+        target of undefined label is None
+        """
+        for instruction in self.instructions:
+            if instruction["opcode"] in JUMP_INSTRUCTIONS:
+                arg = instruction["args"][0]
+                position = self.find_label(arg[1])
+                target = position - 1 if position is not None else None
+
+                if len(arg) == 2:
+                    arg.append(target)
+                else:
+                    arg[2] = target
 
     def jump_to_label(self, arg):
         """
-        Find label and get its position for jump
+        Gets resolved label position for jump
         :param arg: Label
         :return: Label position
         """
         self.total_inst += 1
-        label = self.find_label(arg[1])
 
-        if not label:
-            sys.stderr.write("ERROR: Label %s not found!\n" % arg[1])
-            exit(52)
+        if arg[2] is None:
+            raise IPPcodeLabelError("Label %s not found" % arg[1])
         else:
-            return label[1] - 1
+            return arg[2]
+
+
+def unescape(value):
+    """
+    Replaces &lt;, &gt; and &amp; entities like xml.sax.saxutils.unescape, which imports slow urllib on startup
+    :param value: Text with entities
+    :return: Text without entities
+    """
+    return value.replace("&lt;", "<").replace("&gt;", ">").replace("&amp;", "&")
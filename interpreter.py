@@ -0,0 +1,234 @@
+import io
+import os
+import sys
+import xml.etree.ElementTree as ET
+import interpret_factory as IFactory
+from errors import IPPcodeSourceError, IPPcodeXMLError, IPPcodeParseError, IPPcodeLabelError
+from input_reader import InputReader
+from output import BufferedOutput, DEFAULT_BUFFER_SIZE
+from profiler import Profiler, SamplingProfiler
+from program_cache import ProgramCache
+
+
+class Result:
+    def __init__(self, exit_code, stats):
+        """
+        Sets result of program run
+        :param exit_code: Exit code of program
+        :param stats: Dictionary with number of executed instructions (insts), maximal number of variables (vars)
+                      and tracing stats (trace_hits, trace_compiles, guard_failures) of run with tracing
+        """
+        self.exit_code = exit_code
+        self.stats = stats
+
+    def __repr__(self):
+        return "Result(exit_code=%d, stats=%r)" % (self.exit_code, self.stats)
+
+
+class Interpreter:
+    def __init__(self, program, engine="threaded", optimize=False, cache=None, jit=False):
+        """
+        Sets program, nothing is loaded until program is run
+        :param program: Path of XML source, XML source as bytes or binary file object
+        :param engine: Engine used for interpretation (threaded, reference or compiled)
+        :param optimize: If true, loaded program is optimized before run (threaded and compiled engine only)
+        :param cache: Directory with compiled programs or ProgramCache, programs given by file object are not cached
+        :param jit: If true, hot loops are traced and compiled (threaded engine only)
+        """
+        self.program = program
+        self.engine = engine
+        self.optimize = optimize
+        self.cache = cache
+        self.jit = jit
+        self.interpret = None
+        self.profiler = None
+        self.sampler = None
+
+    def load(self):
+        """
+        Loads and validates program to new InterpretFactory
+        :return: Loaded InterpretFactory
+        """
+        interpret = IFactory.InterpretFactory(self.engine, self.optimize, self.jit)
+
+        try:
+            source = io.BytesIO(self.program) if isinstance(self.program, bytes) else self.program
+
+            if self.cache is not None and isinstance(self.program, (str, bytes, os.PathLike)):
+                # Compiled program is keyed by source content, stale or corrupt one is rebuilt
+                program_cache = ProgramCache(self.cache) if isinstance(self.cache, str) else self.cache
+                digest = program_cache.source_digest(self.program)
+                if not program_cache.load(digest, interpret):
+                    load_program(interpret, source)
+                    program_cache.store(digest, interpret)
+                # Code generated by compiled engine is kept in the same cache
+                interpret.code_cache = program_cache
+            else:
+                load_program(interpret, source)
+        except FileNotFoundError:
+            raise IPPcodeSourceError("Can not open source file")
+        except ET.ParseError as e:
+            raise IPPcodeXMLError(str(e))
+
+        return interpret
+
+    def run(self, stdin=None, stdout=None, stderr=None, buffer_size=DEFAULT_BUFFER_SIZE, prefetch_input=False,
+            profile=False, sample_interval=None):
+        """
+        Loads and runs program, every run starts with new program state
+        :param stdin: Text read by READ as str, bytes or text stream, standard input if not set
+        :param stdout: Text stream for WRITE, standard output if not set
+        :param stderr: Text stream for DPRINT and BREAK, standard error output if not set
+        :param buffer_size: Size of output buffers, 0 writes output immediately
+        :param prefetch_input: If true, input is read ahead in background thread
+        :param profile: If true, execution is profiled, profiler is kept in profiler attribute (threaded engine only)
+        :param sample_interval: If set, call stack is sampled in this interval in seconds by sampler attribute
+        :return: Result of successful run
+        :raise IPPcodeError: Program is not valid or ended with runtime error, error has exit code of interpret.py
+        """
+        if isinstance(stdin, str):
+            stdin = io.StringIO(stdin)
+        elif isinstance(stdin, bytes):
+            stdin = io.TextIOWrapper(io.BytesIO(stdin), encoding="utf-8")
+
+        # Output is buffered and flushed on READ, BREAK and end of run
+        stdout = BufferedOutput(sys.stdout if stdout is None else stdout, buffer_size)
+        stderr = BufferedOutput(sys.stderr if stderr is None else stderr, buffer_size)
+        self.profiler = None
+        self.sampler = None
+
+        try:
+            self.interpret = interpret = self.load()
+            variables_factory = interpret.variables_factory
+            variables_factory.stdout = stdout
+            variables_factory.stderr = stderr
+            variables_factory.input_reader = InputReader(sys.stdin if stdin is None else stdin, prefetch=prefetch_input)
+            if profile:
+                self.profiler = interpret.profiler = Profiler(interpret)
+
+            interpret.prepare()
+            if sample_interval is not None:
+                self.sampler = SamplingProfiler(interpret, sample_interval)
+                self.sampler.start()
+            interpret.run()
+        except ET.ParseError as e:
+            raise IPPcodeXMLError(str(e))
+        finally:
+            if self.sampler is not None:
+                self.sampler.stop()
+            stdout.flush()
+            stderr.flush()
+
+        stats = {"insts": interpret.total_inst, "vars": interpret.stat_vars}
+        if interpret.tracing_jit is not None:
+            stats.update(interpret.tracing_jit.stats())
+
+        return Result(0, stats)
+
+
+def load_instruction(interpret, element, order):
+    """
+    Validates instruction element and adds it to interpret
+    :param interpret: InterpretFactory
+    :param element: Instruction element
+    :param order: Expected instruction order
+    :return: Expected order of next instruction
+    """
+    opcode = None
+    if element.tag != "instruction":
+        raise ET.ParseError("program element can contain only instruction subelements")
+
+    if "opcode" not in element.attrib or "order" not in element.attrib:
+        raise ET.ParseError("missing attribute opcode or order in program element")
+
+    # Validate opcode and order
+    for attrib, value in element.attrib.items():
+        if attrib == "opcode":
+            opcode = value
+        elif attrib == "order":
+            if int(value) != order:
+                raise ET.ParseError("bad instruction order")
+            order += 1
+        else:
+            raise ET.ParseError("instruction element can only contain opcode or order argument")
+
+    # Validate instruction arguments
+    args_list = []
+    for arg in element:
+        try:
+            arg_num = int(arg.tag[3:])
+        except ValueError:
+            raise ET.ParseError("wrong argument number")
+
+        if "type" not in arg.attrib:
+            raise ET.ParseError("missing type attribute in arg element")
+
+        if len(arg.attrib) != 1:
+            raise ET.ParseError("non allowed attributes in arg element")
+
+        types = ["int", "bool", "string", "float", "label", "type", "var", "label"]
+
+        if arg.attrib["type"] not in types:
+            raise ET.ParseError("non allowed arg type")
+
+        while arg_num > len(args_list):
+            args_list.append(None)
+
+        if args_list[arg_num - 1] is not None:
+            raise ET.ParseError("argument already set")
+
+        args_list[arg_num - 1] = [arg.attrib["type"], arg.text]
+
+    if None in args_list:
+        raise ET.ParseError("missing arguments")
+
+    interpret.add_instruction(opcode, args_list, order)
+
+    return order
+
+
+def load_program(interpret, source):
+    """
+    Parses source XML, instruction elements are validated and freed one by one
+    :param interpret: InterpretFactory
+    :param source: Source XML file path or binary file object
+    """
+    context = ET.iterparse(source, events=("start", "end"))
+    root = None
+    depth = 0
+    order = 1
+
+    try:
+        for event, element in context:
+            if event == "start":
+                depth += 1
+                if root is not None:
+                    continue
+
+                # Valid root element
+                root = element
+                if root.tag != "program":
+                    raise ET.ParseError("root element must be program")
+
+                if "language" not in root.attrib:
+                    raise ET.ParseError("missing attribute language in program element")
+
+                for attrib, value in root.attrib.items():
+                    if attrib == "language":
+                        if value != "IPPcode18":
+                            raise ET.ParseError("language attribute must have 'IPPcode18' value")
+                    elif attrib != "name" and attrib != "description":
+                        raise ET.ParseError(
+                            "program element can only contain language, name or description attributes")
+            else:
+                depth -= 1
+
+                # Validate complete instruction element and drop it from tree
+                if depth == 1:
+                    order = load_instruction(interpret, element, order)
+                    root.clear()
+    except (IPPcodeParseError, IPPcodeLabelError):
+        # Whole XML must be well-formed before errors in instructions are reported
+        for event, element in context:
+            element.clear()
+        raise
@@ -0,0 +1,365 @@
+import operator
+from variables import TYPE_INT, TYPE_FLOAT, TYPE_BOOL
+
+LITERAL_TYPES = ["int", "float", "bool", "string"]
+
+STACK_ARITMETIC = {"ADDS": operator.add, "SUBS": operator.sub, "MULS": operator.mul, "IDIVS": operator.floordiv}
+
+STACK_RELATION = {"LTS": operator.lt, "GTS": operator.gt, "EQS": operator.eq}
+
+RELATION = {"LT": operator.lt, "GT": operator.gt, "EQ": operator.eq}
+
+CONDITIONAL_JUMPS = {"JUMPIFEQ": True, "JUMPIFNEQ": False}
+
+FOLDED_ARITMETIC = {"ADD": operator.add, "SUB": operator.sub, "MUL": operator.mul}
+
+FOLDED_BOOL = {"AND": operator.and_, "OR": operator.or_}
+
+# Instructions, which never continue with next instruction
+NO_FALL_THROUGH = ["JUMP", "RETURN"]
+
+# Instructions, which can continue with next instruction or jump to label
+BRANCHES = ["CALL", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS"]
+
+
+class ProgramOptimizer:
+    def __init__(self, interpret):
+        """
+        Sets optimized program
+        :param interpret: InterpretFactory with loaded program and resolved labels
+        """
+        self.interpret = interpret
+
+    def fold_constants(self):
+        """
+        Replaces instructions with literal operands only by MOVE of their result and conditional jumps
+        with literal condition by JUMP, every instruction is replaced by one instruction, so stats are kept.
+        Instructions, which would fail at runtime, are kept unchanged to report error there.
+        """
+        instructions = self.interpret.instructions
+
+        for index, instruction in enumerate(instructions):
+            opcode = instruction["opcode"]
+            args = instruction["args"]
+
+            if opcode in CONDITIONAL_JUMPS:
+                condition = self.literal_condition(instruction)
+                if condition:
+                    instructions[index] = {"opcode": "JUMP", "args": [args[0]]}
+                continue
+
+            if len(args) < 2 or args[0][0] != "var" or any(arg[0] not in LITERAL_TYPES for arg in args[1:]):
+                continue
+
+            result = self.fold(opcode, args[1:])
+            if result is not None:
+                instructions[index] = {"opcode": "MOVE", "args": [args[0], list(result)]}
+
+    @staticmethod
+    def fold(opcode, symbols):
+        """
+        Computes result of instruction with literal operands
+        :param opcode: Instruction code
+        :param symbols: Literal operands
+        :return: Result literal type and value or None if instruction can not be folded
+        """
+        types = [symb[0] for symb in symbols]
+        values = [symb[1] for symb in symbols]
+
+        try:
+            if opcode in FOLDED_ARITMETIC:
+                if types[0] == types[1] and types[0] in ("int", "float"):
+                    return types[0], FOLDED_ARITMETIC[opcode](values[0], values[1])
+            elif opcode == "IDIV":
+                if types == ["int", "int"] and values[1] != 0:
+                    return "int", values[0] // values[1]
+            elif opcode == "DIV":
+                if types == ["float", "float"] and values[1] != 0:
+                    return "float", values[0] / values[1]
+            elif opcode in RELATION:
+                if types[0] == types[1]:
+                    return "bool", RELATION[opcode](values[0], values[1])
+            elif opcode in FOLDED_BOOL:
+                if types == ["bool", "bool"]:
+                    return "bool", FOLDED_BOOL[opcode](values[0], values[1])
+            elif opcode == "NOT":
+                if types == ["bool"]:
+                    return "bool", not values[0]
+            elif opcode == "INT2CHAR":
+                if types == ["int"]:
+                    return "string", chr(values[0])
+            elif opcode == "STRI2INT":
+                if types == ["string", "int"]:
+                    return "int", ord(values[0][values[1]])
+            elif opcode == "INT2FLOAT":
+                if types == ["int"]:
+                    return "float", float(values[0])
+            elif opcode == "FLOAT2INT":
+                if types == ["float"]:
+                    return "int", int(values[0])
+            elif opcode == "CONCAT":
+                if types == ["string", "string"]:
+                    return "string", values[0] + values[1]
+            elif opcode == "STRLEN":
+                if types == ["string"]:
+                    return "int", len(values[0])
+            elif opcode == "GETCHAR":
+                if types == ["string", "int"]:
+                    return "string", values[0][values[1]]
+            elif opcode == "TYPE":
+                return "string", types[0]
+        except (ValueError, OverflowError, IndexError, TypeError):
+            pass
+
+        return None
+
+    @staticmethod
+    def literal_condition(instruction):
+        """
+        Evaluates condition of JUMPIFEQ or JUMPIFNEQ with literal operands
+        :param instruction: Conditional jump
+        :return: True if jump is always taken, False if never, None if it is not known or would fail
+        """
+        label, symb1, symb2 = instruction["args"]
+
+        if symb1[0] not in LITERAL_TYPES or symb1[0] != symb2[0]:
+            return None
+
+        return (symb1[1] == symb2[1]) == CONDITIONAL_JUMPS[instruction["opcode"]]
+
+    def eliminate_dead_code(self):
+        """
+        Drops instructions, which can not be reached from program start by fall through or jump,
+        resolved jump targets and labels are moved to new instruction positions
+        """
+        interpret = self.interpret
+        instructions = interpret.instructions
+        inst_len = len(instructions)
+        reachable = [False] * (inst_len + 1)
+        pending = [0]
+
+        while pending:
+            index = pending.pop()
+            if reachable[index]:
+                continue
+            reachable[index] = True
+            if index == inst_len:
+                continue
+
+            instruction = instructions[index]
+            opcode = instruction["opcode"]
+            condition = self.literal_condition(instruction) if opcode in CONDITIONAL_JUMPS else None
+            if (opcode == "JUMP" or opcode in BRANCHES) and condition is not False:
+                target = instruction["args"][0][2]
+                if target is not None:
+                    pending.append(target)
+            if opcode not in NO_FALL_THROUGH and condition is not True:
+                pending.append(index + 1)
+
+        if all(reachable[:inst_len]):
+            return
+
+        # New position of every kept instruction, removed ones get position of next kept instruction
+        positions = []
+        new_index = []
+        for index in range(inst_len + 1):
+            new_index.append(len(positions))
+            if index < inst_len and reachable[index]:
+                positions.append(index)
+
+        optimized = []
+        for index in positions:
+            instruction = instructions[index]
+            if instruction["opcode"] in BRANCHES or instruction["opcode"] == "JUMP":
+                label = instruction["args"][0]
+                target = new_index[label[2]] if label[2] is not None else None
+                instruction = {"opcode": instruction["opcode"], "args": [["label", label[1], target]] +
+                               instruction["args"][1:]}
+            optimized.append(instruction)
+
+        interpret.labels = {name: new_index[position - 1] + 1 for name, position in interpret.labels.items()
+                            if reachable[position - 1]}
+        interpret.instructions = optimized
+        interpret.positions = positions
+
+
+class PeepholeOptimizer:
+    def __init__(self, engine):
+        """
+        Sets optimized engine
+        :param engine: ThreadedEngine
+        """
+        self.engine = engine
+        self.interpret = engine.interpret
+        self.instructions = engine.interpret.instructions
+
+    def thread_jumps(self):
+        """
+        Finds jump targets, which are unconditional jumps themselves
+        :return: Dictionary of jump target and its final target with number of skipped jumps
+        """
+        threads = {}
+        inst_len = len(self.instructions)
+
+        for instruction in self.instructions:
+            if instruction["opcode"] not in ("CALL", "JUMP", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS"):
+                continue
+
+            start = instruction["args"][0][2]
+            if start is None or start in threads:
+                continue
+
+            target = start
+            hops = 0
+            visited = {target}
+            while target < inst_len and self.instructions[target]["opcode"] == "JUMP":
+                next_target = self.instructions[target]["args"][0][2]
+                if next_target is None or next_target in visited:
+                    break
+                visited.add(next_target)
+                target = next_target
+                hops += 1
+
+            if hops:
+                threads[start] = (target, hops)
+
+        return threads
+
+    def fuse(self):
+        """
+        Replaces common instruction sequences in decoded program by superinstructions,
+        fused instructions are kept in place, because no jump can land inside of sequence
+        """
+        instructions = self.instructions
+        program = self.engine.program
+        inst_len = len(instructions)
+        current_inst = 0
+
+        while current_inst < inst_len:
+            opcodes = [instruction["opcode"] for instruction in instructions[current_inst:current_inst + 4]]
+            args = [instruction["args"] for instruction in instructions[current_inst:current_inst + 4]]
+            handlers = program[current_inst:current_inst + 4]
+            fused = None
+
+            if len(opcodes) == 4 and opcodes[0] == "PUSHS" and opcodes[1] == "PUSHS" and opcodes[3] == "POPS":
+                if opcodes[2] in STACK_ARITMETIC:
+                    fused = self.stack_aritmetic(args[0][0], args[1][0], opcodes[2], args[3][0], handlers)
+                elif opcodes[2] in STACK_RELATION:
+                    fused = self.stack_relation(args[0][0], args[1][0], opcodes[2], args[3][0], handlers)
+            if fused is None and len(opcodes) >= 2 and opcodes[0] in RELATION and opcodes[1] in CONDITIONAL_JUMPS:
+                condition = args[1]
+                if condition[1][0] == "var" and condition[1][1] == args[0][0][1] and condition[2][0] == "bool":
+                    fused = self.compare_and_jump(args[0], opcodes[0], opcodes[1], condition, handlers[:2])
+            if fused is None and len(opcodes) >= 2 and opcodes[0] == "MOVE" and opcodes[1] == "JUMP":
+                fused = self.sequence(handlers[:2])
+
+            if fused is not None:
+                program[current_inst] = fused[0]
+                current_inst += fused[1]
+            else:
+                current_inst += 1
+
+    def sequence(self, handlers):
+        """
+        Creates superinstruction, which runs handlers without returning to engine loop
+        :param handlers: Handlers of fused instructions
+        :return: Handler and number of fused instructions
+        """
+        interpret = self.interpret
+        extra = len(handlers) - 1
+
+        def handler(current_inst):
+            interpret.total_inst += extra
+            for fused_handler in handlers:
+                current_inst = fused_handler(current_inst)
+            return current_inst
+
+        return handler, len(handlers)
+
+    def stack_aritmetic(self, symb1, symb2, opcode, var, handlers):
+        """
+        Creates superinstruction for PUSHS, PUSHS, aritmetic stack instruction and POPS
+        :return: Handler and number of fused instructions
+        """
+        interpret = self.interpret
+        get_symbol = interpret.variables_factory.get_symbol_type_and_value
+        get_var = interpret.variables_factory.get_var
+        operation = STACK_ARITMETIC[opcode]
+        types = (TYPE_INT,) if opcode == "IDIVS" else (TYPE_INT, TYPE_FLOAT)
+        fallback = self.sequence(handlers)[0]
+
+        def handler(current_inst):
+            symb1_type, symb1_value = get_symbol(symb1)
+            symb2_type, symb2_value = get_symbol(symb2)
+
+            if symb1_type != symb2_type or symb1_type not in types or (opcode == "IDIVS" and symb2_value == 0):
+                return fallback(current_inst)
+
+            value = operation(symb1_value, symb2_value)
+            variable = get_var(var)
+            variable.variable_type = symb1_type
+            variable.value = value
+            interpret.total_inst += 3
+            return current_inst + 4
+
+        return handler, 4
+
+    def stack_relation(self, symb1, symb2, opcode, var, handlers):
+        """
+        Creates superinstruction for PUSHS, PUSHS, relation stack instruction and POPS
+        :return: Handler and number of fused instructions
+        """
+        interpret = self.interpret
+        get_symbol = interpret.variables_factory.get_symbol_type_and_value
+        get_var = interpret.variables_factory.get_var
+        operation = STACK_RELATION[opcode]
+        fallback = self.sequence(handlers)[0]
+
+        def handler(current_inst):
+            symb1_type, symb1_value = get_symbol(symb1)
+            symb2_type, symb2_value = get_symbol(symb2)
+
+            if symb1_type != symb2_type:
+                return fallback(current_inst)
+
+            value = operation(symb1_value, symb2_value)
+            variable = get_var(var)
+            variable.variable_type = TYPE_BOOL
+            variable.value = value
+            interpret.total_inst += 3
+            return current_inst + 4
+
+        return handler, 4
+
+    def compare_and_jump(self, relation_args, relation_opcode, jump_opcode, jump_args, handlers):
+        """
+        Creates superinstruction for relation instruction followed by conditional jump on its result
+        :return: Handler and number of fused instructions
+        """
+        interpret = self.interpret
+        get_symbol = interpret.variables_factory.get_symbol_type_and_value
+        get_var = interpret.variables_factory.get_var
+        operation = RELATION[relation_opcode]
+        var, symb1, symb2 = relation_args
+        expected = jump_args[2][1]
+        jump_if_equal = CONDITIONAL_JUMPS[jump_opcode]
+        jump_to_label = self.engine.jump_target(jump_args[0])
+        fallback = self.sequence(handlers)[0]
+
+        def handler(current_inst):
+            variable = get_var(var)
+            symb1_type, symb1_value = get_symbol(symb1)
+            symb2_type, symb2_value = get_symbol(symb2)
+
+            if symb1_type != symb2_type:
+                return fallback(current_inst)
+
+            variable.variable_type = TYPE_BOOL
+            variable.value = operation(symb1_value, symb2_value)
+            interpret.total_inst += 1
+
+            if (variable.value == expected) == jump_if_equal:
+                return jump_to_label()
+            return current_inst + 2
+
+        return handler, 2
@@ -0,0 +1,54 @@
+DEFAULT_BUFFER_SIZE = 1 << 16
+
+
+class BufferedOutput:
+    def __init__(self, stream, buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        Sets stream and empty buffer
+        :param stream: Text stream, where buffered output is written
+        :param buffer_size: Number of characters kept in buffer before they are written to stream, 0 writes every call
+        """
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.chunks = []
+        self.size = 0
+
+    def write(self, text):
+        """
+        Appends text to buffer and writes whole buffer to stream when it is full
+        :param text: Written string
+        :return: Number of written characters
+        """
+        if not isinstance(text, str):
+            raise TypeError("write() argument must be str, not %s" % type(text).__name__)
+
+        self.chunks.append(text)
+        self.size += len(text)
+
+        if self.size > self.buffer_size:
+            self.write_buffer()
+
+        return len(text)
+
+    def write_buffer(self):
+        """
+        Writes buffered text to stream
+        """
+        if self.chunks:
+            text = "".join(self.chunks)
+            self.chunks = []
+            self.size = 0
+            self.stream.write(text)
+
+    def flush(self):
+        """
+        Writes buffered text to stream and flushes stream
+        """
+        self.write_buffer()
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        """
+        Other stream attributes (encoding, fileno, ...) are taken from wrapped stream
+        """
+        return getattr(self.stream, name)
@@ -0,0 +1,324 @@
+import bisect
+import json
+import sys
+import threading
+import time
+
+PROFILE_FORMATS = ["json", "text"]
+
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# Name of root frame of sampled call stacks
+MAIN_FRAME = "main"
+
+
+class Profiler:
+    def __init__(self, interpret):
+        """
+        Sets empty profile
+        :param interpret: Profiled InterpretFactory
+        """
+        self.interpret = interpret
+        self.counts = []
+        self.times = []
+        self.labels = {}
+        self.active = {}
+        self.frames = []
+        self.start = None
+        self.end = None
+
+    def instrument(self, engine):
+        """
+        Wraps every decoded handler of engine by handler measuring it, engine without profiler runs unchanged
+        :param engine: ThreadedEngine with decoded program
+        """
+        program = engine.program
+        self.counts = [0] * len(program)
+        self.times = [0.0] * len(program)
+
+        for index, instruction in enumerate(self.interpret.instructions):
+            if instruction["opcode"] == "CALL":
+                program[index] = self.call(index, program[index], instruction["args"][0][1])
+            elif instruction["opcode"] == "RETURN":
+                program[index] = self.return_from_call(index, program[index])
+            else:
+                program[index] = self.measure(index, program[index])
+
+        self.start = time.perf_counter()
+
+    def measure(self, index, handler):
+        """
+        Creates handler counting instruction and its time
+        :param index: Instruction index
+        :param handler: Measured handler
+        """
+        counts = self.counts
+        times = self.times
+        perf_counter = time.perf_counter
+
+        def profiled(current_inst):
+            start = perf_counter()
+            try:
+                return handler(current_inst)
+            finally:
+                times[index] += perf_counter() - start
+                counts[index] += 1
+
+        return profiled
+
+    def call(self, index, handler, label):
+        """
+        Creates CALL handler, which opens profile frame of called label
+        :param index: Instruction index
+        :param handler: CALL handler
+        :param label: Called label name
+        """
+        measured = self.measure(index, handler)
+
+        def profiled(current_inst):
+            next_inst = measured(current_inst)
+            self.enter(label)
+            return next_inst
+
+        return profiled
+
+    def return_from_call(self, index, handler):
+        """
+        Creates RETURN handler, which closes profile frame of current label
+        :param index: Instruction index
+        :param handler: RETURN handler
+        """
+        measured = self.measure(index, handler)
+
+        def profiled(current_inst):
+            next_inst = measured(current_inst)
+            self.leave(time.perf_counter())
+            return next_inst
+
+        return profiled
+
+    def enter(self, label):
+        """
+        Opens profile frame of called label
+        :param label: Label name
+        """
+        self.frames.append([label, time.perf_counter(), 0.0])
+        self.active[label] = self.active.get(label, 0) + 1
+
+    def leave(self, now):
+        """
+        Closes profile frame of current label, inclusive time of recursive calls is counted once
+        :param now: Time of return
+        """
+        label, start, children = self.frames.pop()
+        inclusive = now - start
+        self.active[label] -= 1
+
+        stats = self.labels.setdefault(label, {"calls": 0, "inclusive": 0.0, "exclusive": 0.0})
+        stats["calls"] += 1
+        stats["exclusive"] += inclusive - children
+        if self.active[label] == 0:
+            stats["inclusive"] += inclusive
+
+        if self.frames:
+            self.frames[-1][2] += inclusive
+
+    def finish(self):
+        """
+        Stops profiling, frames of calls without return are closed at program end
+        """
+        if self.end is None:
+            self.end = time.perf_counter()
+            while self.frames:
+                self.leave(self.end)
+
+    def report(self):
+        """
+        Creates profile report
+        :return: Dictionary with total time and stats per opcode, per instruction and per called label
+        """
+        self.finish()
+        instructions = self.interpret.instructions
+        positions = self.interpret.positions
+        opcodes = {}
+        orders = []
+
+        for index, count in enumerate(self.counts):
+            if count == 0:
+                continue
+            opcode = instructions[index]["opcode"]
+            order = (positions[index] if positions is not None else index) + 1
+            orders.append({"order": order, "opcode": opcode, "count": count, "time": self.times[index]})
+
+            stats = opcodes.setdefault(opcode, {"opcode": opcode, "count": 0, "time": 0.0})
+            stats["count"] += count
+            stats["time"] += self.times[index]
+
+        labels = [dict(label=label, **stats) for label, stats in self.labels.items()]
+
+        return {
+            "time": self.end - self.start if self.start is not None else 0.0,
+            "instructions": sum(self.counts),
+            "opcodes": sorted(opcodes.values(), key=lambda stats: -stats["time"]),
+            "orders": sorted(orders, key=lambda stats: -stats["time"]),
+            "labels": sorted(labels, key=lambda stats: -stats["inclusive"]),
+        }
+
+    def write(self, path, profile_format="json"):
+        """
+        Writes profile report to file
+        :param path: Report file path
+        :param profile_format: json or text
+        """
+        report = self.report()
+
+        with open(path, "w") as file:
+            if profile_format == "json":
+                json.dump(report, file, indent=2)
+                file.write("\n")
+            else:
+                file.write(self.format_text(report))
+
+    @staticmethod
+    def format_text(report):
+        """
+        Formats profile report as text tables
+        :param report: Profile report
+        :return: Human readable report
+        """
+        lines = ["Total time: %.6f s" % report["time"], "Instructions: %d" % report["instructions"], "",
+                 "%-12s %12s %14s" % ("Opcode", "Count", "Time [s]")]
+        for stats in report["opcodes"]:
+            lines.append("%-12s %12d %14.6f" % (stats["opcode"], stats["count"], stats["time"]))
+
+        lines += ["", "%-8s %-12s %12s %14s" % ("Order", "Opcode", "Count", "Time [s]")]
+        for stats in report["orders"]:
+            lines.append("%-8d %-12s %12d %14.6f" % (stats["order"], stats["opcode"], stats["count"], stats["time"]))
+
+        lines += ["", "%-20s %10s %14s %14s" % ("Label", "Calls", "Inclusive [s]", "Exclusive [s]")]
+        for stats in report["labels"]:
+            lines.append("%-20s %10d %14.6f %14.6f" % (stats["label"], stats["calls"], stats["inclusive"],
+                                                       stats["exclusive"]))
+
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    def __init__(self, interpret, interval=DEFAULT_SAMPLE_INTERVAL):
+        """
+        Sets empty samples
+        :param interpret: Sampled InterpretFactory
+        :param interval: Time between samples in seconds
+        """
+        self.interpret = interpret
+        self.interval = interval
+        self.samples = {}
+        self.targets = []
+        self.names = []
+        self.block_ends = {}
+        self.codes = ()
+        self.thread_id = None
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def start(self):
+        """
+        Starts sampling of program run by current thread, program must be prepared
+        """
+        from compiled_engine import CompiledEngine
+        from engine import ThreadedEngine
+
+        # Enclosing label of instruction is label with nearest preceding jump target
+        for target, name in sorted((position - 1, name) for name, position in self.interpret.labels.items()):
+            self.targets.append(target)
+            self.names.append(name)
+
+        # Compiled engine keeps index of block start, while block, which ends by CALL or RETURN, is run
+        instructions = self.interpret.instructions
+        leaders = CompiledEngine.find_leaders(instructions)
+        self.block_ends = dict(zip(leaders, [leader - 1 for leader in leaders[1:]] + [len(instructions) - 1]))
+
+        self.codes = (ThreadedEngine.run.__code__, CompiledEngine.run.__code__,
+                      type(self.interpret).run_reference.__code__)
+        self.thread_id = threading.get_ident()
+        self.thread = threading.Thread(target=self.sample_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stops sampling
+        """
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+
+    def sample_loop(self):
+        """
+        Takes samples until sampling is stopped, runs in background thread
+        """
+        while not self.stopped.wait(self.interval):
+            stack = self.sample()
+            if stack is not None:
+                self.samples[stack] = self.samples.get(stack, 0) + 1
+
+    def sample(self):
+        """
+        Reads current instruction of running engine and IPPcode18 call stack
+        :return: Collapsed call stack or None if program is not running or it returns from CALL
+        """
+        frame = sys._current_frames().get(self.thread_id)
+        while frame is not None and frame.f_code not in self.codes:
+            frame = frame.f_back
+        if frame is None:
+            return None
+
+        current_inst = frame.f_locals.get("current_inst")
+        if current_inst is None or current_inst >= len(self.interpret.instructions):
+            return None
+
+        # CALL or RETURN changes call stack before engine moves to next instruction
+        last = self.block_ends.get(current_inst, current_inst) if frame.f_code is self.codes[1] else current_inst
+        opcode = self.interpret.instructions[last]["opcode"]
+        calls = list(self.interpret.calls)
+        if opcode == "RETURN":
+            return None
+        if opcode == "CALL" and calls and calls[-1] == last:
+            calls.pop()
+
+        return self.collapse(calls, current_inst)
+
+    def collapse(self, calls, current_inst):
+        """
+        Creates collapsed call stack from enclosing labels of CALL instructions and of current instruction
+        :param calls: Indexes of CALL instructions, which have not returned
+        :param current_inst: Index of current instruction
+        :return: Call stack with frames separated by semicolon
+        """
+        stack = [self.enclosing_label(call) for call in calls]
+        stack.append(self.enclosing_label(current_inst))
+        if stack[0] != MAIN_FRAME:
+            stack.insert(0, MAIN_FRAME)
+
+        return ";".join(stack)
+
+    def enclosing_label(self, index):
+        """
+        Finds label, which code contains instruction
+        :param index: Instruction index
+        :return: Label name or main frame name for code before first label
+        """
+        position = bisect.bisect_right(self.targets, index)
+        if position == 0:
+            return MAIN_FRAME
+
+        return self.names[position - 1]
+
+    def write(self, path):
+        """
+        Writes samples in collapsed stack format used by flamegraph tools
+        :param path: Output file path
+        """
+        with open(path, "w") as file:
+            for stack, count in sorted(self.samples.items()):
+                file.write("%s %d\n" % (stack, count))
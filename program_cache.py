@@ -0,0 +1,334 @@
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import tempfile
+import types
+import zlib
+from collections import OrderedDict
+from interpret_factory import INSTRUCTIONS
+from variables import FRAME_KINDS, BOOL_VALUES
+
+CACHE_MAGIC = b"IPPC"
+
+CACHE_VERSION = 2
+
+# Magic, version, reserved, source digest, constants, instructions, labels, body checksum
+HEADER = struct.Struct("<4sHH32sIIII")
+
+# Constant kind and payload length
+CONSTANT = struct.Struct("<BI")
+
+# Opcode, number of arguments and up to three constant indexes
+INSTRUCTION = struct.Struct("<BB3I")
+
+# Label name constant index and label position
+LABEL = struct.Struct("<II")
+
+FLOAT = struct.Struct("<d")
+
+CODE_MAGIC = b"IPPX"
+
+# Magic and checksum of marshalled code object
+CODE_HEADER = struct.Struct("<4sI")
+
+ARG_TYPES = ["var", "int", "float", "bool", "string", "label", "type"]
+
+# Number of compiled programs kept by MemoryProgramCache
+DEFAULT_MEMORY_PROGRAMS = 256
+
+
+class ProgramCacheError(Exception):
+    pass
+
+
+class ProgramCache:
+    def __init__(self, directory):
+        """
+        Sets cache directory
+        :param directory: Directory with compiled programs
+        """
+        self.directory = directory
+
+    @staticmethod
+    def source_digest(source):
+        """
+        Computes content hash of source file
+        :param source: Source file path or XML source as bytes
+        :return: SHA-256 digest
+        """
+        if isinstance(source, bytes):
+            return hashlib.sha256(source).digest()
+
+        digest = hashlib.sha256()
+        with open(source, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+
+        return digest.digest()
+
+    def path(self, digest):
+        """
+        Gets path of compiled program
+        :param digest: Source digest
+        """
+        return os.path.join(self.directory, digest.hex() + ".ippc")
+
+    def code_path(self, key):
+        """
+        Gets path of generated Python code
+        :param key: Code key
+        """
+        return os.path.join(self.directory, key.hex() + ".ippx")
+
+    def load(self, digest, interpret):
+        """
+        Loads compiled program to interpret
+        :param digest: Source digest
+        :param interpret: Empty InterpretFactory
+        :return: True if program was loaded, False if it is missing, stale or corrupt
+        """
+        try:
+            with open(self.path(digest), "rb") as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    self.decode(data, digest, interpret)
+        except (OSError, ValueError, ProgramCacheError, struct.error, UnicodeDecodeError, IndexError, KeyError):
+            interpret.instructions = []
+            interpret.labels = {}
+            return False
+
+        return True
+
+    def store(self, digest, interpret):
+        """
+        Stores loaded program
+        :param digest: Source digest
+        :param interpret: InterpretFactory with loaded program
+        :return: True if program was stored
+        """
+        return self.write(self.path(digest), self.encode(digest, interpret))
+
+    def load_code(self, key):
+        """
+        Loads generated Python code
+        :param key: Code key
+        :return: Code object or None if it is missing or corrupt
+        """
+        try:
+            with open(self.code_path(key), "rb") as file:
+                data = file.read()
+            magic, checksum = CODE_HEADER.unpack_from(data, 0)
+            body = data[CODE_HEADER.size:]
+            if magic != CODE_MAGIC or zlib.crc32(body) != checksum:
+                return None
+            code = marshal.loads(body)
+        except (OSError, ValueError, EOFError, TypeError, struct.error):
+            return None
+
+        return code if isinstance(code, types.CodeType) else None
+
+    def store_code(self, key, code):
+        """
+        Stores generated Python code
+        :param key: Code key
+        :param code: Code object
+        :return: True if code was stored
+        """
+        body = marshal.dumps(code)
+
+        return self.write(self.code_path(key), CODE_HEADER.pack(CODE_MAGIC, zlib.crc32(body)) + body)
+
+    def write(self, path, data):
+        """
+        Writes cache file, file is replaced atomically so concurrent readers never see partial file
+        :param path: File path
+        :param data: File content
+        :return: True if file was written
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(handle, "wb") as file:
+                    file.write(data)
+                os.chmod(temporary, 0o644)
+                os.replace(temporary, path)
+            except OSError:
+                os.unlink(temporary)
+                raise
+        except OSError:
+            return False
+
+        return True
+
+    @staticmethod
+    def encode(digest, interpret):
+        """
+        Encodes loaded program to binary format
+        :param digest: Source digest
+        :param interpret: InterpretFactory with loaded program
+        :return: Compiled program
+        """
+        constants = {}
+        pool = bytearray()
+        code = bytearray()
+        labels = bytearray()
+
+        def constant(arg_type, value):
+            # Floats are keyed by bit pattern, so -0.0 and 0.0 stay different constants
+            if arg_type == "float":
+                payload = FLOAT.pack(value)
+            elif arg_type == "bool":
+                payload = BOOL_VALUES[value].encode("utf-8")
+            else:
+                payload = str(value).encode("utf-8")
+            key = (arg_type, payload)
+            index = constants.get(key)
+            if index is None:
+                index = constants[key] = len(constants)
+                pool.extend(CONSTANT.pack(ARG_TYPES.index(arg_type), len(payload)))
+                pool.extend(payload)
+            return index
+
+        for instruction in interpret.instructions:
+            indexes = [constant(arg[0], arg[1]) for arg in instruction["args"]]
+            code.extend(INSTRUCTION.pack(INSTRUCTIONS.index(instruction["opcode"]), len(indexes),
+                                         *(indexes + [0] * (3 - len(indexes)))))
+
+        for name, position in interpret.labels.items():
+            labels.extend(LABEL.pack(constant("label", name), position))
+
+        body = bytes(pool + code + labels)
+
+        return HEADER.pack(CACHE_MAGIC, CACHE_VERSION, 0, digest, len(constants), len(interpret.instructions),
+                           len(interpret.labels), zlib.crc32(body)) + body
+
+    @staticmethod
+    def decode(data, digest, interpret):
+        """
+        Decodes compiled program to interpret
+        :param data: Compiled program
+        :param digest: Expected source digest
+        :param interpret: Empty InterpretFactory
+        """
+        magic, version, reserved, source_digest, constants_count, inst_count, labels_count, checksum = \
+            HEADER.unpack_from(data, 0)
+
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            raise ProgramCacheError("unknown cache format")
+        if source_digest != digest:
+            raise ProgramCacheError("compiled program is stale")
+
+        with memoryview(data) as view, view[HEADER.size:] as body:
+            if zlib.crc32(body) != checksum:
+                raise ProgramCacheError("compiled program is corrupt")
+
+        # Constant pool, every constant is decoded once and shared by all its uses
+        pool = []
+        offset = HEADER.size
+        for i in range(constants_count):
+            kind, length = CONSTANT.unpack_from(data, offset)
+            offset += CONSTANT.size
+            payload = data[offset:offset + length]
+            offset += length
+
+            arg_type = ARG_TYPES[kind]
+            if arg_type == "float":
+                value = FLOAT.unpack(payload)[0]
+            else:
+                value = payload.decode("utf-8")
+                if arg_type == "int":
+                    value = int(value)
+                elif arg_type == "bool":
+                    value = value == "true"
+
+            if arg_type == "var":
+                pool.append([arg_type, value, FRAME_KINDS[value[:2]], value[3:]])
+            else:
+                pool.append([arg_type, value])
+
+        code_end = offset + inst_count * INSTRUCTION.size
+        labels_end = code_end + labels_count * LABEL.size
+        if labels_end != len(data):
+            raise ProgramCacheError("compiled program has wrong size")
+
+        instructions = []
+        for opcode, args_count, *indexes in INSTRUCTION.iter_unpack(data[offset:code_end]):
+            args = [pool[index] for index in indexes[:args_count]]
+            instructions.append({"opcode": INSTRUCTIONS[opcode], "args": args})
+
+        labels = {}
+        for name, position in LABEL.iter_unpack(data[code_end:labels_end]):
+            labels[pool[name][1]] = position
+
+        interpret.instructions = instructions
+        interpret.labels = labels
+
+
+class MemoryProgramCache(ProgramCache):
+    def __init__(self, size=DEFAULT_MEMORY_PROGRAMS):
+        """
+        Sets empty cache, compiled programs are kept in memory of current process
+        :param size: Maximal number of programs, least recently used program is dropped first
+        """
+        super().__init__(None)
+        self.size = size
+        self.programs = OrderedDict()
+        self.codes = OrderedDict()
+
+    def load(self, digest, interpret):
+        """
+        Loads compiled program to interpret
+        :param digest: Source digest
+        :param interpret: Empty InterpretFactory
+        :return: True if program was loaded, False if it is missing
+        """
+        data = self.programs.get(digest)
+        if data is None:
+            return False
+
+        self.programs.move_to_end(digest)
+        self.decode(data, digest, interpret)
+
+        return True
+
+    def store(self, digest, interpret):
+        """
+        Stores loaded program
+        :param digest: Source digest
+        :param interpret: InterpretFactory with loaded program
+        :return: True if program was stored
+        """
+        self.programs[digest] = self.encode(digest, interpret)
+        self.programs.move_to_end(digest)
+        while len(self.programs) > self.size:
+            self.programs.popitem(last=False)
+
+        return True
+
+    def load_code(self, key):
+        """
+        Loads generated Python code
+        :param key: Code key
+        :return: Code object or None if it is missing
+        """
+        code = self.codes.get(key)
+        if code is not None:
+            self.codes.move_to_end(key)
+
+        return code
+
+    def store_code(self, key, code):
+        """
+        Stores generated Python code
+        :param key: Code key
+        :param code: Code object
+        :return: True if code was stored
+        """
+        self.codes[key] = code
+        self.codes.move_to_end(key)
+        while len(self.codes) > self.size:
+            self.codes.popitem(last=False)
+
+        return True
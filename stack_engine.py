@@ -0,0 +1,280 @@
+import operator
+from errors import IPPcodeMissingValueError, IPPcodeOperandTypeError
+from variables import TYPE_INT, TYPE_BOOL, TYPE_STRING, TYPE_FLOAT
+
+STACK_ARITMETIC_OPERATIONS = {"ADDS": ("add", operator.add), "SUBS": ("sub", operator.sub),
+                              "MULS": ("mul", operator.mul), "IDIVS": ("idiv", operator.floordiv)}
+
+STACK_RELATION_OPERATORS = {"LTS": ("lt", operator.lt), "GTS": ("gt", operator.gt), "EQS": ("eq", operator.eq)}
+
+STACK_BOOL_OPERATORS = {"ANDS": "and", "ORS": "or"}
+
+STACK_INSTRUCTIONS = ["PUSHS", "POPS", "CLEARS", "ADDS", "SUBS", "MULS", "IDIVS", "LTS", "GTS", "EQS", "ANDS", "ORS",
+                      "NOTS", "INT2CHARS", "STRI2INTS"]
+
+
+class StackEngine:
+    def __init__(self, variables_factory):
+        """
+        Sets empty data stack, types and values of stack items are kept in two parallel lists
+        :param variables_factory: VariablesFactory used for variables and for reporting operand errors
+        """
+        self.variables_factory = variables_factory
+        self.types = []
+        self.values = []
+
+    def decode(self, opcode, args):
+        """
+        Creates handler specialized for stack instruction
+        :param opcode: Stack instruction code
+        :param args: Instruction arguments
+        :return: Handler, which gets current instruction index and returns next one
+        """
+        if opcode == "PUSHS":
+            return self.push(args[0])
+        elif opcode == "POPS":
+            return self.pop(args[0])
+        elif opcode == "CLEARS":
+            return self.clear
+        elif opcode in STACK_ARITMETIC_OPERATIONS:
+            return self.aritmetic_operation(opcode)
+        elif opcode in STACK_RELATION_OPERATORS:
+            return self.relation_operator(opcode)
+        elif opcode in STACK_BOOL_OPERATORS:
+            return self.bool_operator(opcode)
+        elif opcode == "NOTS":
+            return self.not_operator()
+        elif opcode == "INT2CHARS":
+            return self.int_to_char()
+        elif opcode == "STRI2INTS":
+            return self.stri_to_int()
+
+    @staticmethod
+    def empty_stack_error():
+        """
+        Raises error on pop from empty data stack
+        """
+        raise IPPcodeMissingValueError("Data stack is empty")
+
+    def push(self, symb):
+        """
+        Creates PUSHS handler, literal is pushed without any lookup
+        :param symb: Pushed symbol
+        """
+        types = self.types
+        values = self.values
+
+        if symb[0] == "var":
+            get_symbol = self.variables_factory.get_symbol_type_and_value
+
+            def handler(current_inst):
+                symb_type, symb_value = get_symbol(symb)
+                types.append(symb_type)
+                values.append(symb_value)
+                return current_inst + 1
+        else:
+            symb_type, symb_value = self.variables_factory.get_symbol_type_and_value(symb)
+
+            def handler(current_inst):
+                types.append(symb_type)
+                values.append(symb_value)
+                return current_inst + 1
+
+        return handler
+
+    def pop(self, var):
+        """
+        Creates POPS handler
+        :param var: Variable, where popped value is saved
+        """
+        types = self.types
+        values = self.values
+        get_var = self.variables_factory.get_var
+        empty_stack_error = self.empty_stack_error
+
+        def handler(current_inst):
+            variable = get_var(var)
+            if not types:
+                empty_stack_error()
+            variable.variable_type = types.pop()
+            variable.value = values.pop()
+            return current_inst + 1
+
+        return handler
+
+    def clear(self, current_inst):
+        """
+        Handler for CLEARS
+        """
+        del self.types[:]
+        del self.values[:]
+        return current_inst + 1
+
+    def pop_operands(self):
+        """
+        Pops two operands for operation with wrong operands, which is reported by VariablesFactory
+        :return: First operand type and value and second operand type and value
+        """
+        if not self.types:
+            self.empty_stack_error()
+        symb2_type, symb2_value = self.types.pop(), self.values.pop()
+        if not self.types:
+            self.empty_stack_error()
+
+        return self.types.pop(), self.values.pop(), symb2_type, symb2_value
+
+    def aritmetic_operation(self, opcode):
+        """
+        Creates handler for ADDS, SUBS, MULS and IDIVS, result replaces first operand on stack top
+        :param opcode: Instruction code
+        """
+        types = self.types
+        values = self.values
+        name, operation = STACK_ARITMETIC_OPERATIONS[opcode]
+        numeric_types = (TYPE_INT,) if opcode == "IDIVS" else (TYPE_INT, TYPE_FLOAT)
+        aritmetic_result = self.variables_factory.aritmetic_result
+        pop_operands = self.pop_operands
+
+        def handler(current_inst):
+            if len(types) > 1 and types[-1] == types[-2] and types[-1] in numeric_types and \
+                    (opcode != "IDIVS" or values[-1] != 0):
+                types.pop()
+                symb2_value = values.pop()
+                values[-1] = operation(values[-1], symb2_value)
+            else:
+                result_type, result_value = aritmetic_result(*pop_operands(), name)
+                types.append(result_type)
+                values.append(result_value)
+            return current_inst + 1
+
+        return handler
+
+    def relation_operator(self, opcode):
+        """
+        Creates handler for LTS, GTS and EQS
+        :param opcode: Instruction code
+        """
+        types = self.types
+        values = self.values
+        name, operation = STACK_RELATION_OPERATORS[opcode]
+        relation_result = self.variables_factory.relation_result
+        pop_operands = self.pop_operands
+
+        def handler(current_inst):
+            if len(types) > 1 and types[-1] == types[-2]:
+                types.pop()
+                symb2_value = values.pop()
+                types[-1] = TYPE_BOOL
+                values[-1] = operation(values[-1], symb2_value)
+            else:
+                values.append(relation_result(*pop_operands(), name))
+                types.append(TYPE_BOOL)
+            return current_inst + 1
+
+        return handler
+
+    def bool_operator(self, opcode):
+        """
+        Creates handler for ANDS and ORS
+        :param opcode: Instruction code
+        """
+        types = self.types
+        values = self.values
+        name = STACK_BOOL_OPERATORS[opcode]
+        bool_result = self.variables_factory.bool_result
+        pop_operands = self.pop_operands
+
+        def handler(current_inst):
+            if len(types) > 1 and types[-1] == TYPE_BOOL and types[-2] == TYPE_BOOL:
+                types.pop()
+                symb2_value = values.pop()
+                if name == "and":
+                    values[-1] = values[-1] and symb2_value
+                else:
+                    values[-1] = values[-1] or symb2_value
+            else:
+                values.append(bool_result(*pop_operands(), name))
+                types.append(TYPE_BOOL)
+            return current_inst + 1
+
+        return handler
+
+    def not_operator(self):
+        """
+        Creates handler for NOTS
+        """
+        types = self.types
+        values = self.values
+        bool_result = self.variables_factory.bool_result
+        empty_stack_error = self.empty_stack_error
+
+        def handler(current_inst):
+            if not types:
+                empty_stack_error()
+            if types[-1] == TYPE_BOOL:
+                values[-1] = not values[-1]
+            else:
+                symb_type, symb_value = types.pop(), values.pop()
+                values.append(bool_result(symb_type, symb_value, symb_type, symb_value, "not"))
+                types.append(TYPE_BOOL)
+            return current_inst + 1
+
+        return handler
+
+    def int_to_char(self):
+        """
+        Creates handler for INT2CHARS
+        """
+        types = self.types
+        values = self.values
+        int_to_char_result = self.variables_factory.int_to_char_result
+        empty_stack_error = self.empty_stack_error
+
+        def handler(current_inst):
+            if not types:
+                empty_stack_error()
+            symb_type = types.pop()
+            symb_value = values.pop()
+            values.append(int_to_char_result(symb_type, symb_value))
+            types.append(TYPE_STRING)
+            return current_inst + 1
+
+        return handler
+
+    def stri_to_int(self):
+        """
+        Creates handler for STRI2INTS
+        """
+        types = self.types
+        values = self.values
+        stri_to_int_result = self.variables_factory.stri_to_int_result
+        pop_operands = self.pop_operands
+
+        def handler(current_inst):
+            values.append(stri_to_int_result(*pop_operands()))
+            types.append(TYPE_INT)
+            return current_inst + 1
+
+        return handler
+
+    def is_equal(self):
+        """
+        Checks if two symbols on top of data stack are equal
+        """
+        symb1_type, symb1_value, symb2_type, symb2_value = self.pop_operands()
+
+        if symb1_type != symb2_type:
+            raise IPPcodeOperandTypeError("Both symbols in JUMPIFEQ must be same type")
+
+        return symb1_value == symb2_value
+
+    def is_not_equal(self):
+        """
+        Checks if two symbols on top of data stack are not equal
+        """
+        symb1_type, symb1_value, symb2_type, symb2_value = self.pop_operands()
+
+        if symb1_type != symb2_type:
+            raise IPPcodeOperandTypeError("Both symbols in JUMPIFNEQ must be same type")
+
+        return symb1_value != symb2_value
@@ -0,0 +1,42 @@
+class StringBuilder:
+    __slots__ = ("chars", "text")
+
+    def __init__(self, text):
+        """
+        Creates mutable string, characters are kept in list and joined only when string is needed
+        :param text: Initial string
+        """
+        self.chars = list(text)
+        self.text = text
+
+    def append(self, text):
+        """
+        Appends string to the end
+        :param text: Appended string
+        """
+        self.chars.extend(text)
+        self.text = None
+
+    def set_char(self, index, char):
+        """
+        Replaces one character
+        :param index: Character index
+        :param char: New character
+        """
+        self.chars[index] = char
+        self.text = None
+
+    def __len__(self):
+        return len(self.chars)
+
+    def __getitem__(self, index):
+        return self.chars[index]
+
+    def __str__(self):
+        """
+        Joins characters, joined string is kept until next change
+        """
+        if self.text is None:
+            self.text = "".join(self.chars)
+
+        return self.text
@@ -0,0 +1,124 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from batch import BatchWorker, load_manifest, run_batch
+from errors import IPPcodeSourceError
+from test_interpret import ROOT, to_xml
+
+SOURCE = """.IPPcode18
+DEFVAR GF@x
+READ GF@x int
+ADD GF@x GF@x int@1
+WRITE GF@x
+"""
+
+ERROR_SOURCE = """.IPPcode18
+WRITE GF@x
+"""
+
+
+def write_batch(tmpdir, entries):
+    """
+    Writes sources and manifest
+    :param entries: List of manifest entries
+    :return: Manifest path
+    """
+    for name, source in [("source.xml", SOURCE), ("error.xml", ERROR_SOURCE)]:
+        tmpdir.join(name).write(to_xml(source))
+    tmpdir.join("input").write("41\n")
+    manifest = tmpdir.join("manifest")
+    manifest.write("".join(json.dumps(entry) + "\n" for entry in entries))
+
+    return str(manifest)
+
+
+def read_report(path):
+    """
+    Reads JSON lines report
+    :return: Run results and summary
+    """
+    with open(path) as file:
+        lines = [json.loads(line) for line in file]
+
+    return lines[:-1], lines[-1]["summary"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_batch(tmpdir, workers):
+    entries = [{"source": "source.xml", "input": str(number)} for number in range(20)]
+    entries += [{"source": "error.xml", "id": "error"}, {"source": "source.xml", "stdin": "input"}]
+    report = tmpdir.join("report")
+    with open(str(report), "w") as file:
+        summary = run_batch(load_manifest(write_batch(tmpdir, entries)), file, workers)
+
+    results, report_summary = read_report(str(report))
+    assert summary == report_summary
+    assert summary["runs"] == 22 and summary["failed"] == 1 and summary["workers"] == workers
+    assert summary["insts"] == 21 * 4
+    assert summary["runs_per_second"] > 0
+
+    # Results are in manifest order
+    for number, result in enumerate(results[:20]):
+        assert result["id"] == number
+        assert result["stdout"] == "%d\n" % (number + 1)
+        assert (result["exit_code"], result["insts"], result["vars"]) == (0, 4, 1)
+
+    assert results[20]["id"] == "error"
+    assert results[20]["exit_code"] == 54
+    assert results[20]["stderr"].startswith("ERROR:")
+    assert "insts" not in results[20]
+    assert results[21]["stdout"] == "42\n"
+
+
+def test_worker_caches_programs(tmpdir):
+    entries = load_manifest(write_batch(tmpdir, [{"source": "source.xml", "input": "1"}]))
+    worker = BatchWorker()
+    for _ in range(3):
+        assert worker.run(entries[0])["stdout"] == "2\n"
+
+    assert len(worker.program_cache.programs) == 1
+
+
+def test_missing_input(tmpdir):
+    entries = load_manifest(write_batch(tmpdir, [{"source": "source.xml", "stdin": "missing"}]))
+    result = BatchWorker().run(entries[0])
+    assert result["exit_code"] == 11
+
+
+def test_wrong_manifest(tmpdir):
+    with pytest.raises(IPPcodeSourceError):
+        load_manifest(str(tmpdir.join("missing")))
+
+    with pytest.raises(IPPcodeSourceError):
+        load_manifest(write_batch(tmpdir, [["source.xml"]]))
+
+
+def test_interpret_batch(tmpdir):
+    manifest = write_batch(tmpdir, [{"source": "source.xml", "input": "5"}, {"source": "error.xml"}])
+    report = str(tmpdir.join("report"))
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret.py"), "--batch=" + manifest,
+                             "--report=" + report, "--workers=2"], stderr=subprocess.PIPE, timeout=60)
+    assert result.returncode == 0
+
+    results, summary = read_report(report)
+    assert [result["exit_code"] for result in results] == [0, 54]
+    assert results[0]["stdout"] == "6\n"
+    assert summary["runs"] == 2
+
+
+@pytest.mark.parametrize("args", [["--source=x"], ["--stats=x"], ["--output=x"], ["--workers=0"]])
+def test_wrong_batch_arguments(tmpdir, args):
+    manifest = write_batch(tmpdir, [])
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret.py"), "--batch=" + manifest] + args,
+                            stderr=subprocess.PIPE, timeout=60)
+    assert result.returncode == 10
+
+
+def test_workers_without_batch():
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret.py"), "--source=x", "--workers=2"],
+                            stderr=subprocess.PIPE, timeout=60)
+    assert result.returncode == 10
@@ -0,0 +1,71 @@
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.runner import BenchmarkRunner, INTERPRET, MIN_TIME_DIFFERENCE, compare, format_results
+from benchmarks.workloads import WORKLOADS, generate
+
+OUTPUTS = {"strings": "50\n", "stack": "99\n", "io": "".join("%d\nline %d\n" % (i, i) for i in range(25))}
+
+
+@pytest.mark.parametrize("name", sorted(WORKLOADS))
+def test_workload(tmpdir, name):
+    workload = generate(name, 50)
+    source = tmpdir.join("source.xml")
+    source.write(workload.source())
+
+    result = subprocess.run([sys.executable, INTERPRET, "--source=" + str(source)], input=workload.stdin.encode(),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+
+    assert result.returncode == 0, result.stderr
+    if name in OUTPUTS:
+        assert result.stdout.decode() == OUTPUTS[name]
+
+
+def test_measure():
+    runner = BenchmarkRunner(repeat=1)
+    results = runner.measure_all([generate("arithmetic", 100), generate("io", 10)])
+
+    arithmetic = results["results"]["arithmetic"]
+    assert arithmetic["instructions"] == 10 * 100 + 8
+    assert arithmetic["ips"] > 0
+    assert arithmetic["rss"] > 0
+    assert results["results"]["io"]["startup"] == arithmetic["startup"]
+
+
+def test_compare():
+    result = {"size": 10, "instructions": 100, "startup": 0.1, "load": 0.05, "run": 1.0, "ips": 100.0, "rss": 1000}
+    baseline = {"results": {"a": result, "b": dict(result, size=20)}}
+    slower = dict(result, load=0.08, run=1.25, ips=80.0, rss=1050, startup=0.104)
+
+    assert compare(baseline, {"results": {"a": result}}) == []
+    assert compare(baseline, {"results": {"a": slower, "b": slower, "c": slower}}) == [
+        "a: ips 80 < 100", "a: load 0.0800 s > 0.0500 s"]
+    assert compare(baseline, {"results": {"a": slower}}, threshold=0.7) == []
+
+
+def test_noisy_run():
+    runner = BenchmarkRunner(repeat=1)
+    # Full run is not slower than run, which skips all instructions
+    runner.fastest = lambda source, stdin="", stats=False: (0.1, 1000, 50)
+    results = runner.measure_all([generate("arithmetic", 5)])
+
+    noisy = results["results"]["arithmetic"]
+    assert noisy["run"] == 0.0
+    assert noisy["ips"] is None
+    assert " - " in format_results(results)
+
+    measured = dict(noisy, run=1.0, ips=50.0)
+    assert compare({"results": {"arithmetic": measured}}, results) == []
+    assert compare(results, {"results": {"arithmetic": measured}}) == []
+
+
+def test_compare_ips_noise():
+    result = {"size": 10, "instructions": 100, "startup": 0.1, "load": 0.05, "run": 0.001, "ips": 1e5, "rss": 1000}
+    # Baseline saved with run time below noise has huge speed
+    baseline = {"results": {"a": dict(result, run=1e-9, ips=1e11)}}
+
+    assert compare(baseline, {"results": {"a": result}}) == []
+    slower = dict(result, run=0.001 + 2 * MIN_TIME_DIFFERENCE, ips=100 / (0.001 + 2 * MIN_TIME_DIFFERENCE))
+    assert compare({"results": {"a": result}}, {"results": {"a": slower}}) == ["a: ips %.0f < 100000" % slower["ips"]]
@@ -0,0 +1,189 @@
+import io
+import os
+
+import pytest
+
+from compiled_engine import CompiledEngine
+from errors import IPPcodeError
+from interpreter import Interpreter
+from program_cache import MemoryProgramCache
+from test_interpret import to_xml
+
+LOOP = """.IPPcode18
+DEFVAR GF@i
+DEFVAR GF@acc
+DEFVAR GF@c
+MOVE GF@i int@0
+MOVE GF@acc int@0
+LABEL loop
+ADD GF@acc GF@acc GF@i
+MUL GF@c GF@i int@2
+SUB GF@acc GF@acc GF@c
+ADD GF@i GF@i int@1
+LT GF@c GF@i int@100
+JUMPIFEQ loop GF@c bool@true
+WRITE GF@acc
+"""
+
+PROGRAMS = {
+    "loop": LOOP,
+    # Variable changes type inside loop, so guards fall back to handlers
+    "type_change": """.IPPcode18
+DEFVAR GF@x
+DEFVAR GF@n
+DEFVAR GF@t
+MOVE GF@x int@1
+MOVE GF@n int@0
+LABEL loop
+ADD GF@n GF@n int@1
+JUMPIFNEQ int GF@n int@3
+INT2FLOAT GF@x GF@x
+LABEL int
+TYPE GF@t GF@x
+JUMPIFNEQ loop GF@n int@5
+WRITE GF@x
+""",
+    "frames": """.IPPcode18
+DEFVAR GF@n
+MOVE GF@n int@0
+LABEL loop
+CREATEFRAME
+DEFVAR TF@x
+MOVE TF@x GF@n
+PUSHFRAME
+ADD LF@x LF@x int@10
+WRITE LF@x
+POPFRAME
+ADD GF@n GF@n int@1
+JUMPIFNEQ loop GF@n int@3
+WRITE TF@x
+""",
+    "calls": """.IPPcode18
+DEFVAR GF@n
+MOVE GF@n int@3
+CALL dec
+WRITE GF@n
+JUMP end
+LABEL dec
+SUB GF@n GF@n int@1
+JUMPIFEQ back GF@n int@0
+CALL dec
+LABEL back
+RETURN
+LABEL end
+BREAK
+""",
+    "literals": """.IPPcode18
+DEFVAR GF@s
+DEFVAR GF@b
+DEFVAR GF@l
+DEFVAR GF@f
+MOVE GF@s string@a\\032b
+WRITE GF@s
+WRITE float@0x1.8p+1
+WRITE bool@true
+STRLEN GF@l GF@s
+NOT GF@b bool@false
+WRITE GF@b
+DIV GF@f float@0x1p+0 float@0x1p+1
+""",
+    "undefined_label": """.IPPcode18
+DEFVAR GF@x
+MOVE GF@x int@1
+JUMPIFEQ missing GF@x int@2
+WRITE GF@x
+JUMPIFEQ missing GF@x int@1
+""",
+    "wrong_type": """.IPPcode18
+DEFVAR GF@x
+MOVE GF@x int@0
+LABEL loop
+ADD GF@x GF@x int@1
+JUMPIFNEQ next GF@x int@3
+MOVE GF@x string@three
+LABEL next
+JUMPIFNEQ loop GF@x int@5
+""",
+    "uninitialized": """.IPPcode18
+DEFVAR GF@x
+DEFVAR GF@y
+ADD GF@x GF@y int@1
+""",
+    "idiv_zero": """.IPPcode18
+DEFVAR GF@x
+DEFVAR GF@y
+MOVE GF@x int@2
+LABEL loop
+SUB GF@x GF@x int@1
+IDIV GF@y int@4 GF@x
+JUMP loop
+""",
+    "local_frame": """.IPPcode18
+ADD LF@x LF@x int@1
+""",
+}
+
+
+def run(source, engine, cache=None):
+    """
+    Runs program by engine
+    :return: Exit code, stdout, stderr and stats
+    """
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    try:
+        stats = Interpreter(to_xml(source).encode("utf-8"), engine, cache=cache).run("", stdout, stderr).stats
+        exit_code = 0
+    except IPPcodeError as e:
+        stats = None
+        exit_code = e.exit_code
+
+    return exit_code, stdout.getvalue(), stderr.getvalue(), stats
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_same_as_threaded(name):
+    assert run(PROGRAMS[name], "compiled") == run(PROGRAMS[name], "threaded")
+
+
+def test_loop_is_compiled_to_python_loop():
+    interpret = Interpreter(to_xml(LOOP).encode("utf-8"), "compiled").load()
+    interpret.prepare()
+    engine = interpret.compiled_engine
+
+    # Blocks are program start, loop body after label and code after loop
+    assert engine.leaders == [0, 6, 12]
+    loop = engine.source.split("def block_6():")[1].split("def block_12():")[0]
+    assert "while True:" in loop
+    assert "continue" in loop
+
+
+def test_leaders():
+    interpret = Interpreter(to_xml(PROGRAMS["calls"]).encode("utf-8"), "compiled").load()
+    interpret.resolve_labels()
+
+    assert CompiledEngine.find_leaders(interpret.instructions) == [0, 3, 5, 6, 8, 9, 10, 11, 12]
+
+
+def test_code_cache(tmpdir):
+    cache = os.path.join(str(tmpdir), "cache")
+    assert run(LOOP, "compiled", cache)[:2] == (0, "-4950\n")
+    files = os.listdir(cache)
+    assert len([name for name in files if name.endswith(".ippx")]) == 1
+
+    # Corrupt code is compiled again
+    code = os.path.join(cache, [name for name in files if name.endswith(".ippx")][0])
+    with open(code, "r+b") as file:
+        file.seek(10)
+        file.write(b"\xff\xff\xff")
+    assert run(LOOP, "compiled", cache)[:2] == (0, "-4950\n")
+    assert run(LOOP, "compiled", cache)[:2] == (0, "-4950\n")
+    assert sorted(os.listdir(cache)) == sorted(files)
+
+
+def test_memory_code_cache():
+    program_cache = MemoryProgramCache()
+    for _ in range(3):
+        assert run(LOOP, "compiled", program_cache)[:2] == (0, "-4950\n")
+
+    assert len(program_cache.codes) == 1
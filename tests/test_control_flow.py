@@ -0,0 +1,170 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from control_flow import ControlFlowGraph
+from interpreter import Interpreter
+from test_interpret import ROOT, to_xml
+
+NESTED = """.IPPcode18
+DEFVAR GF@i
+DEFVAR GF@j
+MOVE GF@i int@0
+LABEL outer
+MOVE GF@j int@0
+LABEL inner
+ADD GF@j GF@j int@1
+JUMPIFNEQ inner GF@j int@3
+ADD GF@i GF@i int@1
+JUMPIFNEQ outer GF@i int@3
+WRITE GF@i
+"""
+
+CALLS = """.IPPcode18
+DEFVAR GF@x
+MOVE GF@x int@0
+CALL first
+CALL second
+CALL first
+JUMP end
+WRITE GF@x
+LABEL first
+ADD GF@x GF@x int@1
+RETURN
+LABEL second
+CALL first
+RETURN
+LABEL end
+"""
+
+
+def graph(source):
+    """
+    Builds analysed graph of program
+    """
+    interpret = Interpreter(to_xml(source).encode("utf-8")).load()
+
+    return interpret.control_flow_graph()
+
+
+def successors(block):
+    """
+    Gets successor starts and edge kinds of block
+    """
+    return [(successor.start, kind) for successor, kind in block.successors]
+
+
+def test_blocks_and_edges():
+    cfg = graph(NESTED)
+    assert [(block.start, block.end) for block in cfg.blocks] == [(0, 4), (4, 6), (6, 8), (8, 10), (10, 11)]
+    assert successors(cfg.blocks[0]) == [(4, "fallthrough")]
+    assert successors(cfg.blocks[2]) == [(6, "branch"), (8, "fallthrough")]
+    assert successors(cfg.blocks[3]) == [(4, "branch"), (10, "fallthrough")]
+    assert successors(cfg.blocks[4]) == []
+    assert cfg.edges == 6
+    assert cfg.block_at(0) is cfg.blocks[0]
+    assert cfg.block_at(7) is cfg.blocks[2]
+    assert cfg.block_at(10) is cfg.blocks[4]
+
+
+def test_dominators_and_loops():
+    cfg = graph(NESTED)
+    assert [block.idom.id if block.idom is not None else None for block in cfg.blocks] == [None, 0, 1, 2, 3]
+    assert cfg.dominates(cfg.blocks[1], cfg.blocks[3])
+    assert not cfg.dominates(cfg.blocks[3], cfg.blocks[1])
+
+    # Inner loop is nested in outer one
+    outer, inner = sorted(cfg.loops, key=lambda loop: loop.depth)
+    assert outer.header is cfg.blocks[1] and inner.header is cfg.blocks[2]
+    assert {block.id for block in outer.blocks} == {1, 2, 3}
+    assert {block.id for block in inner.blocks} == {2}
+    assert inner.parent is outer and outer.parent is None
+    assert (outer.depth, inner.depth) == (1, 2)
+    assert [block.loop.depth if block.loop else 0 for block in cfg.blocks] == [0, 1, 2, 1, 0]
+
+
+def test_calls_and_returns():
+    cfg = graph(CALLS)
+    blocks = {block.start: block for block in cfg.blocks}
+    assert successors(blocks[0]) == [(8, "call")]
+    assert successors(blocks[11]) == [(8, "call")]
+
+    # RETURN of function continues only after CALLs of this function
+    assert sorted(successors(blocks[8])) == [(3, "return"), (5, "return"), (12, "return")]
+    assert successors(blocks[12]) == [(4, "return")]
+
+    # Code after JUMP and RETURN is never run, jump to label at program end has no edge
+    assert sorted(start for start, block in blocks.items() if not block.reachable) == [6, 10, 13]
+    assert blocks[6].idom is None
+    assert blocks[12].idom is blocks[8]
+
+
+def test_jump_to_program_end():
+    cfg = graph(""".IPPcode18
+CALL end
+JUMPIFEQ end int@1 int@1
+JUMPIFEQ missing int@1 int@1
+LABEL end
+""")
+    assert [successors(block) for block in cfg.blocks] == [[], [(2, "fallthrough")], [(3, "fallthrough")], []]
+
+
+def test_many_loops():
+    # Dominance of back edges is checked by numbers of dominator tree, so long chains of loops stay linear
+    instructions = []
+    for number in range(2000):
+        instructions.append({"opcode": "LABEL", "args": [["label", "l%d" % number]]})
+        instructions.append({"opcode": "JUMPIFEQS", "args": [["label", "l%d" % number, len(instructions)]]})
+    cfg = ControlFlowGraph(instructions).analyse()
+
+    assert len(cfg.loops) == 2000
+    assert all(loop.depth == 1 and len(loop.blocks) == 1 for loop in cfg.loops)
+    assert cfg.blocks[-1].idom is cfg.blocks[-2]
+
+
+def test_empty_program():
+    cfg = ControlFlowGraph([]).analyse()
+    assert cfg.blocks == [] and cfg.loops == []
+    assert cfg.to_json()["blocks"] == []
+
+
+@pytest.mark.parametrize("cfg_format", ["json", "dot"])
+def test_interpret_cfg(tmpdir, cfg_format):
+    source = tmpdir.join("source.xml")
+    source.write(to_xml(NESTED))
+    output = str(tmpdir.join("cfg"))
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret.py"), "--source=" + str(source),
+                             "--cfg=" + output, "--cfg-format=" + cfg_format], stdout=subprocess.PIPE, timeout=60)
+
+    # Program is only analysed
+    assert result.returncode == 0
+    assert result.stdout == b""
+
+    with open(output) as file:
+        text = file.read()
+    if cfg_format == "json":
+        dump = json.loads(text)
+        assert dump["instructions"] == 11
+        assert dump["blocks"][2] == {"id": 2, "start": 6, "end": 8, "label": "inner", "opcodes": ["ADD", "JUMPIFNEQ"],
+                                     "successors": [[2, "branch"], [3, "fallthrough"]], "reachable": True,
+                                     "idom": 1, "loop": dump["blocks"][2]["loop"], "depth": 2}
+        assert sorted((loop["header"], loop["depth"]) for loop in dump["loops"]) == [(1, 1), (2, 2)]
+    else:
+        assert text.startswith("digraph cfg {")
+        assert "B2 -> B2 [style=solid, color=red];" in text
+
+
+def test_interpret_cfg_errors(tmpdir):
+    source = tmpdir.join("source.xml")
+    source.write(to_xml(".IPPcode18\nLABEL a\nLABEL a\n"))
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret.py"), "--source=" + str(source),
+                             "--cfg=" + str(tmpdir.join("cfg"))], stderr=subprocess.PIPE, timeout=60)
+    assert result.returncode == 52
+
+    source.write(to_xml(NESTED))
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret.py"), "--source=" + str(source),
+                             "--cfg=" + str(tmpdir.join("missing", "cfg"))], stderr=subprocess.PIPE, timeout=60)
+    assert result.returncode == 12
@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from daemon_client import connect, request
+from test_interpret import ROOT, to_xml
+
+SOURCE = """.IPPcode18
+DEFVAR GF@x
+READ GF@x string
+WRITE GF@x
+DPRINT string@debug
+"""
+
+ERROR_SOURCE = """.IPPcode18
+WRITE GF@x
+"""
+
+
+@pytest.fixture
+def socket_path(tmpdir):
+    """
+    Starts daemon with two workers
+    :return: Path of daemon socket
+    """
+    path = os.path.join(str(tmpdir), "daemon.sock")
+    daemon = subprocess.Popen([sys.executable, os.path.join(ROOT, "daemon.py"), "--socket=" + path, "--workers=2"])
+    for _ in range(100):
+        if os.path.exists(path):
+            break
+        time.sleep(0.05)
+
+    yield path
+
+    daemon.terminate()
+    daemon.wait(timeout=10)
+    assert not os.path.exists(path)
+
+
+def run_client(tmpdir, socket_path, source, stdin):
+    """
+    Runs source by client
+    :return: Exit code, stdout, stderr and stats file content
+    """
+    source_path = os.path.join(str(tmpdir), "source.xml")
+    stats = os.path.join(str(tmpdir), "stats")
+    with open(source_path, "w", encoding="utf-8") as file:
+        file.write(to_xml(source))
+    if os.path.exists(stats):
+        os.unlink(stats)
+
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret_client.py"), "--source=" + source_path,
+                             "--socket=" + socket_path, "--stats=" + stats, "--vars", "--insts"],
+                            input=stdin.encode("utf-8"), stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+    stats_content = None
+    if os.path.exists(stats):
+        with open(stats) as file:
+            stats_content = file.read()
+
+    return result.returncode, result.stdout.decode("utf-8"), result.stderr.decode("utf-8"), stats_content
+
+
+def test_client(tmpdir, socket_path):
+    assert run_client(tmpdir, socket_path, SOURCE, "line\n") == (0, "line\n", "debug", "1\n4\n")
+    assert run_client(tmpdir, socket_path, ERROR_SOURCE, "") == (
+        54, "", "ERROR: Variable x is not defined in GF!\n", None)
+
+
+def test_client_without_daemon(tmpdir):
+    assert run_client(tmpdir, os.path.join(str(tmpdir), "missing.sock"), SOURCE, "line\n") == (
+        0, "line\n", "debug", "1\n4\n")
+
+
+def test_requests(socket_path):
+    program = to_xml(SOURCE).encode("utf-8")
+    for number in range(20):
+        response = request(connect(socket_path), program, b"%d\n" % number)
+        assert response["exit_code"] == 0
+        assert response["stdout"] == b"%d\n" % number
+        assert response["stats"] == {"insts": 4, "vars": 1}
+
+    response = request(connect(socket_path), os.path.join(ROOT, "missing.xml"))
+    assert response["exit_code"] == 11
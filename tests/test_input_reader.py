@@ -0,0 +1,59 @@
+import io
+import os
+
+import pytest
+
+from input_reader import InputReader
+
+from test_interpret import ROOT, read_file, run_interpret
+
+
+def reader(data, chunk_size=3, prefetch=False):
+    """
+    Creates reader of standard input like text stream with given bytes
+    """
+    stream = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", errors="strict")
+    return InputReader(stream, chunk_size, prefetch)
+
+
+def read_all(input_reader):
+    """
+    Reads lines until end of input
+    """
+    lines = []
+    line = input_reader.read_line()
+    while line is not None:
+        lines.append(line)
+        line = input_reader.read_line()
+
+    return lines
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 1 << 16])
+def test_lines_match_input(chunk_size, prefetch):
+    data = "první\r\ndruhý\rtřetí\n\nposlední".encode("utf-8")
+    # Standard input splits lines only at \n
+    expected = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", newline="\n").read().split("\n")
+
+    assert read_all(reader(data, chunk_size, prefetch)) == expected
+
+
+def test_end_of_input_is_repeated():
+    input_reader = reader(b"1\n")
+
+    assert input_reader.read_line() == "1"
+    assert input_reader.read_line() is None
+    assert input_reader.read_line() is None
+
+
+def test_text_stream_without_buffer():
+    assert read_all(InputReader(io.StringIO("a\nb\n"), 1)) == ["a", "b"]
+
+
+def test_prefetch_input_in_interpret(tmpdir):
+    case = os.path.join(ROOT, "tests", "interpret", "read.src")
+    exit_code, output, stats = run_interpret(tmpdir, case, ["--prefetch-input"])
+
+    assert exit_code == 0
+    assert output == read_file(os.path.join(ROOT, "tests", "interpret", "read.out"), "")
@@ -0,0 +1,92 @@
+import glob
+import os
+import subprocess
+import sys
+from xml.sax.saxutils import escape
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = sorted(glob.glob(os.path.join(ROOT, "tests", "interpret", "*.src")))
+
+ENGINES = [["--engine=reference"], ["--engine=threaded"], ["--optimize"], ["--engine=compiled"],
+           ["--engine=compiled", "--optimize"], ["--jit", "--optimize"]]
+
+LABEL_INSTRUCTIONS = ["LABEL", "JUMP", "CALL", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS"]
+
+
+def to_xml(source):
+    """
+    Converts IPPcode18 test source to XML representation read by interpret.py
+    :param source: IPPcode18 source
+    :return: XML source
+    """
+    lines = source.splitlines()
+    assert lines[0].strip() == ".IPPcode18"
+    xml = ['<?xml version="1.0" encoding="UTF-8"?>', '<program language="IPPcode18">']
+    order = 0
+
+    for line in lines[1:]:
+        parts = line.split("#", 1)[0].split()
+        if not parts:
+            continue
+
+        order += 1
+        opcode = parts[0].upper()
+        xml.append('<instruction order="%d" opcode="%s">' % (order, opcode))
+        for number, arg in enumerate(parts[1:], 1):
+            if number == 1 and opcode in LABEL_INSTRUCTIONS:
+                arg_type, value = "label", arg
+            elif number == 2 and opcode == "READ":
+                arg_type, value = "type", arg
+            elif arg[:3] in ("GF@", "LF@", "TF@"):
+                arg_type, value = "var", arg
+            else:
+                arg_type, value = arg.split("@", 1)
+            xml.append('<arg%d type="%s">%s</arg%d>' % (number, arg_type, escape(value), number))
+        xml.append("</instruction>")
+
+    xml.append("</program>")
+    return "\n".join(xml) + "\n"
+
+
+def read_file(path, default):
+    """
+    Reads test file if it exists, line breaks are kept untranslated
+    """
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8", newline="") as file:
+        return file.read()
+
+
+def run_interpret(tmpdir, case, options):
+    """
+    Runs interpret.py on test case
+    :return: Exit code, stdout and stats file content
+    """
+    name = os.path.splitext(case)[0]
+    source = os.path.join(str(tmpdir), "source.xml")
+    stats = os.path.join(str(tmpdir), "stats")
+    with open(source, "w", encoding="utf-8") as file:
+        file.write(to_xml(read_file(case, "")))
+
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret.py"), "--source=" + source,
+                             "--stats=" + stats, "--insts", "--vars"] + options,
+                            input=read_file(name + ".in", "").encode("utf-8"), stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, timeout=60)
+
+    return result.returncode, result.stdout.decode("utf-8"), read_file(stats, None)
+
+
+@pytest.mark.parametrize("options", ENGINES, ids=lambda options: " ".join(options))
+@pytest.mark.parametrize("case", CASES, ids=lambda case: os.path.basename(case)[:-4])
+def test_interpret(tmpdir, case, options):
+    name = os.path.splitext(case)[0]
+    exit_code, output, stats = run_interpret(tmpdir, case, options)
+
+    assert exit_code == int(read_file(name + ".rc", "0"))
+    assert output == read_file(name + ".out", "")
+    if exit_code == 0:
+        assert stats == read_file(name + ".stats", None)
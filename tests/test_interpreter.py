@@ -0,0 +1,69 @@
+import io
+
+import pytest
+
+from errors import IPPcodeError, IPPcodeOperandTypeError, IPPcodeOperandValueError, IPPcodeParseError, \
+    IPPcodeSourceError, IPPcodeXMLError
+from interpreter import Interpreter
+from test_interpret import to_xml
+
+SOURCE = to_xml(""".IPPcode18
+DEFVAR GF@x
+READ GF@x int
+ADD GF@x GF@x int@1
+WRITE GF@x
+DPRINT string@debug
+IDIV GF@x GF@x GF@x
+""").encode("utf-8")
+
+
+def test_run():
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    result = Interpreter(SOURCE).run("41\n", stdout, stderr)
+
+    assert result.exit_code == 0
+    assert result.stats == {"insts": 6, "vars": 1}
+    assert stdout.getvalue() == "42\n"
+    assert stderr.getvalue() == "debug"
+
+
+def test_runtime_error():
+    stdout = io.StringIO()
+    with pytest.raises(IPPcodeOperandValueError) as error:
+        Interpreter(SOURCE).run("-1\n", stdout, io.StringIO())
+
+    assert error.value.exit_code == 57
+    assert error.value.report() == "ERROR: IDIV division by zero!\n"
+    assert stdout.getvalue() == "0\n"
+
+
+@pytest.mark.parametrize("source", [".IPPcode18\nDEFVAR GF@a\nMOVE GF@a int@0\nNOT GF@a GF@a\n",
+                                    ".IPPcode18\nPUSHS bool@true\nPUSHS int@1\nANDS\n"])
+def test_operand_type_error(source):
+    # Error is raised even if re-read operands do not show wrong type
+    with pytest.raises(IPPcodeOperandTypeError) as error:
+        Interpreter(to_xml(source).encode("utf-8")).run("", io.StringIO(), io.StringIO())
+
+    assert error.value.exit_code == 53
+
+
+def test_many_runs():
+    interpreter = Interpreter(SOURCE, optimize=True)
+    for number in range(50):
+        stdout = io.StringIO()
+        interpreter.run(b"%d\n" % number, stdout, io.StringIO())
+        assert stdout.getvalue() == "%d\n" % (number + 1)
+
+
+@pytest.mark.parametrize("program, error, exit_code", [
+    (b"<program", IPPcodeXMLError, 31),
+    (to_xml(".IPPcode18\nMOVE GF@x int@a\n").encode("utf-8"), IPPcodeParseError, 32),
+    ("/nonexistent/source.xml", IPPcodeSourceError, 11),
+])
+def test_load_errors(program, error, exit_code):
+    with pytest.raises(error) as raised:
+        Interpreter(program).run("", io.StringIO(), io.StringIO())
+
+    assert isinstance(raised.value, IPPcodeError)
+    assert raised.value.exit_code == exit_code
@@ -0,0 +1,22 @@
+import pytest
+
+from benchmarks.micro import MICROBENCHMARKS, compare, measure
+
+
+@pytest.mark.parametrize("name", sorted(MICROBENCHMARKS))
+def test_microbenchmark(name):
+    result = measure(name, samples=3, min_time=0.001, overhead=0.0)
+
+    assert result["ns"] > 0
+    assert result["min"] <= result["ns"]
+    assert result["stable"] == (result["cv"] <= 0.05)
+
+
+def test_compare():
+    baseline = {"results": {"a": {"ns": 100.0, "stable": True}, "b": {"ns": 100.0, "stable": False},
+                            "c": {"ns": 100.0, "stable": True}}}
+    current = {"results": {"a": {"ns": 120.0, "stable": True}, "b": {"ns": 200.0, "stable": True},
+                           "c": {"ns": 200.0, "stable": False}, "d": {"ns": 1.0, "stable": True}}}
+
+    assert compare(baseline, current) == ["a: 120.0 ns/op > 100.0 ns/op"]
+    assert compare(baseline, current, threshold=0.5) == []
@@ -0,0 +1,30 @@
+import pytest
+
+from interpret_factory import InterpretFactory, IPPcodeParseError
+
+
+def test_same_operands_are_shared():
+    interpret = InterpretFactory()
+    interpret.add_instruction("ADD", [["var", "GF@x"], ["int", "1"], ["var", "GF@x"]], 2)
+    interpret.add_instruction("SUB", [["var", "GF@x"], ["int", "1"], ["string", "1"]], 3)
+
+    first, second = interpret.instructions
+    assert first["args"][0] is first["args"][2] is second["args"][0]
+    assert first["args"][1] is second["args"][1]
+    assert second["args"][2] == ["string", "1"]
+
+
+@pytest.mark.parametrize("literal, value", [
+    (None, ""),
+    ("a\\065\\066c", "aABc"),
+    ("\\092\\092065", "\\\\065"),
+    ("&lt;&amp;amp;", "<&amp;"),
+])
+def test_string_literal_is_decoded(literal, value):
+    assert InterpretFactory.string(literal) == value
+
+
+@pytest.mark.parametrize("literal", ["a b", "a#b", "ab\\06", "\\-12", "\\"])
+def test_wrong_string_literal(literal):
+    with pytest.raises(IPPcodeParseError):
+        InterpretFactory.string(literal)
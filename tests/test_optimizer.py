@@ -0,0 +1,50 @@
+import xml.etree.ElementTree as ET
+
+from interpret_factory import InterpretFactory
+
+from test_interpret import to_xml
+
+
+def prepare(source):
+    """
+    Loads test source to optimizing interpret and prepares it
+    :return: InterpretFactory
+    """
+    interpret = InterpretFactory(optimize=True)
+    for order, element in enumerate(ET.fromstring(to_xml(source).split("\n", 1)[1]), 1):
+        args = [[arg.attrib["type"], arg.text] for arg in element]
+        interpret.add_instruction(element.attrib["opcode"], args, order + 1)
+    interpret.prepare()
+
+    return interpret
+
+
+def test_literal_operations_are_folded():
+    interpret = prepare(""".IPPcode18
+DEFVAR GF@x
+CONCAT GF@x string@a string@b
+LT GF@x int@1 int@2
+IDIV GF@x int@1 int@0
+ADD GF@x GF@x int@1
+""")
+
+    assert [instruction["opcode"] for instruction in interpret.instructions] == ["DEFVAR", "MOVE", "MOVE", "IDIV",
+                                                                               "ADD"]
+    assert interpret.instructions[1]["args"][1] == ["string", "ab"]
+    assert interpret.instructions[2]["args"][1] == ["bool", True]
+
+
+def test_unreachable_code_is_dropped():
+    interpret = prepare(""".IPPcode18
+JUMPIFEQ end int@1 int@1
+WRITE string@dead
+LABEL dead
+WRITE string@dead
+LABEL end
+BREAK
+""")
+
+    assert [instruction["opcode"] for instruction in interpret.instructions] == ["JUMP", "BREAK"]
+    assert interpret.instructions[0]["args"][0][2] == 1
+    assert interpret.labels == {"end": 2}
+    assert interpret.positions == [0, 5]
@@ -0,0 +1,88 @@
+import os
+import select
+import subprocess
+import sys
+
+import pytest
+
+from test_interpret import ROOT, to_xml
+
+SOURCE = """.IPPcode18
+DEFVAR GF@i
+MOVE GF@i int@0
+LABEL loop
+WRITE GF@i
+DPRINT string@d
+ADD GF@i GF@i int@1
+JUMPIFNEQ loop GF@i int@100
+DPRINT string@end
+IDIV GF@i GF@i int@0
+"""
+
+OUTPUT = "".join("%d\n" % i for i in range(100))
+
+ERRORS = "d" * 100 + "endERROR: IDIV division by zero!\n"
+
+
+def write_source(tmpdir, source):
+    """
+    Writes test source as XML
+    :return: XML file path
+    """
+    path = os.path.join(str(tmpdir), "source.xml")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(to_xml(source))
+
+    return path
+
+
+@pytest.mark.parametrize("options", [[], ["--buffer-size=0"], ["--buffer-size=7"], ["--engine=reference"]])
+def test_buffered_output_matches(tmpdir, options):
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret.py"),
+                             "--source=" + write_source(tmpdir, SOURCE)] + options,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+
+    assert result.returncode == 57
+    assert result.stdout.decode("utf-8") == OUTPUT
+    assert result.stderr.decode("utf-8") == ERRORS
+
+
+def test_output_file(tmpdir):
+    output = os.path.join(str(tmpdir), "output")
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret.py"),
+                             "--source=" + write_source(tmpdir, SOURCE), "--output=" + output],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+
+    assert result.returncode == 57
+    assert result.stdout == b""
+    with open(output, encoding="utf-8") as file:
+        assert file.read() == OUTPUT
+
+
+def test_output_file_can_not_be_opened(tmpdir):
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret.py"),
+                             "--source=" + write_source(tmpdir, SOURCE),
+                             "--output=" + os.path.join(str(tmpdir), "missing", "output")],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+
+    assert result.returncode == 12
+
+
+def test_output_is_flushed_before_read(tmpdir):
+    source = write_source(tmpdir, """.IPPcode18
+DEFVAR GF@x
+WRITE string@prompt
+READ GF@x int
+WRITE GF@x
+""")
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "interpret.py"), "--source=" + source],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        assert select.select([process.stdout], [], [], 30)[0]
+        assert process.stdout.readline() == b"prompt\n"
+        output = process.communicate(b"42\n", timeout=60)[0]
+    finally:
+        process.kill()
+
+    assert output == b"42\n"
+    assert process.returncode == 0
@@ -0,0 +1,151 @@
+import json
+import os
+import subprocess
+import sys
+
+from test_interpret import ROOT, read_file, to_xml
+
+SOURCE = """.IPPcode18
+DEFVAR GF@i
+MOVE GF@i int@0
+LABEL loop
+CALL outer
+ADD GF@i GF@i int@1
+JUMPIFNEQ loop GF@i int@3
+JUMP end
+LABEL outer
+CALL inner
+RETURN
+LABEL inner
+RETURN
+LABEL end
+IDIV GF@i GF@i int@0
+"""
+
+
+def run_profiled(tmpdir, options):
+    """
+    Runs test source with profiler
+    :return: Exit code and profile file content
+    """
+    source = os.path.join(str(tmpdir), "source.xml")
+    profile = os.path.join(str(tmpdir), "profile")
+    with open(source, "w", encoding="utf-8") as file:
+        file.write(to_xml(SOURCE))
+
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret.py"), "--source=" + source,
+                             "--profile=" + profile] + options, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            timeout=60)
+
+    return result.returncode, read_file(profile, None)
+
+
+def test_json_profile(tmpdir):
+    exit_code, profile = run_profiled(tmpdir, [])
+    report = json.loads(profile)
+
+    assert exit_code == 57
+    assert report["instructions"] == 23
+    assert {stats["opcode"]: stats["count"] for stats in report["opcodes"]} == {
+        "DEFVAR": 1, "MOVE": 1, "CALL": 6, "ADD": 3, "JUMPIFNEQ": 3, "JUMP": 1, "RETURN": 6, "LABEL": 1, "IDIV": 1}
+    assert {stats["order"]: stats["count"] for stats in report["orders"]}[5] == 3
+    labels = {stats["label"]: stats for stats in report["labels"]}
+    assert labels["outer"]["calls"] == 3
+    assert labels["inner"]["calls"] == 3
+    assert labels["outer"]["inclusive"] >= labels["inner"]["inclusive"]
+    assert labels["outer"]["exclusive"] <= labels["outer"]["inclusive"]
+
+
+def test_optimized_text_profile(tmpdir):
+    exit_code, profile = run_profiled(tmpdir, ["--optimize", "--profile-format=text"])
+
+    assert exit_code == 57
+    assert "Instructions: 23\n" in profile
+    assert "Label" in profile and "outer" in profile
+
+
+def test_profile_with_reference_engine(tmpdir):
+    assert run_profiled(tmpdir, ["--engine=reference"]) == (10, None)
+
+
+LOOP_SOURCE = """.IPPcode18
+DEFVAR GF@i
+MOVE GF@i int@0
+LABEL loop
+CALL outer
+ADD GF@i GF@i int@1
+JUMPIFNEQ loop GF@i int@20000
+JUMP end
+LABEL outer
+CALL inner
+RETURN
+LABEL inner
+LABEL inner_body
+RETURN
+LABEL end
+"""
+
+
+def run_sampled(tmpdir, options):
+    """
+    Runs loop source with sampling profiler
+    :return: Exit code and collapsed stacks
+    """
+    source = os.path.join(str(tmpdir), "source.xml")
+    samples = os.path.join(str(tmpdir), "samples")
+    with open(source, "w", encoding="utf-8") as file:
+        file.write(to_xml(LOOP_SOURCE))
+
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret.py"), "--source=" + source,
+                             "--sample=" + samples, "--sample-interval=0.5"] + options, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, timeout=60)
+
+    return result.returncode, read_file(samples, None)
+
+
+def test_collapsed_stacks(tmpdir):
+    for options in ([], ["--engine=reference"], ["--optimize"], ["--engine=compiled"]):
+        exit_code, samples = run_sampled(tmpdir, options)
+
+        assert exit_code == 0
+        stacks = dict(line.rsplit(" ", 1) for line in samples.splitlines())
+        assert stacks
+        assert all(count.isdigit() for count in stacks.values())
+        # Frame of caller is enclosing label of CALL, not called label
+        assert set(stacks) <= {"main", "main;loop", "main;loop;outer", "main;loop;outer;inner",
+                               "main;loop;outer;inner_body"}
+
+
+def test_enclosing_label():
+    from interpret_factory import InterpretFactory
+    from profiler import SamplingProfiler
+
+    interpret = InterpretFactory("threaded")
+    interpret.labels = {"a": 3, "b": 6}
+    sampler = SamplingProfiler(interpret)
+    sampler.start()
+    sampler.stop()
+
+    assert [sampler.enclosing_label(index) for index in range(7)] == ["main", "main", "a", "a", "a", "b", "b"]
+
+
+def test_collapsed_stack_shape():
+    from interpret_factory import InterpretFactory
+    from profiler import SamplingProfiler
+
+    interpret = InterpretFactory("threaded")
+    interpret.labels = {"loop": 3, "f": 8}
+    sampler = SamplingProfiler(interpret)
+    sampler.start()
+    sampler.stop()
+
+    assert sampler.collapse([], 1) == "main"
+    assert sampler.collapse([], 4) == "main;loop"
+    assert sampler.collapse([4], 9) == "main;loop;f"
+    # Only real recursion repeats frame
+    assert sampler.collapse([4, 10], 9) == "main;loop;f;f"
+    assert sampler.collapse([1], 9) == "main;f"
+
+
+def test_wrong_sample_interval(tmpdir):
+    assert run_sampled(tmpdir, ["--sample-interval=0"]) == (10, None)
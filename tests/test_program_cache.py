@@ -0,0 +1,92 @@
+import os
+import subprocess
+import sys
+
+from program_cache import HEADER
+
+from test_interpret import ROOT, to_xml
+
+SOURCE = """.IPPcode18
+DEFVAR GF@f
+MOVE GF@f float@-0x0p+0
+WRITE GF@f
+MOVE GF@f float@0x0p+0
+WRITE GF@f
+WRITE string@a\\032b
+DEFVAR GF@b
+MOVE GF@b bool@false
+WRITE GF@b
+LABEL end
+"""
+
+OUTPUT = "-0x0.0p+0\n0x0.0p+0\na b\nfalse\n"
+
+
+def run_cached(tmpdir):
+    """
+    Runs test source with program cache
+    :return: Exit code, stdout and list of cache files
+    """
+    source = os.path.join(str(tmpdir), "source.xml")
+    cache = os.path.join(str(tmpdir), "cache")
+    with open(source, "w", encoding="utf-8") as file:
+        file.write(to_xml(SOURCE))
+
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret.py"), "--source=" + source,
+                             "--cache=" + cache], stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+    files = [os.path.join(cache, name) for name in os.listdir(cache)] if os.path.isdir(cache) else []
+
+    return result.returncode, result.stdout.decode("utf-8"), files
+
+
+def test_cache_is_reused(tmpdir):
+    assert run_cached(tmpdir)[:2] == (0, OUTPUT)
+    exit_code, output, files = run_cached(tmpdir)
+    assert (exit_code, output) == (0, OUTPUT)
+    assert len(files) == 1
+
+
+def test_corrupt_cache_is_rebuilt(tmpdir):
+    files = run_cached(tmpdir)[2]
+    with open(files[0], "r+b") as file:
+        file.seek(HEADER.size + 2)
+        file.write(b"\xff\xff")
+    original = os.path.getsize(files[0])
+
+    assert run_cached(tmpdir)[:2] == (0, OUTPUT)
+    assert run_cached(tmpdir)[:2] == (0, OUTPUT)
+    assert os.path.getsize(files[0]) == original
+
+
+def test_stale_and_truncated_cache_is_rebuilt(tmpdir):
+    files = run_cached(tmpdir)[2]
+    with open(files[0], "r+b") as file:
+        data = bytearray(file.read())
+        data[12] ^= 0xff
+        file.seek(0)
+        file.write(data)
+
+    assert run_cached(tmpdir)[:2] == (0, OUTPUT)
+
+    with open(files[0], "r+b") as file:
+        file.truncate(HEADER.size - 1)
+
+    assert run_cached(tmpdir)[:2] == (0, OUTPUT)
+    assert run_cached(tmpdir)[:2] == (0, OUTPUT)
+
+
+def test_memory_cache():
+    import io
+    from interpreter import Interpreter
+    from program_cache import MemoryProgramCache
+
+    program_cache = MemoryProgramCache(1)
+    program = to_xml(SOURCE).encode("utf-8")
+    for _ in range(3):
+        stdout = io.StringIO()
+        Interpreter(program, cache=program_cache).run("", stdout)
+        assert stdout.getvalue() == OUTPUT
+    assert len(program_cache.programs) == 1
+
+    Interpreter(to_xml(".IPPcode18\nWRITE int@1\n").encode("utf-8"), cache=program_cache).run("", io.StringIO())
+    assert list(program_cache.programs) == [program_cache.source_digest(to_xml(".IPPcode18\nWRITE int@1\n").encode())]
@@ -0,0 +1,234 @@
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+from errors import IPPcodeError
+from interpreter import Interpreter
+from test_interpret import ROOT, to_xml
+
+LOOP = """.IPPcode18
+DEFVAR GF@i
+DEFVAR GF@acc
+DEFVAR GF@c
+MOVE GF@i int@0
+MOVE GF@acc int@0
+LABEL loop
+ADD GF@acc GF@acc GF@i
+MUL GF@c GF@i int@2
+SUB GF@acc GF@acc GF@c
+ADD GF@i GF@i int@1
+LT GF@c GF@i int@1000
+JUMPIFEQ loop GF@c bool@true
+WRITE GF@acc
+"""
+
+PROGRAMS = {
+    "loop": LOOP,
+    # Variable becomes float inside hot loop, so type guard fails
+    "type_change": """.IPPcode18
+DEFVAR GF@x
+DEFVAR GF@n
+DEFVAR GF@t
+DEFVAR GF@y
+MOVE GF@x int@1
+MOVE GF@n int@0
+LABEL loop
+ADD GF@n GF@n int@1
+JUMPIFNEQ int GF@n int@300
+INT2FLOAT GF@x GF@x
+LABEL int
+MOVE GF@y GF@x
+TYPE GF@t GF@y
+JUMPIFNEQ loop GF@n int@500
+WRITE GF@x
+WRITE GF@t
+""",
+    "frames": """.IPPcode18
+DEFVAR GF@n
+MOVE GF@n int@0
+LABEL loop
+CREATEFRAME
+DEFVAR TF@x
+MOVE TF@x GF@n
+PUSHFRAME
+ADD LF@x LF@x int@10
+WRITE LF@x
+POPFRAME
+ADD GF@n GF@n int@1
+JUMPIFNEQ loop GF@n int@100
+WRITE TF@x
+""",
+    "nested": """.IPPcode18
+DEFVAR GF@i
+DEFVAR GF@j
+DEFVAR GF@sum
+MOVE GF@i int@0
+MOVE GF@sum int@0
+LABEL outer
+MOVE GF@j int@0
+LABEL inner
+ADD GF@sum GF@sum GF@j
+ADD GF@j GF@j int@1
+JUMPIFNEQ inner GF@j int@100
+ADD GF@i GF@i int@1
+JUMPIFNEQ outer GF@i int@100
+WRITE GF@sum
+""",
+    "calls": """.IPPcode18
+DEFVAR GF@n
+MOVE GF@n int@0
+LABEL loop
+CALL inc
+JUMPIFNEQ loop GF@n int@100
+WRITE GF@n
+JUMP end
+LABEL inc
+ADD GF@n GF@n int@1
+RETURN
+LABEL end
+""",
+    "branches": """.IPPcode18
+DEFVAR GF@n
+DEFVAR GF@r
+DEFVAR GF@s
+MOVE GF@n int@0
+MOVE GF@s string@
+LABEL loop
+IDIV GF@r GF@n int@3
+MUL GF@r GF@r int@3
+JUMPIFEQ skip GF@r GF@n
+CONCAT GF@s GF@s string@x
+LABEL skip
+PUSHS GF@n
+ADD GF@n GF@n int@1
+PUSHS int@200
+JUMPIFNEQS loop
+STRLEN GF@n GF@s
+WRITE GF@n
+WRITE GF@s
+BREAK
+""",
+    "floats": """.IPPcode18
+DEFVAR GF@x
+DEFVAR GF@b
+MOVE GF@x float@0x0p+0
+LABEL loop
+ADD GF@x GF@x float@0x1p-1
+DIV GF@x GF@x float@0x1p+0
+LT GF@b GF@x float@0x1p+6
+NOT GF@b GF@b
+NOT GF@b GF@b
+AND GF@b GF@b bool@true
+JUMPIFEQ loop GF@b bool@true
+WRITE GF@b
+WRITE float@0x1p+0
+""",
+    "idiv_zero": """.IPPcode18
+DEFVAR GF@x
+DEFVAR GF@y
+MOVE GF@x int@100
+LABEL loop
+SUB GF@x GF@x int@1
+IDIV GF@y int@4 GF@x
+JUMP loop
+""",
+    "wrong_type": """.IPPcode18
+DEFVAR GF@x
+MOVE GF@x int@0
+LABEL loop
+ADD GF@x GF@x int@1
+JUMPIFNEQ next GF@x int@100
+MOVE GF@x string@hundred
+LABEL next
+JUMPIFNEQ loop GF@x int@200
+""",
+}
+
+
+def run(source, jit):
+    """
+    Runs program by threaded engine
+    :return: Exit code, stdout, stderr, stats and tracing stats
+    """
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    try:
+        stats = Interpreter(to_xml(source).encode("utf-8"), jit=jit).run("", stdout, stderr).stats
+        exit_code = 0
+    except IPPcodeError as e:
+        stats = {}
+        exit_code = e.exit_code
+
+    tracing = {name: stats.pop(name) for name in ["trace_hits", "trace_compiles", "guard_failures"] if name in stats}
+
+    return (exit_code, stdout.getvalue(), stderr.getvalue(), stats), tracing
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_same_as_threaded(name):
+    assert run(PROGRAMS[name], True)[0] == run(PROGRAMS[name], False)[0]
+
+
+def test_loop_runs_trace():
+    result, tracing = run(LOOP, True)
+    assert result[:2] == (0, "-499500\n")
+    assert tracing == {"trace_hits": 1, "trace_compiles": 1, "guard_failures": 0}
+    assert run(LOOP, False)[1] == {}
+
+
+def test_guard_failure():
+    # Trace specialized to int is left on float in every following iteration, changed branch is not failure
+    tracing = run(PROGRAMS["type_change"], True)[1]
+    assert tracing["trace_compiles"] == 1
+    assert tracing["guard_failures"] == 500 - 300
+
+
+def test_inner_loop_is_traced():
+    tracing = run(PROGRAMS["nested"], True)[1]
+    assert tracing["trace_compiles"] == 1
+    # Outer loop is not traced, because its path enters inner loop
+    assert tracing["trace_hits"] == 100
+
+
+def test_calls_are_not_traced():
+    interpret = Interpreter(to_xml(PROGRAMS["calls"]).encode("utf-8"), jit=True)
+    interpret.run("", io.StringIO())
+    assert interpret.interpret.tracing_jit.stats()["trace_compiles"] == 0
+    assert list(interpret.interpret.tracing_jit.counts.values()) == [None]
+
+
+def test_trace_is_specialized():
+    interpret = Interpreter(to_xml(LOOP).encode("utf-8"), jit=True)
+    interpret.run("", io.StringIO())
+    tracing_jit = interpret.interpret.tracing_jit
+    assert list(tracing_jit.traces) == [6]
+
+    # Operands are guarded by observed int type instead of generic type checks
+    code = tracing_jit.traces[6].__code__
+    assert code.co_filename == "<IPPcode18 trace 6>"
+    assert "P" not in code.co_names
+
+
+def test_interpret_stats(tmpdir):
+    stats = str(tmpdir.join("stats"))
+    source = tmpdir.join("source.xml")
+    source.write(to_xml(LOOP))
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret.py"), "--source=" + str(source), "--jit",
+                             "--stats=" + stats, "--trace-compiles", "--insts", "--guard-failures", "--trace-hits"],
+                            stdout=subprocess.PIPE, timeout=60)
+    assert result.returncode == 0
+    assert result.stdout == b"-499500\n"
+
+    with open(stats) as file:
+        assert file.read() == "1\n%d\n0\n1\n" % (5 + 1 + 1000 * 6 + 999 + 1)
+
+
+@pytest.mark.parametrize("args", [["--jit", "--engine=reference"], ["--jit", "--engine=compiled"],
+                                  ["--jit", "--profile=x"], ["--trace-hits"]])
+def test_wrong_arguments(args):
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "interpret.py"), "--source=x"] + args,
+                            stderr=subprocess.PIPE, timeout=60)
+    assert result.returncode == 10
@@ -0,0 +1,216 @@
+import io
+
+import pytest
+
+import test_compiled_engine
+import test_tracing_jit
+from errors import IPPcodeError
+from interpreter import Interpreter
+from test_interpret import to_xml
+from type_inference import TypeInference
+from variables import TYPE_INT, TYPE_BOOL, TYPE_STRING, TYPE_FLOAT
+
+PROGRAMS = {
+    "strings": """.IPPcode18
+DEFVAR GF@s
+DEFVAR GF@t
+DEFVAR GF@n
+DEFVAR GF@b
+MOVE GF@s string@a
+MOVE GF@n int@0
+LABEL loop
+CONCAT GF@s GF@s string@b
+CONCAT GF@t GF@s string@c
+STRLEN GF@n GF@s
+LT GF@b GF@t GF@s
+EQ GF@b GF@b bool@false
+ADD GF@n GF@n int@0
+JUMPIFNEQ loop GF@n int@5
+WRITE GF@t
+WRITE GF@n
+""",
+    "branch_types": """.IPPcode18
+DEFVAR GF@x
+DEFVAR GF@y
+READ GF@y bool
+JUMPIFEQ str GF@y bool@true
+MOVE GF@x int@1
+JUMP end
+LABEL str
+MOVE GF@x string@one
+LABEL end
+ADD GF@x GF@x int@1
+WRITE GF@x
+""",
+    "call_changes_type": """.IPPcode18
+DEFVAR GF@x
+MOVE GF@x int@1
+CALL change
+ADD GF@x GF@x int@1
+WRITE GF@x
+JUMP end
+LABEL change
+MOVE GF@x float@0x1p+0
+RETURN
+LABEL end
+""",
+    "pop_frame": """.IPPcode18
+CREATEFRAME
+DEFVAR TF@x
+MOVE TF@x int@1
+PUSHFRAME
+ADD LF@x LF@x int@1
+POPFRAME
+ADD TF@x TF@x int@1
+WRITE TF@x
+ADD LF@x LF@x int@1
+""",
+    "uninitialized": """.IPPcode18
+DEFVAR GF@x
+DEFVAR GF@y
+MOVE GF@y int@1
+ADD GF@y GF@y GF@x
+""",
+    "redefined_variable": """.IPPcode18
+DEFVAR GF@z
+DEFVAR GF@r
+DEFVAR GF@c
+CREATEFRAME
+PUSHFRAME
+DEFVAR LF@x
+MOVE LF@x string@abc
+READ GF@c bool
+JUMPIFEQ other GF@c bool@true
+MOVE GF@z int@5
+JUMP join
+LABEL other
+DEFVAR LF@x
+MOVE GF@z LF@x
+LABEL join
+ADD GF@r GF@z int@1
+WRITE GF@r
+""",
+    "divisions": """.IPPcode18
+DEFVAR GF@x
+DEFVAR GF@f
+MOVE GF@x int@7
+MOVE GF@f float@0x1p+0
+DIV GF@f GF@f float@0x1p+1
+INT2FLOAT GF@f GF@x
+FLOAT2INT GF@x GF@f
+IDIV GF@x GF@x int@2
+NOT GF@f bool@false
+AND GF@f GF@f bool@true
+WRITE GF@x
+IDIV GF@x GF@x int@0
+""",
+}
+
+
+def run(source, optimize, stdin="true\n"):
+    """
+    Runs program by threaded engine
+    :return: Exit code, stdout and stats
+    """
+    stdout = io.StringIO()
+    try:
+        stats = Interpreter(to_xml(source).encode("utf-8"), optimize=optimize).run(stdin, stdout, io.StringIO()).stats
+        exit_code = 0
+    except IPPcodeError as e:
+        stats = None
+        exit_code = e.exit_code
+
+    return exit_code, stdout.getvalue(), stats
+
+
+def infer(source):
+    """
+    Infers types of loaded program
+    :return: Instructions and their proven types
+    """
+    interpret = Interpreter(to_xml(source).encode("utf-8")).load()
+    interpret.resolve_labels()
+
+    return interpret.instructions, TypeInference(interpret).infer()
+
+
+ALL_PROGRAMS = dict(PROGRAMS)
+ALL_PROGRAMS.update(("compiled_" + name, source) for name, source in test_compiled_engine.PROGRAMS.items())
+ALL_PROGRAMS.update(("jit_" + name, source) for name, source in test_tracing_jit.PROGRAMS.items())
+
+
+@pytest.mark.parametrize("name", sorted(ALL_PROGRAMS))
+def test_same_as_unoptimized(name):
+    assert run(ALL_PROGRAMS[name], True) == run(ALL_PROGRAMS[name], False)
+
+
+def test_loop_counter_is_proven():
+    instructions, proven = infer(test_tracing_jit.LOOP)
+
+    # Counter is set by MOVE int@0 and ADD int@1 only, comparison result is bool
+    assert [instruction["opcode"] for instruction in instructions[6:12]] == ["ADD", "MUL", "SUB", "ADD", "LT",
+                                                                              "JUMPIFEQ"]
+    assert proven[6:12] == [(None, TYPE_INT, TYPE_INT)] * 5 + [(None, TYPE_BOOL, TYPE_BOOL)]
+    # WRITE has no typed handler
+    assert proven[12] is None
+
+
+def test_join_of_types_is_not_proven():
+    instructions, proven = infer(PROGRAMS["branch_types"])
+    assert instructions[9]["opcode"] == "ADD"
+    assert proven[9] is None
+    assert run(PROGRAMS["branch_types"], True) == (53, "", None)
+    assert run(PROGRAMS["branch_types"], True, "false\n")[:2] == (0, "2\n")
+
+
+def test_call_changes_type():
+    proven = infer(PROGRAMS["call_changes_type"])[1]
+    # RETURN continues after CALL with type set by function
+    assert proven[3] == (None, TYPE_FLOAT, TYPE_INT)
+    assert run(PROGRAMS["call_changes_type"], True)[0] == 53
+
+
+def test_frames():
+    proven = infer(PROGRAMS["pop_frame"])[1]
+    assert proven[4] == (None, TYPE_INT, TYPE_INT)
+    # Variable of popped frame is known, frame below it is not
+    assert proven[6] == (None, TYPE_INT, TYPE_INT)
+    assert proven[8] is None
+    assert run(PROGRAMS["pop_frame"], True) == (55, "3\n", None)
+
+
+def test_uninitialized_is_not_proven():
+    assert infer(PROGRAMS["uninitialized"])[1][3] == (None, TYPE_INT, None)
+    assert run(PROGRAMS["uninitialized"], True)[0] == 56
+
+
+def test_redefined_variable():
+    instructions, proven = infer(PROGRAMS["redefined_variable"])
+    # DEFVAR of defined LF variable keeps its string value, so join of branches is not int
+    assert instructions[15]["opcode"] == "ADD"
+    assert proven[15] is None
+    assert run(PROGRAMS["redefined_variable"], True) == (53, "", None)
+    assert run(PROGRAMS["redefined_variable"], True, "false\n")[:2] == (0, "6\n")
+
+
+def test_string_operands():
+    proven = infer(PROGRAMS["strings"])[1]
+    assert proven[7:10] == [(None, TYPE_STRING, TYPE_STRING), (None, TYPE_STRING, TYPE_STRING), (None, TYPE_STRING)]
+    assert run(PROGRAMS["strings"], True)[:2] == (0, "abbbbc\n5\n")
+
+
+def test_typed_handlers_are_used():
+    interpret = Interpreter(to_xml(test_tracing_jit.LOOP).encode("utf-8"), optimize=True).load()
+    interpret.prepare()
+    assert interpret.threaded_engine.program[6].__qualname__.startswith("TypedDecoder.")
+
+    # Program without optimization keeps checking handlers
+    interpret = Interpreter(to_xml(test_tracing_jit.LOOP).encode("utf-8")).load()
+    interpret.prepare()
+    assert interpret.proven_types is None
+    assert not interpret.threaded_engine.program[6].__qualname__.startswith("TypedDecoder.")
+
+
+def test_division_by_zero():
+    assert run(PROGRAMS["divisions"], True) == (57, "3\n", None)
+    assert run(PROGRAMS["divisions"].replace("int@0", "int@3"), True)[:2] == (0, "3\n")
@@ -0,0 +1,460 @@
+from compiled_engine import BlockGenerator, ARITMETIC_OPERATIONS, ARITMETIC_TYPES, RELATION_OPERATORS, \
+    RELATION_TYPES, BOOL_OPERATORS, CONDITIONAL_JUMPS, STACK_CONDITIONAL_JUMPS, CONVERSIONS, LITERAL_TYPES, MISSING, \
+    literal
+from string_builder import StringBuilder
+from variables import TYPE_INT, TYPE_BOOL, TYPE_STRING, TYPE_FLOAT, FRAME_GLOBAL, FRAME_TEMPORARY, FRAME_LOCAL, \
+    BOOL_VALUES
+
+# Number of taken backward jumps to one target, after which the loop is traced
+DEFAULT_THRESHOLD = 50
+
+# Maximal number of instructions of one trace
+MAX_TRACE_LENGTH = 1000
+
+JUMPS = ["JUMP", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS"]
+
+# Instructions, which stop recording, trace never leaves frame of its call
+UNTRACED = ["CALL", "RETURN", "BREAK"]
+
+
+class TracingJit:
+    def __init__(self, engine, threshold=DEFAULT_THRESHOLD):
+        """
+        Sets tracing of hot loops of threaded engine
+        :param engine: ThreadedEngine with unfused handlers
+        :param threshold: Number of taken backward jumps to one target, after which the loop is traced
+        """
+        self.engine = engine
+        self.interpret = engine.interpret
+        self.threshold = threshold
+        # Recording runs original handlers, so backward jumps inside recorded path are not counted
+        self.handlers = list(engine.program)
+        self.counts = {}
+        self.traces = {}
+        self.namespace = self.create_namespace()
+        self.hits = 0
+        self.compiles = 0
+        self.guard_failures = 0
+
+    def install(self):
+        """
+        Replaces handlers of backward jumps by handlers counting jumps to their targets
+        """
+        for index, instruction in enumerate(self.interpret.instructions):
+            if instruction["opcode"] in JUMPS:
+                target = instruction["args"][0][2]
+                if target is not None and target <= index:
+                    self.engine.program[index] = self.backward_jump(self.handlers[index], target)
+
+    def stats(self):
+        """
+        Gets tracing stats
+        :return: Dictionary with number of trace runs, compiled traces and guard failures
+        """
+        return {"trace_hits": self.hits, "trace_compiles": self.compiles, "guard_failures": self.guard_failures}
+
+    def backward_jump(self, jump, target):
+        """
+        Creates handler of backward jump, taken jump runs trace of its target or records it once target is hot
+        :param jump: Original jump handler
+        :param target: Index of jump target
+        """
+        counts = self.counts
+        traces = self.traces
+
+        def handler(current_inst):
+            next_inst = jump(current_inst)
+            if next_inst != target:
+                return next_inst
+
+            trace = traces.get(target)
+            if trace is not None:
+                self.hits += 1
+                return trace()
+
+            # Target, which could not be traced, is not counted anymore
+            count = counts.get(target, 0)
+            if count is None:
+                return next_inst
+            counts[target] = count + 1
+            if count + 1 < self.threshold:
+                return next_inst
+
+            return self.record(target)
+
+        return handler
+
+    def record(self, target):
+        """
+        Runs one iteration of loop by original handlers, records path with observed operand types and compiles it
+        :param target: Index of first instruction of loop
+        :return: Index of next instruction
+        """
+        interpret = self.interpret
+        instructions = interpret.instructions
+        handlers = self.handlers
+        path = []
+        visited = set()
+        index = target
+
+        while True:
+            # Path, which leaves program, enters inner loop or calls function, is not traced
+            if index >= len(instructions) or index in visited or len(path) >= MAX_TRACE_LENGTH:
+                self.counts[target] = None
+                return index
+
+            instruction = instructions[index]
+            opcode = instruction["opcode"]
+            args = instruction["args"]
+            if opcode in UNTRACED or (opcode in JUMPS and args[0][2] in (None, index + 1)):
+                self.counts[target] = None
+                return index
+
+            visited.add(index)
+            types = [self.observe(arg) if arg[0] == "var" else None for arg in args]
+            next_index = handlers[index](index)
+            interpret.total_inst += 1
+            path.append((index, types, next_index))
+
+            if next_index == target:
+                break
+            index = next_index
+
+        generator = TraceGenerator(instructions, path, target)
+        exec(compile(generator.generate(), "<IPPcode18 trace %d>" % target, "exec"), self.namespace)
+        self.traces[target] = self.namespace["trace_%d" % target]
+        self.compiles += 1
+
+        return target
+
+    def observe(self, var):
+        """
+        Gets current type of variable
+        :param var: Variable argument
+        :return: Variable type or None if variable is not defined
+        """
+        frames = self.interpret.frames
+        if var[2] == FRAME_GLOBAL:
+            frame = frames.global_frame
+        elif var[2] == FRAME_TEMPORARY:
+            frame = frames.temporary_frame
+        else:
+            frame = frames.local_frame
+
+        variable = frame.get(var[3]) if frame is not None else None
+
+        return variable.variable_type if variable is not None else None
+
+    def create_namespace(self):
+        """
+        Creates globals of generated traces
+        """
+        interpret = self.interpret
+
+        return {
+            "interpret": interpret,
+            "jit": self,
+            "frames": interpret.frames,
+            "gf_get": interpret.frames.global_frame.get,
+            "vf": interpret.variables_factory,
+            "se": self.engine.stack_engine,
+            "P": self.handlers,
+            "A": [instruction["args"] for instruction in interpret.instructions],
+            "M": MISSING,
+            "SB": StringBuilder,
+        }
+
+
+class TraceGenerator(BlockGenerator):
+    def __init__(self, instructions, path, target):
+        """
+        Sets generated trace
+        :param instructions: Loaded instructions
+        :param path: List of executed instruction index, observed types of operands and index of next instruction
+        :param target: Index of first instruction of loop
+        """
+        self.instructions = instructions
+        self.path = path
+        self.start = target
+        self.lines = []
+        self.indent = 1
+        self.executed = 0
+        self.variables = {}
+        self.loop = True
+        # Types and existence of variables checked or set in current iteration
+        self.known = {}
+        self.defined = set()
+
+        for index, _, _ in path:
+            for arg in instructions[index]["args"]:
+                if arg[0] == "var" and (arg[2], arg[3]) not in self.variables:
+                    self.variables[(arg[2], arg[3])] = "v%d" % len(self.variables)
+
+    def generate(self):
+        """
+        Generates function running loop until guard fails or loop ends
+        :return: Python source
+        """
+        self.emit("def trace_%d():" % self.start, 0)
+        self.lookup(FRAME_GLOBAL, FRAME_TEMPORARY, FRAME_LOCAL)
+        self.emit("total = 0")
+        self.emit("while True:")
+        self.indent += 1
+
+        for index, types, next_index in self.path:
+            instruction = self.instructions[index]
+            self.traced(index, instruction["opcode"], instruction["args"], types, next_index)
+
+        return "\n".join(self.lines) + "\n"
+
+    def side_exit(self, executed, target, failure=True):
+        """
+        Leaves trace to threaded engine
+        :param executed: Number of instructions executed in current iteration
+        :param target: Index of next instruction
+        :param failure: If true, exit is counted as guard failure, otherwise jump just left recorded path
+        """
+        if failure:
+            self.emit("jit.guard_failures += 1")
+        self.emit("interpret.total_inst += total + %d" % executed)
+        self.emit("return %d" % target)
+
+    def guard(self, index, conditions):
+        """
+        Leaves trace before instruction if any condition does not hold, instruction is then run by threaded engine
+        :param conditions: Python conditions
+        """
+        if conditions:
+            self.emit("if not (%s):" % " and ".join(conditions))
+            self.indent += 1
+            self.side_exit(self.executed, index)
+            self.indent -= 1
+
+    def operand(self, symb, observed, conditions):
+        """
+        Gets type and value expression of operand specialized to observed type
+        :param symb: Operand
+        :param observed: Observed type of variable operand
+        :param conditions: List, which gets type guard of variable not checked in current iteration
+        :return: Operand type and value expression
+        """
+        if symb[0] != "var":
+            return LITERAL_TYPES[symb[0]], literal(symb[1])
+
+        key = (symb[2], symb[3])
+        local = self.variables[key]
+        if self.known.get(key) != observed:
+            conditions.append("%s.variable_type == %d" % (local, observed))
+            self.known[key] = observed
+        self.defined.add(key)
+
+        return observed, local + ".value"
+
+    def result(self, var, conditions):
+        """
+        Gets local name of result variable, existence of variable not checked in current iteration is guarded
+        """
+        key = (var[2], var[3])
+        local = self.variables[key]
+        if key not in self.defined:
+            conditions.append("%s is not M" % local)
+            self.defined.add(key)
+
+        return local
+
+    def forget(self, args=None, kinds=None):
+        """
+        Drops knowledge about variables changed by handler
+        :param args: Arguments of instruction, which can change types of its variables
+        :param kinds: Frame kinds, which were replaced
+        """
+        if args is not None:
+            for arg in args:
+                if arg[0] == "var":
+                    self.known.pop((arg[2], arg[3]), None)
+        if kinds is not None:
+            self.known = {key: value for key, value in self.known.items() if key[0] not in kinds}
+            self.defined = {key for key in self.defined if key[0] not in kinds}
+
+    def traced(self, index, opcode, args, types, next_index):
+        """
+        Generates code of one recorded instruction
+        :param index: Instruction index
+        :param opcode: Instruction code
+        :param args: Instruction arguments
+        :param types: Observed types of variable operands
+        :param next_index: Index of instruction executed after it
+        """
+        if opcode == "LABEL":
+            self.executed += 1
+            return
+        elif opcode in JUMPS:
+            self.traced_jump(index, opcode, args, types, next_index)
+            return
+
+        if opcode in ("MOVE", "WRITE") or opcode in ARITMETIC_OPERATIONS or opcode in RELATION_OPERATORS or \
+                opcode in BOOL_OPERATORS or opcode == "NOT" or opcode in CONVERSIONS:
+            body = self.specialized(index, opcode, args, types)
+        else:
+            body = None
+
+        if body is None:
+            self.handler(index)
+            if opcode == "DEFVAR":
+                key = (args[0][2], args[0][3])
+                self.lookup_variable(key[0], key[1], self.variables[key])
+                self.known.pop(key, None)
+                self.defined.discard(key)
+            elif opcode in ("CREATEFRAME", "PUSHFRAME", "POPFRAME"):
+                self.lookup(FRAME_TEMPORARY, FRAME_LOCAL)
+                self.forget(kinds=(FRAME_TEMPORARY, FRAME_LOCAL))
+            else:
+                self.forget(args)
+        else:
+            for line in body:
+                self.emit(line)
+
+        self.executed += 1
+
+    def specialized(self, index, opcode, args, types):
+        """
+        Generates guards of instruction specialized to observed types
+        :return: Statements of instruction or None if observed types are left to handler
+        """
+        known = dict(self.known)
+        defined = set(self.defined)
+        conditions = []
+        body = self.specialized_body(opcode, args, types, conditions)
+
+        if body is None:
+            self.known = known
+            self.defined = defined
+            return None
+
+        self.guard(index, conditions)
+
+        return body
+
+    def specialized_body(self, opcode, args, types, conditions):
+        """
+        Creates statements of instruction specialized to observed types and collects their guards
+        """
+        first = 0 if opcode == "WRITE" else 1
+        if any(symb[0] == "var" and observed is None for symb, observed in zip(args[first:], types[first:])):
+            return None
+        symbols = [self.operand(symb, observed, conditions) for symb, observed in zip(args[first:], types[first:])]
+
+        if opcode == "WRITE":
+            symb_type, value = symbols[0]
+            if args[0][0] != "var":
+                return ["vf.stdout.write(%r)" % (self.write_text(args[0], symb_type) + "\n")]
+            if symb_type not in (TYPE_INT, TYPE_STRING):
+                return None
+            return ["vf.stdout.write(\"%%s\\n\" %% %s)" % value]
+
+        local = self.result(args[0], conditions)
+        key = (args[0][2], args[0][3])
+
+        if opcode == "MOVE":
+            symb_type, value = symbols[0]
+            if symb_type <= 0:
+                return None
+            body = ["%s.value = %s" % (local, value)]
+            if symb_type == TYPE_STRING and args[1][0] == "var":
+                body = ["value = %s" % value, "%s.value = str(value) if type(value) is SB else value" % local]
+            result_type = symb_type
+        elif opcode in CONVERSIONS:
+            result_type, allowed, expression = CONVERSIONS[opcode]
+            if symbols[0][0] != allowed:
+                return None
+            body = ["%s.value = %s" % (local, expression % symbols[0][1])]
+        elif opcode == "NOT":
+            if symbols[0][0] != TYPE_BOOL:
+                return None
+            result_type = TYPE_BOOL
+            body = ["%s.value = not %s" % (local, symbols[0][1])]
+        else:
+            symb_type = symbols[0][0]
+            if symb_type != symbols[1][0]:
+                return None
+            if opcode in ARITMETIC_OPERATIONS:
+                allowed, operator, result_type = ARITMETIC_TYPES[opcode], ARITMETIC_OPERATIONS[opcode], symb_type
+            elif opcode in RELATION_OPERATORS:
+                allowed, operator, result_type = RELATION_TYPES, RELATION_OPERATORS[opcode], TYPE_BOOL
+            else:
+                allowed, operator, result_type = (TYPE_BOOL,), BOOL_OPERATORS[opcode], TYPE_BOOL
+            if symb_type not in allowed:
+                return None
+            if opcode in ("IDIV", "DIV"):
+                # Division by zero is reported by handler
+                if args[2][0] != "var" and args[2][1] == 0:
+                    return None
+                elif args[2][0] == "var":
+                    conditions.append("%s != 0" % symbols[1][1])
+            body = ["%s.value = %s %s %s" % (local, symbols[0][1], operator, symbols[1][1])]
+
+        self.known[key] = result_type
+
+        return body + ["%s.variable_type = %d" % (local, result_type)]
+
+    @staticmethod
+    def write_text(symb, symb_type):
+        """
+        Gets text written by WRITE of literal
+        """
+        if symb_type == TYPE_FLOAT:
+            return float.hex(symb[1])
+        elif symb_type == TYPE_BOOL:
+            return BOOL_VALUES[symb[1]]
+
+        return str(symb[1])
+
+    def traced_jump(self, index, opcode, args, types, next_index):
+        """
+        Generates recorded jump, condition, which would change recorded direction, leaves trace
+        """
+        target = args[0][2]
+        taken = next_index == target
+
+        if opcode == "JUMP":
+            condition = None
+        elif opcode in STACK_CONDITIONAL_JUMPS:
+            condition = "se.%s()" % STACK_CONDITIONAL_JUMPS[opcode]
+        else:
+            condition = self.jump_condition(index, opcode, args, types)
+
+        if condition is not None:
+            self.emit("c = %s" % condition)
+            self.emit("if %sc:" % ("not " if taken else ""))
+            self.indent += 1
+            if taken:
+                self.side_exit(self.executed + 1, index + 1, False)
+            else:
+                self.side_exit(self.executed + 2, target, False)
+            self.indent -= 1
+
+        self.executed += 2 if taken else 1
+        if next_index == self.start:
+            self.emit("total += %d" % self.executed)
+            self.emit("continue")
+
+    def jump_condition(self, index, opcode, args, types):
+        """
+        Creates condition of JUMPIFEQ or JUMPIFNEQ specialized to observed types
+        :return: Python expression
+        """
+        operator, method = CONDITIONAL_JUMPS[opcode]
+        fallback = "vf.%s(A[%d][1], A[%d][2])" % (method, index, index)
+        if any(symb[0] == "var" and observed is None for symb, observed in zip(args[1:], types[1:])):
+            return fallback
+
+        known = dict(self.known)
+        conditions = []
+        operands = [self.operand(symb, observed, conditions) for symb, observed in zip(args[1:], types[1:])]
+        if operands[0][0] != operands[1][0] or operands[0][0] not in RELATION_TYPES:
+            self.known = known
+            return fallback
+
+        self.guard(index, conditions)
+
+        return "%s %s %s" % (operands[0][1], operator, operands[1][1])
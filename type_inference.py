@@ -0,0 +1,317 @@
+import operator
+from control_flow import ControlFlowGraph
+from errors import IPPcodeOperandValueError
+from variables import TYPE_NONE, TYPE_INT, TYPE_BOOL, TYPE_STRING, TYPE_FLOAT, FRAME_GLOBAL, FRAME_TEMPORARY, \
+    FRAME_LOCAL, text_value
+
+# Every variable state is bit mask of its possible types, variable, which can be undefined, has UNDEFINED bit
+NONE = 1 << TYPE_NONE
+INT = 1 << TYPE_INT
+BOOL = 1 << TYPE_BOOL
+STRING = 1 << TYPE_STRING
+FLOAT = 1 << TYPE_FLOAT
+UNDEFINED = 1 << 5
+VALUE = INT | BOOL | STRING | FLOAT
+UNKNOWN = NONE | VALUE | UNDEFINED
+
+MASK_TYPES = {INT: TYPE_INT, BOOL: TYPE_BOOL, STRING: TYPE_STRING, FLOAT: TYPE_FLOAT}
+
+LITERAL_TYPES = {"int": TYPE_INT, "bool": TYPE_BOOL, "string": TYPE_STRING, "float": TYPE_FLOAT}
+
+# Result types of instructions, which write to their first operand
+RESULTS = {"IDIV": INT, "DIV": FLOAT, "LT": BOOL, "GT": BOOL, "EQ": BOOL, "AND": BOOL, "OR": BOOL, "NOT": BOOL,
+           "INT2CHAR": STRING, "STRI2INT": INT, "INT2FLOAT": FLOAT, "FLOAT2INT": INT, "TYPE": STRING,
+           "CONCAT": STRING, "STRLEN": INT, "GETCHAR": STRING, "SETCHAR": STRING, "POPS": VALUE}
+
+READ_RESULTS = {"int": INT, "bool": BOOL, "string": STRING, "float": FLOAT}
+
+ARITMETIC_OPERATIONS = {"ADD": operator.add, "SUB": operator.sub, "MUL": operator.mul}
+
+DIVISIONS = {"IDIV": (TYPE_INT, operator.floordiv), "DIV": (TYPE_FLOAT, operator.truediv)}
+
+RELATION_OPERATORS = {"LT": operator.lt, "GT": operator.gt, "EQ": operator.eq}
+
+BOOL_OPERATORS = {"AND": operator.and_, "OR": operator.or_}
+
+# Instruction, result type, operand type and conversion
+CONVERSIONS = {"INT2FLOAT": (TYPE_FLOAT, TYPE_INT, float), "FLOAT2INT": (TYPE_INT, TYPE_FLOAT, int),
+               "STRLEN": (TYPE_INT, TYPE_STRING, len), "NOT": (TYPE_BOOL, TYPE_BOOL, operator.not_)}
+
+CONDITIONAL_JUMPS = {"JUMPIFEQ": operator.eq, "JUMPIFNEQ": operator.ne}
+
+# Instructions, which have handlers without type checks
+TYPED_INSTRUCTIONS = set(ARITMETIC_OPERATIONS) | set(DIVISIONS) | set(RELATION_OPERATORS) | set(BOOL_OPERATORS) | \
+    set(CONVERSIONS) | set(CONDITIONAL_JUMPS) | {"CONCAT"}
+
+
+class TypeInference:
+    def __init__(self, interpret):
+        """
+        Sets analysed program
+        :param interpret: InterpretFactory with loaded program and resolved labels
+        """
+        self.interpret = interpret
+        self.instructions = interpret.instructions
+        self.variables = {}
+        self.frame_pairs = []
+
+        # Variables of TF and LF with the same name are moved together by PUSHFRAME and POPFRAME
+        names = set()
+        for instruction in self.instructions:
+            for arg in instruction["args"]:
+                if arg[0] == "var":
+                    if arg[2] == FRAME_GLOBAL:
+                        self.variables.setdefault((arg[2], arg[3]), len(self.variables))
+                    else:
+                        names.add(arg[3])
+        for name in sorted(names):
+            temporary = self.variables.setdefault((FRAME_TEMPORARY, name), len(self.variables))
+            local = self.variables.setdefault((FRAME_LOCAL, name), len(self.variables))
+            self.frame_pairs.append((temporary, local))
+
+    def infer(self):
+        """
+        Finds types of operands, which are the same on every path to instruction with typed handler
+        :return: List with tuple of proven argument types or None for every instruction,
+                 unproven argument and result variable have type None
+        """
+        instructions = self.instructions
+        graph = ControlFlowGraph(instructions)
+
+        # States at block starts are joined until nothing changes, program starts without defined variables
+        states = {}
+        if graph.blocks:
+            states[0] = [UNDEFINED] * len(self.variables)
+        pending = list(states)
+        queued = set(pending)
+
+        while pending:
+            block = graph.blocks[pending.pop()]
+            queued.discard(block.id)
+            state = list(states[block.id])
+            for index in range(block.start, block.end):
+                self.transfer(instructions[index], state)
+
+            for successor, _ in block.successors:
+                old = states.get(successor.id)
+                if old is None:
+                    new = list(state)
+                else:
+                    new = [old_mask | mask for old_mask, mask in zip(old, state)]
+                    if new == old:
+                        continue
+                states[successor.id] = new
+                if successor.id not in queued:
+                    queued.add(successor.id)
+                    pending.append(successor.id)
+
+        proven = [None] * len(instructions)
+        for block_id, state in states.items():
+            block = graph.blocks[block_id]
+            state = list(state)
+            for index in range(block.start, block.end):
+                instruction = instructions[index]
+                if instruction["opcode"] in TYPED_INSTRUCTIONS:
+                    proven[index] = self.prove(instruction, state)
+                self.transfer(instruction, state)
+
+        return proven
+
+    def transfer(self, instruction, state):
+        """
+        Changes state by effect of instruction
+        :param instruction: Instruction
+        :param state: List of type masks of variables
+        """
+        opcode = instruction["opcode"]
+        args = instruction["args"]
+
+        if opcode == "CREATEFRAME":
+            for temporary, _ in self.frame_pairs:
+                state[temporary] = UNDEFINED
+            return
+        elif opcode == "PUSHFRAME":
+            for temporary, local in self.frame_pairs:
+                state[local] = state[temporary]
+                state[temporary] = UNDEFINED
+            return
+        elif opcode == "POPFRAME":
+            # Frame below popped LF is not known
+            for temporary, local in self.frame_pairs:
+                state[temporary] = state[local]
+                state[local] = UNKNOWN
+            return
+
+        if not args or args[0][0] != "var":
+            return
+        variable = self.variables[(args[0][2], args[0][3])]
+
+        # DEFVAR of defined variable keeps its value, empty mask of operand, which is never set, proves nothing
+        if opcode == "DEFVAR":
+            state[variable] = state[variable] & ~UNDEFINED | NONE
+        elif opcode == "MOVE":
+            state[variable] = self.mask(args[1], state) & VALUE or VALUE
+        elif opcode in ARITMETIC_OPERATIONS:
+            state[variable] = self.mask(args[1], state) & self.mask(args[2], state) & (INT | FLOAT) or INT | FLOAT
+        elif opcode == "READ":
+            state[variable] = READ_RESULTS.get(args[1][1], UNKNOWN)
+        elif opcode in RESULTS:
+            state[variable] = RESULTS[opcode]
+
+    def mask(self, symb, state):
+        """
+        Gets type mask of operand
+        """
+        if symb[0] == "var":
+            return state[self.variables[(symb[2], symb[3])]]
+
+        return 1 << LITERAL_TYPES[symb[0]]
+
+    def prove(self, instruction, state):
+        """
+        Gets proven types of instruction operands, undefined variable is reported by frame like before
+        :return: Tuple of argument types or None if no operand type is proven
+        """
+        types = []
+        for position, arg in enumerate(instruction["args"]):
+            if arg[0] in LITERAL_TYPES:
+                types.append(LITERAL_TYPES[arg[0]])
+            elif arg[0] == "var" and position > 0:
+                types.append(MASK_TYPES.get(state[self.variables[(arg[2], arg[3])]] & ~UNDEFINED))
+            else:
+                types.append(None)
+
+        if not any(arg[0] == "var" and symb_type is not None for arg, symb_type in zip(instruction["args"], types)):
+            return None
+
+        return tuple(types)
+
+
+class TypedDecoder:
+    def __init__(self, engine):
+        """
+        Sets engine, which gets handlers without type checks
+        :param engine: ThreadedEngine
+        """
+        self.engine = engine
+        self.frame_getters = engine.interpret.variables_factory.frame_getters
+
+    def decode(self, opcode, args, types):
+        """
+        Creates handler of instruction with proven operand types
+        :param opcode: Instruction code
+        :param args: Instruction arguments
+        :param types: Proven argument types
+        :return: Handler or None if instruction needs type checks
+        """
+        if opcode in ARITMETIC_OPERATIONS:
+            if types[1] == types[2] and types[1] in (TYPE_INT, TYPE_FLOAT):
+                return self.binary(args, ARITMETIC_OPERATIONS[opcode], types[1])
+        elif opcode in DIVISIONS:
+            result_type, operation = DIVISIONS[opcode]
+            if types[1] == types[2] == result_type:
+                return self.division(args, operation, result_type)
+        elif opcode in RELATION_OPERATORS:
+            if types[1] == types[2] and types[1] is not None:
+                return self.binary(args, RELATION_OPERATORS[opcode], TYPE_BOOL)
+        elif opcode in BOOL_OPERATORS:
+            if types[1] == types[2] == TYPE_BOOL:
+                return self.binary(args, BOOL_OPERATORS[opcode], TYPE_BOOL)
+        elif opcode in CONVERSIONS:
+            result_type, allowed, conversion = CONVERSIONS[opcode]
+            if types[1] == allowed:
+                return self.unary(args, conversion, result_type, opcode != "STRLEN")
+        elif opcode == "CONCAT":
+            if types[1] == types[2] == TYPE_STRING and args[1] != args[0]:
+                return self.binary(args, operator.add, TYPE_STRING)
+        elif opcode in CONDITIONAL_JUMPS:
+            if types[1] == types[2] and types[1] is not None:
+                return self.conditional_jump(args, CONDITIONAL_JUMPS[opcode])
+
+        return None
+
+    def variable(self, var):
+        """
+        Gets frame getter and name of variable, getter reports undefined frame or variable
+        """
+        return self.frame_getters[var[2]], var[3]
+
+    def operand(self, symb, text=True):
+        """
+        Creates function getting value of operand without type checks
+        :param symb: Operand
+        :param text: If true, string kept in StringBuilder is turned to string
+        """
+        if symb[0] != "var":
+            value = symb[1]
+            return lambda: value
+
+        get, name = self.variable(symb)
+        if text:
+            return lambda: text_value(get(name).value)
+
+        return lambda: get(name).value
+
+    def binary(self, args, operation, result_type):
+        """
+        Creates handler of instruction with two operands
+        """
+        get, name = self.variable(args[0])
+        symb1 = self.operand(args[1])
+        symb2 = self.operand(args[2])
+
+        def handler(current_inst):
+            variable = get(name)
+            variable.value = operation(symb1(), symb2())
+            variable.variable_type = result_type
+            return current_inst + 1
+
+        return handler
+
+    def division(self, args, operation, result_type):
+        """
+        Creates handler of IDIV or DIV, division by zero is still reported
+        """
+        get, name = self.variable(args[0])
+        symb1 = self.operand(args[1])
+        symb2 = self.operand(args[2])
+
+        def handler(current_inst):
+            variable = get(name)
+            try:
+                variable.value = operation(symb1(), symb2())
+            except ZeroDivisionError:
+                raise IPPcodeOperandValueError("IDIV division by zero")
+            variable.variable_type = result_type
+            return current_inst + 1
+
+        return handler
+
+    def unary(self, args, conversion, result_type, text):
+        """
+        Creates handler of instruction with one operand
+        :param text: If false, string operand can stay in StringBuilder
+        """
+        get, name = self.variable(args[0])
+        symb = self.operand(args[1], text)
+
+        def handler(current_inst):
+            variable = get(name)
+            variable.value = conversion(symb())
+            variable.variable_type = result_type
+            return current_inst + 1
+
+        return handler
+
+    def conditional_jump(self, args, compare):
+        """
+        Creates handler of JUMPIFEQ or JUMPIFNEQ, second operand is read first like in VariablesFactory
+        """
+        symb1 = self.operand(args[1])
+        symb2 = self.operand(args[2])
+
+        def condition():
+            value2 = symb2()
+            return compare(symb1(), value2)
+
+        return self.engine.jump_if(condition, args[0])
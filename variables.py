@@ -1,4 +1,8 @@
 import sys
+from errors import IPPcodeMissingValueError, IPPcodeOperandTypeError, IPPcodeOperandValueError, IPPcodeSemanticError, \
+    IPPcodeStringError
+from input_reader import InputReader
+from string_builder import StringBuilder
 
 TYPE_NONE = 0
 TYPE_INT = 1
@@ -6,29 +10,35 @@ TYPE_BOOL = 2
 TYPE_STRING = 3
 TYPE_FLOAT = 4
 
+FRAME_GLOBAL = 0
+FRAME_TEMPORARY = 1
+FRAME_LOCAL = 2
+
+FRAME_KINDS = {"GF": FRAME_GLOBAL, "TF": FRAME_TEMPORARY, "LF": FRAME_LOCAL}
+
+BOOL_VALUES = {True: "true", False: "false"}
+
 
 class VariablesFactory:
     def __init__(self, frames):
         """
-        Sets default values
+        Sets default values, program reads and writes standard streams until other streams are set
         """
         self.frames = frames
+        self.input_reader = InputReader(sys.stdin)
+        self.stdout = sys.stdout
+        self.stderr = sys.stderr
         self.data_stack = []
+        self.frame_getters = (frames.get_from_global_frame, frames.get_from_temporary_frame,
+                              frames.get_from_local_frame)
+        self.frame_adders = (frames.add_to_global_frame, frames.add_to_temporary_frame, frames.add_to_local_frame)
 
     def def_var(self, var):
         """
         Defines variable
-        :param var: variable
+        :param var: variable with resolved frame kind and name
         """
-        frame, name = var[1].split("@")
-        new_variable = Variable(name)
-
-        if frame == "GF":
-            self.frames.add_to_global_frame(new_variable)
-        elif frame == "TF":
-            self.frames.add_to_temporary_frame(new_variable)
-        elif frame == "LF":
-            self.frames.add_to_local_frame(new_variable)
+        self.frame_adders[var[2]](Variable(var[3]))
 
     def move_to_var(self, var, symb):
         """
@@ -52,33 +62,20 @@ class VariablesFactory:
             variable.value = symb[1]
         elif symb[0] == "var":
             symb_var = self.get_var(symb, True)
-            variable.value = symb_var.value
+            variable.value = text_value(symb_var.value)
             variable.variable_type = symb_var.variable_type
 
     def get_var(self, var, check_if_initialized=False):
         """
         Gets variable by name
-        :param var: Variable
+        :param var: Variable with resolved frame kind and name
         :param check_if_initialized: If true, raises error when variable is not inizialized
         :return: Variable
         """
-        if var == "stack":
-            return Variable("stack")
-
-        frame, name = var[1].split("@")
-
-        variable = None
-
-        if frame == "GF":
-            variable = self.frames.get_from_global_frame(name)
-        elif frame == "TF":
-            variable = self.frames.get_from_temporary_frame(name)
-        elif frame == "LF":
-            variable = self.frames.get_from_local_frame(name)
+        variable = self.frame_getters[var[2]](var[3])
 
         if variable.variable_type == TYPE_NONE and check_if_initialized:
-            sys.stderr.write("ERROR: %s is not initialized!\n" % var[1])
-            exit(56)
+            raise IPPcodeMissingValueError("%s is not initialized" % var[1])
 
         return variable
 
@@ -91,21 +88,22 @@ class VariablesFactory:
         if symb[0] == "var":
             variable = self.get_var(symb, True)
             data_type = variable.variable_type
-            value = variable.value
+            value = text_value(variable.value)
         else:
             data_type, value = self.get_symbol_type_and_value(symb)
 
         if data_type == TYPE_FLOAT:
             value = float.hex(value)
+        elif data_type == TYPE_BOOL:
+            value = BOOL_VALUES[value]
 
         if value is None:
-            sys.stderr.write("ERROR: %s does not have value!\n" % symb[1])
-            exit(56)
+            raise IPPcodeMissingValueError("%s does not have value" % symb[1])
 
         if debug:
-            sys.stderr.write(value)
+            self.stderr.write(value)
         else:
-            print(value)
+            self.stdout.write("%s\n" % value)
 
     def aritmetic_operation(self, var, symb1, symb2, operation):
         """
@@ -115,50 +113,57 @@ class VariablesFactory:
         :param symb2: Second operand
         :param operation: Operation
         """
-        if var is None and symb1 is None and symb2 is None:
-            variable = self.get_var("stack")
-            symb2_type, symb2_value = self.pop_data_stack()
-            symb1_type, symb1_value = self.pop_data_stack()
-        else:
-            variable = self.get_var(var)
-            symb1_type, symb1_value = self.get_symbol_type_and_value(symb1)
-            symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
+        variable = self.get_var(var)
+        symb1_type, symb1_value = self.get_symbol_type_and_value(symb1)
+        symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
+        variable.variable_type, variable.value = self.aritmetic_result(symb1_type, symb1_value, symb2_type,
+                                                                       symb2_value, operation, symb1, symb2)
 
+    def aritmetic_operation_stack(self, operation):
+        """
+        Interprets all aritmetic stack operations
+        :param operation: Operation
+        """
+        symb2_type, symb2_value = self.pop_data_stack()
+        symb1_type, symb1_value = self.pop_data_stack()
+        self.data_stack.append(list(self.aritmetic_result(symb1_type, symb1_value, symb2_type, symb2_value,
+                                                          operation)))
+
+    def aritmetic_result(self, symb1_type, symb1_value, symb2_type, symb2_value, operation, symb1=None, symb2=None):
+        """
+        Checks operand types and computes result of aritmetic operation
+        :param operation: Operation
+        :param symb1: First operand, None for stack operations
+        :param symb2: Second operand, None for stack operations
+        :return: Result type and value
+        """
         if symb1_type != TYPE_FLOAT and symb1_type != TYPE_INT:
-            sys.stderr.write("ERROR: Aritmetic instructions requires two float or int types!\n")
-            self.wrong_operands_exit(symb1, symb2, types=[TYPE_FLOAT, TYPE_INT])
+            raise self.wrong_operands_error("Aritmetic instructions requires two float or int types", symb1, symb2,
+                                            types=[TYPE_FLOAT, TYPE_INT])
         elif operation == "idiv" and symb1_type != TYPE_INT:
-            sys.stderr.write("ERROR: IDIV instruction requires two int types!\n")
-            self.wrong_operands_exit(symb1, symb2, types=[TYPE_INT])
+            raise self.wrong_operands_error("IDIV instruction requires two int types", symb1, symb2, types=[TYPE_INT])
         elif operation == "div" and symb1_type != TYPE_FLOAT:
-            sys.stderr.write("ERROR: DIV instruction requires two float types!\n")
-            self.wrong_operands_exit(symb1, symb2, types=[TYPE_FLOAT])
+            raise self.wrong_operands_error("DIV instruction requires two float types", symb1, symb2,
+                                            types=[TYPE_FLOAT])
         elif symb1_type != symb2_type:
-            sys.stderr.write("ERROR: Aritmetic instruction requires same types!\n")
-            exit(53)
+            raise IPPcodeOperandTypeError("Aritmetic instruction requires same types")
 
-        variable.variable_type = symb1_type
         if operation == "add":
-            variable.value = symb1_value + symb2_value
+            return symb1_type, symb1_value + symb2_value
         elif operation == "sub":
-            variable.value = symb1_value - symb2_value
+            return symb1_type, symb1_value - symb2_value
         elif operation == "mul":
-            variable.value = symb1_value * symb2_value
+            return symb1_type, symb1_value * symb2_value
         elif operation == "idiv":
             try:
-                variable.value = symb1_value // symb2_value
+                return symb1_type, symb1_value // symb2_value
             except ZeroDivisionError:
-                sys.stderr.write("ERROR: IDIV division by zero!\n")
-                exit(57)
+                raise IPPcodeOperandValueError("IDIV division by zero")
         elif operation == "div":
             try:
-                variable.value = symb1_value / symb2_value
+                return symb1_type, symb1_value / symb2_value
             except ZeroDivisionError:
-                sys.stderr.write("ERROR: IDIV division by zero!\n")
-                exit(57)
-
-        if var is None and symb1 is None and symb2 is None:
-            self.data_stack.append([variable.variable_type, variable.value])
+                raise IPPcodeOperandValueError("IDIV division by zero")
 
     def relation_operator(self, var, symb1, symb2, operator):
         """
@@ -168,29 +173,38 @@ class VariablesFactory:
         :param symb2: Second operand
         :param operator: Operator
         """
-        if var is None and symb1 is None and symb2 is None:
-            variable = self.get_var("stack")
-            symb2_type, symb2_value = self.pop_data_stack()
-            symb1_type, symb1_value = self.pop_data_stack()
-        else:
-            variable = self.get_var(var)
-            symb1_type, symb1_value = self.get_symbol_type_and_value(symb1)
-            symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
+        variable = self.get_var(var)
+        symb1_type, symb1_value = self.get_symbol_type_and_value(symb1)
+        symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
+        variable.value = self.relation_result(symb1_type, symb1_value, symb2_type, symb2_value, operator)
+        variable.variable_type = TYPE_BOOL
 
+    def relation_operator_stack(self, operator):
+        """
+        Interprets all relation stack operations
+        :param operator: Operator
+        """
+        symb2_type, symb2_value = self.pop_data_stack()
+        symb1_type, symb1_value = self.pop_data_stack()
+        self.data_stack.append([TYPE_BOOL, self.relation_result(symb1_type, symb1_value, symb2_type, symb2_value,
+                                                                operator)])
+
+    @staticmethod
+    def relation_result(symb1_type, symb1_value, symb2_type, symb2_value, operator):
+        """
+        Checks operand types and computes result of relation operation
+        :param operator: Operator
+        :return: Bool value
+        """
         if symb1_type != symb2_type:
-            sys.stderr.write("ERROR: Both symbols must have same type for relation operators use!\n")
-            exit(53)
+            raise IPPcodeOperandTypeError("Both symbols must have same type for relation operators use")
 
-        variable.variable_type = TYPE_BOOL
         if operator == "lt":
-            variable.value = str(symb1_value < symb2_value).lower()
+            return symb1_value < symb2_value
         elif operator == "gt":
-            variable.value = str(symb1_value > symb2_value).lower()
+            return symb1_value > symb2_value
         elif operator == "eq":
-            variable.value = str(symb1_value == symb2_value).lower()
-
-        if var is None and symb1 is None and symb2 is None:
-            self.data_stack.append([variable.variable_type, variable.value])
+            return symb1_value == symb2_value
 
     def bool_operator(self, var, symb1, symb2, operator):
         """
@@ -200,43 +214,45 @@ class VariablesFactory:
         :param symb2: Second operand
         :param operator: Operator
         """
-        if var is None and symb1 is None and symb2 is None:
-            variable = self.get_var("stack")
-            symb2_type, symb2_value = self.pop_data_stack()
-
-            if operator == "not":
-                symb1_type, symb1_value = symb2_type, symb2_value
-            else:
-                symb1_type, symb1_value = self.pop_data_stack()
-        else:
-            variable = self.get_var(var)
-            symb1_type, symb1_value = self.get_symbol_type_and_value(symb1)
-            symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
+        variable = self.get_var(var)
+        symb1_type, symb1_value = self.get_symbol_type_and_value(symb1)
+        symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
+        variable.value = self.bool_result(symb1_type, symb1_value, symb2_type, symb2_value, operator, symb1, symb2)
+        variable.variable_type = TYPE_BOOL
 
-        if symb1_type != symb2_type or symb1_type != TYPE_BOOL:
-            sys.stderr.write("ERROR: Bool instructions can only have two symbols with bool types!\n")
-            self.wrong_operands_exit(symb1, symb2, types=[TYPE_BOOL])
+    def bool_operator_stack(self, operator):
+        """
+        Interprets all boolean stack operations
+        :param operator: Operator
+        """
+        symb2_type, symb2_value = self.pop_data_stack()
 
-        if symb1_value == "true":
-            symb1_actual = True
+        if operator == "not":
+            symb1_type, symb1_value = symb2_type, symb2_value
         else:
-            symb1_actual = False
+            symb1_type, symb1_value = self.pop_data_stack()
 
-        if symb2_value == "true":
-            symb2_actual = True
-        else:
-            symb2_actual = False
+        self.data_stack.append([TYPE_BOOL, self.bool_result(symb1_type, symb1_value, symb2_type, symb2_value,
+                                                            operator)])
+
+    def bool_result(self, symb1_type, symb1_value, symb2_type, symb2_value, operator, symb1=None, symb2=None):
+        """
+        Checks operand types and computes result of boolean operation
+        :param operator: Operator
+        :param symb1: First operand, None for stack operations
+        :param symb2: Second operand, None for stack operations
+        :return: Bool value
+        """
+        if symb1_type != symb2_type or symb1_type != TYPE_BOOL:
+            raise self.wrong_operands_error("Bool instructions can only have two symbols with bool types", symb1,
+                                            symb2, types=[TYPE_BOOL])
 
-        variable.variable_type = TYPE_BOOL
         if operator == "and":
-            variable.value = str(symb1_actual and symb2_actual).lower()
+            return symb1_value and symb2_value
         elif operator == "or":
-            variable.value = str(symb1_actual or symb2_actual).lower()
+            return symb1_value or symb2_value
         elif operator == "not":
-            variable.value = str(not symb1_actual).lower()
-
-        if var is None and symb1 is None and symb2 is None:
-            self.data_stack.append([variable.variable_type, variable.value])
+            return not symb1_value
 
     def get_symbol_type_and_value(self, symb, check_if_initialized=True):
         """
@@ -247,7 +263,7 @@ class VariablesFactory:
         if symb[0] == "var":
             var = self.get_var(symb, check_if_initialized)
 
-            return var.variable_type, var.value
+            return var.variable_type, text_value(var.value)
         elif symb[0] == "float":
             return TYPE_FLOAT, symb[1]
         elif symb[0] == "int":
@@ -257,6 +273,19 @@ class VariablesFactory:
         elif symb[0] == "string":
             return TYPE_STRING, symb[1]
 
+    def get_string_type_and_value(self, symb):
+        """
+        Gets value and type of symbol read by string instruction, value of string variable
+        can be StringBuilder, which supports len() and indexing
+        :param symb: Symbol
+        """
+        if symb[0] == "var":
+            var = self.get_var(symb, True)
+
+            return var.variable_type, var.value
+
+        return self.get_symbol_type_and_value(symb)
+
     def get_type(self, var, symb):
         """
         Gets symbol type
@@ -284,26 +313,31 @@ class VariablesFactory:
         :param var: Variable, where result is saved
         :param symb: Operand
         """
-        if var is None and symb is None:
-            variable = self.get_var("stack")
-            symb_type, symb_value = self.pop_data_stack()
-        else:
-            variable = self.get_var(var)
-            symb_type, symb_value = self.get_symbol_type_and_value(symb)
+        variable = self.get_var(var)
+        symb_type, symb_value = self.get_symbol_type_and_value(symb)
+        variable.value = self.int_to_char_result(symb_type, symb_value, symb)
+        variable.variable_type = TYPE_STRING
 
+    def int_to_char_stack(self):
+        """
+        Interprets INT2CHARS instruction
+        """
+        symb_type, symb_value = self.pop_data_stack()
+        self.data_stack.append([TYPE_STRING, self.int_to_char_result(symb_type, symb_value)])
+
+    def int_to_char_result(self, symb_type, symb_value, symb=None):
+        """
+        Checks operand type and converts int to char
+        :param symb: Operand, None for stack operation
+        :return: Char
+        """
         if symb_type != TYPE_INT:
-            sys.stderr.write("ERROR: INT2CHAR requires symbol with int type!\n")
-            self.wrong_operands_exit(symb, types=[TYPE_INT])
+            raise self.wrong_operands_error("INT2CHAR requires symbol with int type", symb, types=[TYPE_INT])
 
-        variable.variable_type = TYPE_STRING
         try:
-            variable.value = chr(symb_value)
+            return chr(symb_value)
         except ValueError:
-            sys.stderr.write("ERROR: INT2CHAR requires symbol with valid ordinary char value in UNICODE!\n")
-            exit(58)
-
-        if var is None and symb is None:
-            self.data_stack.append([variable.variable_type, variable.value])
+            raise IPPcodeStringError("INT2CHAR requires symbol with valid ordinary char value in UNICODE")
 
     def stri_to_int(self, var, symb1, symb2):
         """
@@ -312,31 +346,37 @@ class VariablesFactory:
         :param symb1: First operand
         :param symb2: Second operand
         """
-        if var is None and symb1 is None and symb2 is None:
-            variable = self.get_var("stack")
-            symb2_type, symb2_value = self.pop_data_stack()
-            symb1_type, symb1_value = self.pop_data_stack()
-        else:
-            variable = self.get_var(var)
-            symb1_type, symb1_value = self.get_symbol_type_and_value(symb1)
-            symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
+        variable = self.get_var(var)
+        symb1_type, symb1_value = self.get_string_type_and_value(symb1)
+        symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
+        variable.value = self.stri_to_int_result(symb1_type, symb1_value, symb2_type, symb2_value, symb1, symb2)
+        variable.variable_type = TYPE_INT
+
+    def stri_to_int_stack(self):
+        """
+        Interprets STRI2INTS instruction
+        """
+        symb2_type, symb2_value = self.pop_data_stack()
+        symb1_type, symb1_value = self.pop_data_stack()
+        self.data_stack.append([TYPE_INT, self.stri_to_int_result(symb1_type, symb1_value, symb2_type, symb2_value)])
 
+    def stri_to_int_result(self, symb1_type, symb1_value, symb2_type, symb2_value, symb1=None, symb2=None):
+        """
+        Checks operand types and gets ordinal value of char in string
+        :param symb1: First operand, None for stack operation
+        :param symb2: Second operand, None for stack operation
+        :return: Ordinal value
+        """
         if symb1_type != TYPE_STRING:
-            sys.stderr.write("ERROR: STRI2INT must have first symbol with string type!\n")
-            self.wrong_operands_exit(symb1, types=[TYPE_STRING])
+            raise self.wrong_operands_error("STRI2INT must have first symbol with string type", symb1,
+                                            types=[TYPE_STRING])
         elif symb2_type != TYPE_INT:
-            sys.stderr.write("ERROR: STRI2INT must have second symbol with int type!\n")
-            self.wrong_operands_exit(symb2, types=[TYPE_INT])
+            raise self.wrong_operands_error("STRI2INT must have second symbol with int type", symb2, types=[TYPE_INT])
 
-        variable.variable_type = TYPE_INT
         try:
-            variable.value = ord(symb1_value[symb2_value])
+            return ord(symb1_value[symb2_value])
         except IndexError:
-            sys.stderr.write("ERROR: STRI2INT string out of range!\n")
-            exit(58)
-
-        if var is None and symb1 is None and symb2 is None:
-            self.data_stack.append([variable.variable_type, variable.value])
+            raise IPPcodeStringError("STRI2INT string out of range")
 
     def is_equal(self, symb1, symb2):
         """
@@ -344,16 +384,23 @@ class VariablesFactory:
         :param symb1: First operand
         :param symb2: Second operand
         """
-        if symb1 is None and symb2 is None:
-            symb2_type, symb2_value = self.pop_data_stack()
-            symb1_type, symb1_value = self.pop_data_stack()
-        else:
-            symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
-            symb1_type, symb1_value = self.get_symbol_type_and_value(symb1)
+        symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
+        symb1_type, symb1_value = self.get_symbol_type_and_value(symb1)
 
         if symb1_type != symb2_type:
-            sys.stderr.write("ERROR: Both symbols in JUMPIFEQ must be same type!\n")
-            exit(53)
+            raise IPPcodeOperandTypeError("Both symbols in JUMPIFEQ must be same type")
+
+        return symb1_value == symb2_value
+
+    def is_equal_stack(self):
+        """
+        Checks if two symbols on top of data stack are equal
+        """
+        symb2_type, symb2_value = self.pop_data_stack()
+        symb1_type, symb1_value = self.pop_data_stack()
+
+        if symb1_type != symb2_type:
+            raise IPPcodeOperandTypeError("Both symbols in JUMPIFEQ must be same type")
 
         return symb1_value == symb2_value
 
@@ -363,16 +410,23 @@ class VariablesFactory:
         :param symb1: First operand
         :param symb2: Second operand
         """
-        if symb1 is None and symb2 is None:
-            symb2_type, symb2_value = self.pop_data_stack()
-            symb1_type, symb1_value = self.pop_data_stack()
-        else:
-            symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
-            symb1_type, symb1_value = self.get_symbol_type_and_value(symb1)
+        symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
+        symb1_type, symb1_value = self.get_symbol_type_and_value(symb1)
+
+        if symb1_type != symb2_type:
+            raise IPPcodeOperandTypeError("Both symbols in JUMPIFNEQ must be same type")
+
+        return symb1_value != symb2_value
+
+    def is_not_equal_stack(self):
+        """
+        Checks if two symbols on top of data stack are not equal
+        """
+        symb2_type, symb2_value = self.pop_data_stack()
+        symb1_type, symb1_value = self.pop_data_stack()
 
         if symb1_type != symb2_type:
-            sys.stderr.write("ERROR: Both symbols in JUMPIFNEQ must be same type!\n")
-            exit(53)
+            raise IPPcodeOperandTypeError("Both symbols in JUMPIFNEQ must be same type")
 
         return symb1_value != symb2_value
 
@@ -404,8 +458,7 @@ class VariablesFactory:
         :return: Returns popped symbol
         """
         if len(self.data_stack) == 0:
-            sys.stderr.write("ERROR: Data stack is empty!\n")
-            exit(56)
+            raise IPPcodeMissingValueError("Data stack is empty")
 
         return self.data_stack.pop()
 
@@ -417,12 +470,21 @@ class VariablesFactory:
         :param symb2: Second operand
         """
         variable = self.get_var(var)
+
+        # Appending to the same variable changes its string in place
+        if symb1[0] == "var" and self.get_var(symb1, True) is variable and variable.variable_type == TYPE_STRING:
+            symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
+            if symb2_type == TYPE_STRING:
+                if type(variable.value) is not StringBuilder:
+                    variable.value = StringBuilder(variable.value)
+                variable.value.append(symb2_value)
+                return
+
         symb1_type, symb1_value = self.get_symbol_type_and_value(symb1)
         symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
 
         if symb1_type != TYPE_STRING or symb2_type != TYPE_STRING:
-            sys.stderr.write("ERROR: CONCAT needs two string symbols!\n")
-            self.wrong_operands_exit(symb1, symb2, types=[TYPE_STRING])
+            raise self.wrong_operands_error("CONCAT needs two string symbols", symb1, symb2, types=[TYPE_STRING])
 
         variable.variable_type = TYPE_STRING
         variable.value = symb1_value + symb2_value
@@ -434,11 +496,10 @@ class VariablesFactory:
         :param symb: Operand
         """
         variable = self.get_var(var)
-        symb_type, symb_value = self.get_symbol_type_and_value(symb)
+        symb_type, symb_value = self.get_string_type_and_value(symb)
 
         if symb_type != TYPE_STRING:
-            sys.stderr.write("ERROR: STRLEN needs string symbol!\n")
-            self.wrong_operands_exit(symb, types=[TYPE_STRING])
+            raise self.wrong_operands_error("STRLEN needs string symbol", symb, types=[TYPE_STRING])
 
         variable.variable_type = TYPE_INT
         variable.value = len(symb_value)
@@ -451,22 +512,19 @@ class VariablesFactory:
         :param symb2: Second operand
         """
         variable = self.get_var(var)
-        symb1_type, symb1_value = self.get_symbol_type_and_value(symb1)
+        symb1_type, symb1_value = self.get_string_type_and_value(symb1)
         symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
 
         if symb1_type != TYPE_STRING:
-            sys.stderr.write("ERROR: GETCHAR's first symbol must be string!\n")
-            self.wrong_operands_exit(symb1, types=[TYPE_STRING])
+            raise self.wrong_operands_error("GETCHAR's first symbol must be string", symb1, types=[TYPE_STRING])
         elif symb2_type != TYPE_INT:
-            sys.stderr.write("ERROR: GETCHAR's second symbol must be int!\n")
-            self.wrong_operands_exit(symb2, types=[TYPE_INT])
+            raise self.wrong_operands_error("GETCHAR's second symbol must be int", symb2, types=[TYPE_INT])
 
         variable.variable_type = TYPE_STRING
         try:
             variable.value = symb1_value[symb2_value]
         except IndexError:
-            sys.stderr.write("ERROR: GETCHAR string out of range!\n")
-            exit(58)
+            raise IPPcodeStringError("GETCHAR string out of range")
 
     def set_char(self, var, symb1, symb2):
         """
@@ -480,23 +538,22 @@ class VariablesFactory:
         symb2_type, symb2_value = self.get_symbol_type_and_value(symb2)
 
         if variable.variable_type != TYPE_STRING:
-            sys.stderr.write("ERROR: SETCHAR needs string var!\n")
-            exit(53)
+            raise IPPcodeOperandTypeError("SETCHAR needs string var")
         elif symb1_type != TYPE_INT:
-            sys.stderr.write("ERROR: SETCHAR's first symbol must be int!\n")
-            self.wrong_operands_exit(symb1, types=[TYPE_INT])
+            raise self.wrong_operands_error("SETCHAR's first symbol must be int", symb1, types=[TYPE_INT])
         elif symb2_type != TYPE_STRING:
-            sys.stderr.write("ERROR: SETCHAR's second symbol must be string!\n")
-            self.wrong_operands_exit(symb2, types=[TYPE_STRING])
+            raise self.wrong_operands_error("SETCHAR's second symbol must be string", symb2, types=[TYPE_STRING])
 
         try:
             if symb1_value > (len(variable.value) - 1) or symb1_value < 0:
                 raise IndexError
 
-            variable.value = variable.value[:symb1_value] + symb2_value[0] + variable.value[symb1_value + 1:]
+            char = symb2_value[0]
+            if type(variable.value) is not StringBuilder:
+                variable.value = StringBuilder(variable.value)
+            variable.value.set_char(symb1_value, char)
         except IndexError:
-            sys.stderr.write("ERROR: SETCHAR string out of range!\n")
-            exit(58)
+            raise IPPcodeStringError("SETCHAR string out of range")
 
     def read_var(self, var, var_type):
         """
@@ -505,9 +562,13 @@ class VariablesFactory:
         :param var_type: Variable type
         """
         var_type = var_type[1]
+
+        # Buffered output must be visible before program waits for input
+        self.stdout.flush()
+        self.stderr.flush()
         try:
-            value = input()
-        except (EOFError, KeyboardInterrupt):
+            value = self.input_reader.read_line()
+        except KeyboardInterrupt:
             value = None
 
         if var_type == "float":
@@ -524,10 +585,7 @@ class VariablesFactory:
                 value = 0
         elif var_type == "bool":
             var_type = TYPE_BOOL
-            if value is not None:
-                value = value.lower()
-            if value != "true" and value != "false":
-                value = "false"
+            value = value is not None and value.lower() == "true"
         elif var_type == "string":
             var_type = TYPE_STRING
             if value is None:
@@ -547,8 +605,7 @@ class VariablesFactory:
         symb_type, symb_value = self.get_symbol_type_and_value(symb)
 
         if symb_type != TYPE_INT:
-            sys.stderr.write("ERROR: INT2FLOAT requires symbol with int type!\n")
-            self.wrong_operands_exit(symb, types=[TYPE_INT])
+            raise self.wrong_operands_error("INT2FLOAT requires symbol with int type", symb, types=[TYPE_INT])
 
         variable.variable_type = TYPE_FLOAT
         variable.value = float(symb_value)
@@ -563,31 +620,60 @@ class VariablesFactory:
         symb_type, symb_value = self.get_symbol_type_and_value(symb)
 
         if symb_type != TYPE_FLOAT:
-            sys.stderr.write("ERROR: FLOAT2INT requires symbol with float type!\n")
-            self.wrong_operands_exit(symb, types=[TYPE_FLOAT])
+            raise self.wrong_operands_error("FLOAT2INT requires symbol with float type", symb, types=[TYPE_FLOAT])
 
         variable.variable_type = TYPE_INT
         variable.value = int(symb_value)
 
-    def wrong_operands_exit(self, *symbols, types=None):
+    def wrong_operands_error(self, message, *symbols, types=None):
         """
-        Checks operands and exits on wrong operand types
-        :param symbols: Operands
+        Checks operands and creates error for first operand with wrong type
+        :param message: Error message
+        :param symbols: Operands, None for operands of stack operations
         :param types: Allowd types
+        :return: Error, which is raised by caller, operand type error if no operand has wrong type
         """
         if types is None:
             types = []
 
         for symb in symbols:
+            if symb is None:
+                continue
             data_type, value = self.get_symbol_type_and_value(symb)
             if data_type not in types:
                 if symb[0] == "var":
-                    exit(53)
+                    return IPPcodeOperandTypeError(message)
                 else:
-                    exit(52)
+                    return IPPcodeSemanticError(message)
+
+        return IPPcodeOperandTypeError(message)
+
+
+def text_value(value):
+    """
+    Turns string kept in StringBuilder to normal string, other values are returned unchanged
+    :param value: Variable value
+    """
+    if type(value) is StringBuilder:
+        return str(value)
+
+    return value
+
+
+def debug_value(variable):
+    """
+    Gets variable value printed by BREAK
+    :param variable: Variable
+    """
+    if variable.variable_type == TYPE_BOOL:
+        return BOOL_VALUES[variable.value]
+
+    return text_value(variable.value)
 
 
 class Variable:
+    __slots__ = ("name", "variable_type", "value")
+
     def __init__(self, name):
         """
         Defines variable default values